@@ -0,0 +1,301 @@
+"""
+Архивация решений завершенных соревнований.
+
+Все попытки соревнования переносятся в один файл archive/<contest_id>.gz, в котором каждая попытка -
+отдельный gzip-член; рядом лежит индекс <contest_id>.index.json со смещениями, так что любую попытку
+можно прочитать, не распаковывая архив целиком. В горячем хранилище остается только последняя
+попытка каждой пары (команда, задание): файл в submissions/<contest_id>/ и строка в шарде решений.
+
+Раунд main.py (общий пул заданий) архивируется так же (archive_pool_round): файлы плоского каталога
+submissions/ и строки основной таблицы submissions, после чего основная база сжимается порциями.
+"""
+import gzip
+import json
+import logging
+import os
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from contest_server.database import SessionLocal, engine
+from contest_server.models import Submission
+from contest_server.submission_store import VACUUM_PAGES, ShardedSubmissionStore, incremental_vacuum, submission_store
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SUBMISSIONS_DIR = "submissions"
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_COMPRESSION_LEVEL = 6
+ARCHIVE_INDEX_VERSION = 1
+DELETE_BATCH_SIZE = 500  # идентификаторов в одном DELETE ... IN (лимит параметров SQLite)
+ROUND_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,50}$")
+
+
+def _archive_paths(contest_id: str, archive_dir: str) -> Tuple[str, str]:
+    return (
+        os.path.join(archive_dir, f"{contest_id}.gz"),
+        os.path.join(archive_dir, f"{contest_id}.index.json"),
+    )
+
+
+def _parse_submission_name(filename: str) -> Optional[Tuple[str, int, str]]:
+    """
+    Разбор имени файла решения {team}_{task_id:03}_{timestamp}.json (см. Contest.save_submission)
+    :return: (команда, номер задания, метка времени) или None для посторонних файлов
+    """
+    if not filename.endswith(".json"):
+        return None
+    parts = filename[:-len(".json")].rsplit("_", 2)
+    if len(parts) != 3 or not parts[1].isdigit():
+        return None
+    return parts[0], int(parts[1]), parts[2]
+
+
+def _read_index(index_path: str) -> Dict[str, Any]:
+    if not os.path.exists(index_path):
+        return {"version": ARCHIVE_INDEX_VERSION, "records": []}
+    with open(index_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_index(index_path: str, index: Dict[str, Any]) -> None:
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp_path, index_path)
+
+
+def _archive_attempts(
+    archive_name: str,
+    source_dir: str,
+    attempts: Dict[Tuple[str, int], List[Tuple[str, str]]],
+    archive_dir: str,
+) -> Tuple[Dict[str, int], List[str]]:
+    """
+    Дописывает в архив попытки, которых в нем еще нет
+    :param archive_name: Имя архива (идентификатор соревнования или раунда)
+    :param source_dir: Каталог файлов решений
+    :param attempts: {(команда, номер задания): [(метка времени, имя файла)]}
+    :return: (статистика archived/kept, файлы прошлых попыток, которые можно удалить)
+    """
+    archive_path, index_path = _archive_paths(archive_name, archive_dir)
+    os.makedirs(archive_dir, exist_ok=True)
+
+    index = _read_index(index_path)
+    archived_files = {record["file"] for record in index["records"]}
+
+    stats = {"archived": 0, "kept": 0}
+    cold_files = []
+    with open(archive_path, "ab") as archive:
+        for (team, task_id), files in sorted(attempts.items()):
+            files.sort()
+            last_file = files[-1][1]
+            for timestamp, filename in files:
+                if filename not in archived_files:
+                    with open(os.path.join(source_dir, filename), "rb") as f:
+                        member = gzip.compress(f.read(), compresslevel=ARCHIVE_COMPRESSION_LEVEL)
+                    index["records"].append({
+                        "team": team,
+                        "task_id": task_id,
+                        "file": filename,
+                        "timestamp": timestamp,
+                        "offset": archive.tell(),
+                        "length": len(member),
+                    })
+                    archive.write(member)
+                    stats["archived"] += 1
+                if filename == last_file:
+                    stats["kept"] += 1
+                else:
+                    cold_files.append(filename)
+        archive.flush()
+        os.fsync(archive.fileno())
+
+    index["contest_id"] = archive_name
+    index["updated_at"] = datetime.utcnow().isoformat()
+    _write_index(index_path, index)
+    return stats, cold_files
+
+
+def _remove_files(directory: str, filenames: List[str]) -> int:
+    """
+    Удаляет файлы прошлых попыток; уже удаленные (прерванный прошлый запуск) пропускаются
+    :return: Количество удаленных файлов
+    """
+    removed = 0
+    for filename in filenames:
+        try:
+            os.remove(os.path.join(directory, filename))
+        except FileNotFoundError:
+            continue
+        removed += 1
+    return removed
+
+
+def archive_contest(
+    contest_id: str,
+    submissions_dir: str = SUBMISSIONS_DIR,
+    archive_dir: str = ARCHIVE_DIR,
+    store: Optional[ShardedSubmissionStore] = submission_store,
+    full_vacuum: bool = False,
+) -> Dict[str, int]:
+    """
+    Архивирует решения соревнования. Повторный запуск дописывает только новые попытки.
+    Порядок: архив и индекс, затем удаление строк, затем файлов - строка без файла не остается.
+    :param contest_id: Идентификатор соревнования
+    :param submissions_dir: Корень пространств решений
+    :param archive_dir: Каталог архивов
+    :param store: Шардированное хранилище, в котором нужно оставить только горячие строки
+    :param full_vacuum: Разрешить блокирующий полный VACUUM шардов (только офлайн)
+    :return: Статистика: archived, kept, removed, compacted_rows
+    """
+    contest_dir = os.path.join(submissions_dir, contest_id)
+
+    attempts: Dict[Tuple[str, int], List[Tuple[str, str]]] = {}
+    if os.path.isdir(contest_dir):
+        for filename in os.listdir(contest_dir):
+            parsed = _parse_submission_name(filename)
+            if parsed is not None:
+                team, task_id, timestamp = parsed
+                attempts.setdefault((team, task_id), []).append((timestamp, filename))
+
+    stats, cold_files = _archive_attempts(contest_id, contest_dir, attempts, archive_dir)
+    stats.update(removed=0, compacted_rows=0)
+
+    if store is not None and store.started:
+        stats["compacted_rows"] = store.compact(contest_id, full_vacuum=full_vacuum)
+    # Файлы удаляются только после того, как архив, индекс и строки шардов зафиксированы
+    stats["removed"] = _remove_files(contest_dir, cold_files)
+
+    logger.info(
+        f"Соревнование {contest_id} архивировано: {stats['archived']} новых попыток, "
+        f"оставлено {stats['kept']}, удалено файлов {stats['removed']}, строк {stats['compacted_rows']}"
+    )
+    return stats
+
+
+def _pool_task_id(task_file: Optional[str]) -> int:
+    """Номер задания пула по имени файла task_XXX.json (0 - задание неизвестно)"""
+    digits = (task_file or "")[len("task_"):-len(".json")]
+    return int(digits) if task_file and task_file.startswith("task_") and digits.isdigit() else 0
+
+
+def archive_pool_round(
+    round_id: str,
+    submissions_dir: str = SUBMISSIONS_DIR,
+    archive_dir: str = ARCHIVE_DIR,
+    vacuum_pages: int = VACUUM_PAGES,
+    full_vacuum: bool = False,
+) -> Dict[str, int]:
+    """
+    Архивирует завершенный раунд main.py: файлы плоского каталога submissions/ и строки журнала
+    попыток в основной таблице submissions. Горячей остается последняя попытка каждой пары
+    (команда, задание), строки прошлых попыток удаляются, и основная база сжимается порциями.
+    :param round_id: Имя архива раунда
+    :param submissions_dir: Каталог файлов решений main.py
+    :param archive_dir: Каталог архивов
+    :param vacuum_pages: Количество страниц для incremental_vacuum основной базы
+    :param full_vacuum: Разрешить блокирующий полный VACUUM основной базы (только офлайн)
+    :return: Статистика: archived, kept, removed, compacted_rows
+    """
+    if not ROUND_ID_PATTERN.match(round_id):
+        raise ValueError(f"Некорректный идентификатор раунда: {round_id}")
+
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Submission.id, Submission.team_name, Submission.task_file,
+                     Submission.submission_file, Submission.received_at)
+            # Только журнал main.py: проверяемые решения (team_id, task_id) архивация не трогает
+            .filter(Submission.team_name.isnot(None))
+            .order_by(Submission.received_at, Submission.id)
+            .all()
+        )
+        # Номер задания есть только в строке базы (имя файла main.py его не содержит)
+        attempts: Dict[Tuple[str, int], List[Tuple[str, str]]] = {}
+        hot_ids: Dict[Tuple[str, int], int] = {}
+        for row in rows:
+            key = (row.team_name, _pool_task_id(row.task_file))
+            hot_ids[key] = row.id
+            if row.submission_file and os.path.exists(os.path.join(submissions_dir, row.submission_file)):
+                timestamp = row.received_at.isoformat() if row.received_at else ""
+                attempts.setdefault(key, []).append((timestamp, row.submission_file))
+
+        stats, cold_files = _archive_attempts(round_id, submissions_dir, attempts, archive_dir)
+        stats.update(removed=0, compacted_rows=0)
+
+        cold_ids = [row.id for row in rows if hot_ids[(row.team_name, _pool_task_id(row.task_file))] != row.id]
+        for start in range(0, len(cold_ids), DELETE_BATCH_SIZE):
+            stats["compacted_rows"] += (
+                db.query(Submission)
+                .filter(Submission.id.in_(cold_ids[start:start + DELETE_BATCH_SIZE]))
+                .delete(synchronize_session=False)
+            )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    # Файлы удаляются только после фиксации удаления строк, которые на них ссылаются
+    stats["removed"] = _remove_files(submissions_dir, cold_files)
+
+    if engine.dialect.name == "sqlite":
+        incremental_vacuum(engine, vacuum_pages, full_vacuum)
+
+    logger.info(
+        f"Раунд {round_id} архивирован: {stats['archived']} новых попыток, "
+        f"оставлено {stats['kept']}, удалено файлов {stats['removed']}, строк {stats['compacted_rows']}"
+    )
+    return stats
+
+
+def read_archived(contest_id: str, team: str, task_id: int, archive_dir: str = ARCHIVE_DIR) -> List[bytes]:
+    """
+    Все архивные попытки команды по заданию в порядке отправки
+    :return: Содержимое решений
+    """
+    archive_path, index_path = _archive_paths(contest_id, archive_dir)
+    records = [
+        record for record in _read_index(index_path)["records"]
+        if record["team"] == team and record["task_id"] == task_id
+    ]
+    records.sort(key=lambda record: record["timestamp"])
+    contents = []
+    with open(archive_path, "rb") as archive:
+        for record in records:
+            archive.seek(record["offset"])
+            contents.append(gzip.decompress(archive.read(record["length"])))
+    return contents
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Архивация решений завершенных соревнований")
+    parser.add_argument("contest_ids", nargs="*", help="Идентификаторы соревнований")
+    parser.add_argument("--submissions-dir", default=SUBMISSIONS_DIR)
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--pool-round", help="Архивировать раунд main.py (submissions/ и основная база) под этим именем")
+    args = parser.parse_args()
+    if not args.contest_ids and not args.pool_round:
+        parser.error("укажите идентификаторы соревнований или --pool-round")
+
+    if submission_store is not None:
+        submission_store.start()
+    try:
+        for contest_id in args.contest_ids:
+            print(contest_id, archive_contest(contest_id, args.submissions_dir, args.archive_dir, full_vacuum=True))
+        if args.pool_round:
+            print(args.pool_round, archive_pool_round(
+                args.pool_round, args.submissions_dir, args.archive_dir, full_vacuum=True
+            ))
+    finally:
+        if submission_store is not None:
+            submission_store.stop()
@@ -1,44 +1,49 @@
+import asyncio
+import hashlib
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from typing import Callable, Dict, NamedTuple, Optional
 import os
-from fastapi import Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import jwt, JWTError
 import time
-<<<<<<< HEAD
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-# Get secrets from environment variables
-SECRET_KEY = os.getenv("SECRET_KEY", "")  # Will be empty if not set
-ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
-security = HTTPBearer()
-
-if not SECRET_KEY:
-    raise ValueError("SECRET_KEY environment variable is not set. Please set it in .env file")
-
-def create_token(name: str):
-=======
-from typing import Optional
-import os
 from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials, OAuth2PasswordBearer
+from jose import jwt, JWTError
 from passlib.context import CryptContext
-from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from contest_server.database import get_db
+from contest_server.database import get_async_db
+from contest_server.metrics import registry
 from contest_server.models import Team
 from contest_server.schemas import TokenData
+from contest_server.tracing import span
+
+# Загружаем переменные окружения из .env
+load_dotenv()
 
 # Безопасное хранение секретных ключей
-SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-here")  # Добавляем значение по умолчанию для тестирования
+SECRET_KEY = os.getenv("SECRET_KEY") or os.getenv("JWT_SECRET_KEY", "")  # Will be empty if not set
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 часа
 
 LIVE_TIME = 3600  # 1 час в секундах (уменьшено с 24 часов для большей безопасности)
-ALGORITHM = "HS256"
+ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 MIN_NAME_LENGTH = 3
 MAX_NAME_LENGTH = 50
 
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))  # проверенных токенов в кеше
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))  # стоимость bcrypt (2^rounds итераций)
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 2)))  # потоки для bcrypt
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", "64"))  # операций в работе и в очереди
+
+if not SECRET_KEY:
+    raise ValueError("SECRET_KEY environment variable is not set. Please set it in .env file")
+
 # Инициализация безопасности
 security = HTTPBearer(
     scheme_name="JWT",
@@ -46,9 +51,174 @@ security = HTTPBearer(
     auto_error=True  # Изменено на True для автоматической обработки ошибок
 )
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
+
+class VerifiedToken(NamedTuple):
+    """Результат проверки подписи токена"""
+    subject: str
+    expires_at: float
+    jti: Optional[str]
+
+
+class VerifiedTokenCache:
+    """
+    Ограниченный LRU кеш проверенных токенов: ключ - sha256 токена, значение - subject, срок и jti.
+    Повторные запросы с тем же токеном не проверяют подпись; запись удаляется по истечении срока
+    токена или при отзыве его jti. Зависимость verify_token синхронная и выполняется в пуле потоков,
+    поэтому доступ к кешу защищен блокировкой.
+    """
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries: "OrderedDict[bytes, VerifiedToken]" = OrderedDict()
+        self.revoked: Dict[str, float] = {}  # jti -> срок токена (после него запись не нужна)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[VerifiedToken]:
+        key = self.digest(token)
+        now = time.time()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= now or (entry.jti is not None and entry.jti in self.revoked):
+                del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, token: str, entry: VerifiedToken) -> None:
+        key = self.digest(token)
+        with self._lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        return jti is not None and jti in self.revoked
+
+    def revoke(self, jti: str, expires_at: float) -> None:
+        """
+        Отзыв токена по jti; кешированные записи с этим jti удаляются при следующем обращении
+        :param jti: Идентификатор токена
+        :param expires_at: Срок действия токена (после него запись об отзыве удаляется)
+        """
+        now = time.time()
+        with self._lock:
+            self.revoked[jti] = expires_at
+            for expired in [key for key, until in self.revoked.items() if until <= now]:
+                del self.revoked[expired]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "revoked": len(self.revoked),
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+
+# Глобальный кеш проверенных токенов
+token_cache = VerifiedTokenCache()
+
+registry.counter("contest_token_cache_hits_total", "Verified-token cache hits").set_function(lambda: token_cache.hits)
+registry.counter("contest_token_cache_misses_total", "Verified-token cache misses").set_function(lambda: token_cache.misses)
+
+
+class PasswordHasherPool:
+    """
+    Ограниченный пул потоков для bcrypt: хеширование и проверка пароля не выполняются
+    в цикле событий (bcrypt освобождает GIL, поэтому потоки работают параллельно).
+    Если операций в работе и в очереди больше лимита, запрос сразу получает 503 с Retry-After.
+    """
+
+    def __init__(self, workers: int = PASSWORD_WORKERS, queue_limit: int = PASSWORD_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self.rejected = 0
+        self.avg_duration = 0.25  # скользящее среднее длительности операции, секунды
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    def retry_after(self) -> int:
+        """Оценка времени до освобождения очереди, секунды"""
+        return max(1, math.ceil(self.pending / self.workers * self.avg_duration))
+
+    def _timed(self, func: Callable, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.avg_duration = 0.8 * self.avg_duration + 0.2 * (time.perf_counter() - start)
+
+    async def _run(self, func: Callable, *args):
+        if self.pending >= self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервер перегружен, повторите запрос позже",
+                headers={"Retry-After": str(self.retry_after())},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self._timed, func, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(pwd_context.verify, plain_password, hashed_password)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "queue_limit": self.queue_limit,
+            "rejected": self.rejected,
+            "avg_duration": self.avg_duration,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+# Глобальный пул хеширования паролей
+password_pool = PasswordHasherPool()
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -64,14 +234,13 @@ def create_token(name: str) -> str:
     """
     if not name or not isinstance(name, str):
         raise ValueError("Имя пользователя должно быть непустой строкой")
-    
+
     if len(name) < MIN_NAME_LENGTH or len(name) > MAX_NAME_LENGTH:
         raise ValueError(f"Длина имени должна быть от {MIN_NAME_LENGTH} до {MAX_NAME_LENGTH} символов")
-    
+
     if not name.replace("_", "").isalnum():
         raise ValueError("Имя может содержать только буквы, цифры и знак подчеркивания")
-    
->>>>>>> d4064c07154b37cc68ec40159791ab6874354da3
+
     payload = {
         "sub": name,
         "exp": int(time.time() + LIVE_TIME),
@@ -79,12 +248,71 @@ def create_token(name: str) -> str:
         "iss": "ai_competition_service",
         "jti": os.urandom(16).hex()  # Добавляем уникальный идентификатор токена
     }
-    
+
     try:
         return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
     except Exception as e:
         raise RuntimeError(f"Ошибка создания токена: {str(e)}")
 
+def decode_token(token: str) -> VerifiedToken:
+    """
+    Проверяет JWT токен, используя кеш проверенных токенов
+    :param token: Закодированный токен
+    :return: Subject, срок и jti токена
+    :raises: JWTError если токен невалиден, истек или отозван
+    """
+    entry = token_cache.get(token)
+    if entry is not None:
+        return entry
+
+    payload = jwt.decode(
+        token,
+        SECRET_KEY,
+        algorithms=[ALGORITHM],
+        options={
+            "require_exp": True,  # Требуем наличие expiration
+            "require_sub": True,  # Требуем наличие subject
+        }
+    )
+
+    # Дополнительная проверка subject
+    if not payload.get("sub"):
+        raise JWTError("Отсутствует subject в токене")
+
+    entry = VerifiedToken(payload["sub"], float(payload["exp"]), payload.get("jti"))
+    if token_cache.is_revoked(entry.jti):
+        raise JWTError("Токен отозван")
+    token_cache.put(token, entry)
+    return entry
+
+def authenticate_token(token: str) -> str:
+    """
+    Верифицирует JWT токен, переданный строкой (например, в параметре WebSocket)
+    :param token: Закодированный токен
+    :return: Имя пользователя (subject)
+    :raises: HTTPException 401 если токен невалидный
+    """
+    try:
+        with span("auth.jwt"):
+            return decode_token(token).subject
+    except jwt.ExpiredSignatureError: # type: ignore
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Токен истек",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    except JWTError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"Неверный токен: {str(e)}",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка проверки токена: {str(e)}"
+        )
+
 def verify_token(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
 ) -> str:
@@ -100,24 +328,17 @@ def verify_token(
             detail="Требуется аутентификация",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
+
+    return authenticate_token(credentials.credentials)
+
+def revoke_token(token: str) -> None:
+    """
+    Отзывает токен по его jti
+    :param token: Закодированный токен
+    :raises: HTTPException 401 если токен невалидный, 400 если у токена нет jti
+    """
     try:
-        payload = jwt.decode(
-            credentials.credentials,
-            SECRET_KEY,
-            algorithms=[ALGORITHM],
-            options={
-                "require_exp": True,  # Требуем наличие expiration
-                "require_sub": True,  # Требуем наличие subject
-            }
-        )
-        
-        # Дополнительная проверка subject
-        if not payload.get("sub"):
-            raise JWTError("Отсутствует subject в токене")
-            
-        return payload["sub"]
-        
+        entry = decode_token(token)
     except jwt.ExpiredSignatureError: # type: ignore
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -130,11 +351,12 @@ def verify_token(
             detail=f"Неверный токен: {str(e)}",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    except Exception as e:
+    if entry.jti is None:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Ошибка проверки токена: {str(e)}"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Токен без jti не может быть отозван",
         )
+    token_cache.revoke(entry.jti, entry.expires_at)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
@@ -142,26 +364,23 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": os.urandom(16).hex()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Team:
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> Team:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        userId: str = payload.get("sub")
-        if userId is None:
-            raise credentials_exception
-        token_data = TokenData(userId=userId)
+        token_data = TokenData(userId=decode_token(token).subject)
     except JWTError:
         raise credentials_exception
-        
-    user = db.query(Team).filter(Team.userId == token_data.userId).first()
+
+    # Асинхронная сессия: поиск команды не блокирует цикл событий
+    user = (await db.execute(select(Team).where(Team.userId == token_data.userId))).scalars().first()
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    return user
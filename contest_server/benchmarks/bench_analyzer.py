@@ -0,0 +1,133 @@
+"""
+Сравнение однопроходного analyze_structure с прежними эвристиками TaskLoader
+(len(str(data)) + _get_all_keys + _get_max_depth + повторный _get_all_keys).
+
+Запуск: python -m contest_server.benchmarks.bench_analyzer
+"""
+import json
+import random
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from contest_server.task_loader import TaskLoader, analyze_structure
+
+
+def _legacy_get_all_keys(data: Dict[str, Any], prefix: str = '') -> List[str]:
+    keys = []
+    for key, value in data.items():
+        full_key = f"{prefix}.{key}" if prefix else key
+        keys.append(full_key)
+        if isinstance(value, dict):
+            keys.extend(_legacy_get_all_keys(value, full_key))
+        elif isinstance(value, list) and value and isinstance(value[0], dict):
+            keys.extend(_legacy_get_all_keys(value[0], full_key))
+    return keys
+
+
+def _legacy_get_max_depth(data: Any, current_depth: int = 1) -> int:
+    if not isinstance(data, (dict, list)):
+        return current_depth
+    max_depth = current_depth
+    if isinstance(data, dict):
+        for value in data.values():
+            max_depth = max(max_depth, _legacy_get_max_depth(value, current_depth + 1))
+    elif isinstance(data, list) and data:
+        for item in data:
+            max_depth = max(max_depth, _legacy_get_max_depth(item, current_depth + 1))
+    return max_depth
+
+
+def legacy_analyze(data: Dict[str, Any]) -> tuple:
+    """Прежняя реализация: четыре обхода данных"""
+    factors = [len(str(data)), len(_legacy_get_all_keys(data)), _legacy_get_max_depth(data)]
+    difficulty = max(1, min(5, round(sum(factors) / (1000 * len(factors)) * 5)))
+    keys = set(_legacy_get_all_keys(data))
+    return factors, difficulty, keys
+
+
+def _legacy_task_type(keys: set) -> str:
+    if any(key in keys for key in ['image', 'img', 'image_url', 'url']):
+        if any(key in keys for key in ['bbox', 'bounding_box', 'boxes']):
+            return 'object_detection'
+        elif any(key in keys for key in ['mask', 'segment', 'segmentation']):
+            return 'segmentation'
+        elif any(key in keys for key in ['keypoint', 'point', 'landmark']):
+            return 'keypoint_detection'
+        else:
+            return 'classification'
+    return 'unknown'
+
+
+def synthetic_task(mask_size: int, keypoints: int, seed: int = 0) -> Dict[str, Any]:
+    """Большая синтетическая задача: встроенная маска, ключевые точки и вложенные метаданные"""
+    rng = random.Random(seed)
+    return {
+        "image_id": f"seg_{seed:08x}",
+        "image_url": f"https://example.com/images/{seed}.jpg",
+        "mask": [[rng.randint(0, 9) for _ in range(mask_size)] for _ in range(mask_size)],
+        "keypoints": [
+            {"name": f"kp_{i}", "x": rng.random() * 1000, "y": rng.random() * 1000, "visible": bool(i % 2)}
+            for i in range(keypoints)
+        ],
+        "metadata": {
+            "camera": {"model": "Sentinel-2", "bands": ["RGB", "NIR", "SWIR"]},
+            "tags": [["a", "b"], ["c", ["d", {"e": 1}]]],
+            "size": (mask_size, mask_size),
+        },
+    }
+
+
+def _best_of(func: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def check_equivalence(samples: List[Dict[str, Any]]) -> None:
+    """Новые эвристики должны давать те же факторы, сложность и тип задачи"""
+    loader = TaskLoader(".")
+    for data in samples:
+        factors, difficulty, keys = legacy_analyze(data)
+        stats = analyze_structure(data)
+        assert [stats.size, stats.key_count, stats.max_depth] == factors, (factors, stats.size)
+        assert loader._estimate_difficulty(data, stats) == difficulty
+        assert loader._determine_task_type(data, stats) == _legacy_task_type(keys)
+
+
+def main(repeat: int = 5) -> None:
+    dataset = [json.loads(path.read_text(encoding="utf-8")) for path in sorted(Path("dataset").glob("*.json"))]
+    cases = {
+        "mask_256": synthetic_task(256, 100, seed=1),
+        "mask_1024": synthetic_task(1024, 1000, seed=2),
+    }
+    check_equivalence(dataset + list(cases.values()))
+
+    loader = TaskLoader(".")
+    if dataset:
+        cases["dataset_files"] = dataset
+
+    print(f"{'case':<16}{'legacy, ms':>12}{'single-pass, ms':>18}{'speedup':>10}")
+    for name, data in cases.items():
+        items = data if isinstance(data, list) else [data]
+
+        def legacy():
+            for item in items:
+                legacy_analyze(item)
+
+        def single_pass():
+            for item in items:
+                stats = analyze_structure(item)
+                loader._estimate_difficulty(item, stats)
+                loader._determine_task_type(item, stats)
+
+        old = _best_of(legacy, repeat)
+        new = _best_of(single_pass, repeat)
+        print(f"{name:<16}{old * 1000:>12.2f}{new * 1000:>18.2f}{old / new:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
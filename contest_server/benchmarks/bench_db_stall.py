@@ -0,0 +1,134 @@
+"""
+Задержка цикла событий при работе с базой: синхронная сессия (как было в обработчиках)
+против асинхронной сессии на aiosqlite, с настройками SQLite по умолчанию и с SQLITE_PRAGMAS.
+
+Пока обработчики пишут в базу, зонд каждую миллисекунду засыпает и измеряет, насколько позже
+он проснулся. Это опоздание испытывают все отправки по WebSocket в тот же момент.
+
+Запуск: python -m contest_server.benchmarks.bench_db_stall [--requests 500] [--concurrency 20]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from typing import Callable, Dict, List
+
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from contest_server.database import Base, Team, _apply_sqlite_pragmas
+
+PROBE_INTERVAL = 0.001  # секунды между пробуждениями зонда
+
+
+async def _probe(lags: List[float], stop: asyncio.Event) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+def _make_team() -> Team:
+    name = uuid.uuid4().hex[:20]
+    return Team(name=name, token=uuid.uuid4().hex)
+
+
+def sync_handler(factory: Callable) -> Callable:
+    """Обработчик в прежнем стиле: синхронная сессия внутри async def"""
+    async def handle() -> None:
+        db = factory()
+        try:
+            db.add(_make_team())
+            db.commit()
+            db.execute(select(Team.id).order_by(Team.id.desc()).limit(1)).scalar()
+        finally:
+            db.close()
+    return handle
+
+
+def async_handler(factory: Callable) -> Callable:
+    """Обработчик на асинхронной сессии"""
+    async def handle() -> None:
+        async with factory() as db:
+            db.add(_make_team())
+            await db.commit()
+            (await db.execute(select(Team.id).order_by(Team.id.desc()).limit(1))).scalar()
+    return handle
+
+
+async def _run(handle: Callable, requests: int, concurrency: int) -> Dict[str, float]:
+    lags: List[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(lags, stop))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            await handle()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+
+    lags.sort()
+    return {
+        "rps": requests / elapsed,
+        "max_lag_ms": lags[-1] * 1000 if lags else 0.0,
+        "p99_lag_ms": lags[int(len(lags) * 0.99)] * 1000 if lags else 0.0,
+        "median_lag_ms": statistics.median(lags) * 1000 if lags else 0.0,
+        "stall_share": sum(lags) / elapsed,
+    }
+
+
+async def _case(path: str, use_async: bool, pragmas: bool, requests: int, concurrency: int) -> Dict[str, float]:
+    sync_engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    if pragmas:
+        event.listen(sync_engine, "connect", _apply_sqlite_pragmas)
+    Base.metadata.create_all(bind=sync_engine, tables=[Team.__table__])
+
+    if not use_async:
+        try:
+            return await _run(sync_handler(sessionmaker(bind=sync_engine)), requests, concurrency)
+        finally:
+            sync_engine.dispose()
+
+    sync_engine.dispose()
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    if pragmas:
+        event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    try:
+        return await _run(async_handler(async_sessionmaker(engine, expire_on_commit=False)), requests, concurrency)
+    finally:
+        await engine.dispose()
+
+
+async def main(requests: int, concurrency: int) -> None:
+    cases = [
+        ("sync, defaults", False, False),
+        ("sync, pragmas", False, True),
+        ("async, defaults", True, False),
+        ("async, pragmas", True, True),
+    ]
+    print(f"{'case':<18}{'req/s':>10}{'max lag, ms':>14}{'p99 lag, ms':>14}{'median, ms':>13}{'stall':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for number, (name, use_async, pragmas) in enumerate(cases):
+            result = await _case(os.path.join(tmp, f"bench_{number}.db"), use_async, pragmas, requests, concurrency)
+            print(
+                f"{name:<18}{result['rps']:>10.0f}{result['max_lag_ms']:>14.2f}"
+                f"{result['p99_lag_ms']:>14.2f}{result['median_lag_ms']:>13.2f}{result['stall_share']:>7.0%}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Задержка цикла событий при синхронной и асинхронной работе с базой")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
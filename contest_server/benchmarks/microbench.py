@@ -0,0 +1,417 @@
+"""
+Микробенчмарки горячих функций сервера с сохраненными базовыми значениями.
+
+Каждый бенчмарк замеряет одну функцию в изоляции (число вызовов в повторе подбирается так, чтобы
+повтор длился не меньше MIN_RUN_TIME). Перед каждым повтором замеряется калибровочный цикл - фиксированная
+нагрузка на интерпретатор, - и время вызова делится на его время: частота процессора и соседи по хосту
+меняют обе величины одинаково. С baselines.json сравнивается медиана этих отношений по повторам; если она
+выросла больше чем на порог, скрипт завершается с кодом 1. Порог выбран выше разброса повторных
+прогонов на одной машине (см. DEFAULT_THRESHOLD).
+
+Базовые значения зависят от машины: если блок machine в baselines.json (версия Python, архитектура,
+процессор, ОС) не совпадает с текущим, сравнение пропускается, и базовые значения нужно перезаписать
+флагом --update (и закоммитить baselines.json вместе с изменением, которое их сдвинуло).
+
+Запуск: python -m contest_server.benchmarks.microbench [--filter token] [--threshold 0.35] [--update]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from contest_server.auth import create_token, token_cache, verify_token
+from contest_server.benchmarks.bench_analyzer import synthetic_task
+from contest_server.database import (
+    ISSUE_CURSOR_ID, Base, IssueCursor, Submission, Task, Team, validate_submission,
+)
+from contest_server.scheduler import new_task_frame
+from contest_server.schemas import ExpectedTaskResponse, TaskAnnotation
+from contest_server.task_loader import INDEX_FILENAME, TaskLoader, analyze_structure
+from contest_server.websocket import WebSocketManager
+
+BASELINE_PATH = Path(__file__).with_name("baselines.json")
+BASELINE_VERSION = 2  # 2: сравнивается медиана времени относительно калибровочного цикла
+DEFAULT_THRESHOLD = 0.35  # допустимое замедление: разброс повторных прогонов на одной машине до ~20%
+DEFAULT_REPEAT = 9
+MIN_RUN_TIME = 0.05  # минимальная длительность одного повтора, секунды
+CALIBRATION_PAYLOAD = {f"field_{i}": [i, str(i), {"value": i * 0.5}] for i in range(50)}
+DATASET_PATH = Path(__file__).resolve().parents[2] / "dataset"
+
+# Бенчмарк: функция подготовки, которая получает ExitStack для освобождения ресурсов
+# и возвращает замеряемую функцию без аргументов
+BENCHMARKS: Dict[str, Callable[[ExitStack], Callable[[], Any]]] = {}
+
+
+def benchmark(name: str):
+    def register(setup: Callable[[ExitStack], Callable[[], Any]]):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+# --- Аутентификация ---
+
+@benchmark("auth.create_token")
+def bench_create_token(stack: ExitStack) -> Callable[[], Any]:
+    return lambda: create_token("bench_team")
+
+
+@benchmark("auth.verify_token.cold")
+def bench_verify_token_cold(stack: ExitStack) -> Callable[[], Any]:
+    """Полная проверка подписи: кеш очищается перед каждым вызовом"""
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=create_token("bench_team"))
+    stack.callback(token_cache.clear)
+
+    def run():
+        token_cache.clear()
+        return verify_token(credentials)
+    return run
+
+
+@benchmark("auth.verify_token.cached")
+def bench_verify_token_cached(stack: ExitStack) -> Callable[[], Any]:
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=create_token("bench_team"))
+    verify_token(credentials)
+    stack.callback(token_cache.clear)
+    return lambda: verify_token(credentials)
+
+
+# --- Проверка формата решений ---
+
+def _solution(boxes: int) -> Dict[str, Any]:
+    return {
+        "annotations": {
+            "bounding_boxes": [
+                {"x": i, "y": i * 2, "width": 50, "height": 40, "class": "object"} for i in range(boxes)
+            ],
+            "classifications": ["class1", "class2"],
+            "segmentation_mask": [[(x + y) % 2 for x in range(32)] for y in range(32)],
+        },
+        "confidence": 0.9,
+        "processing_time": 1.5,
+        "metadata": {"model_name": "bench", "gpu_used": False},
+    }
+
+
+@benchmark("schemas.ExpectedTaskResponse")
+def bench_expected_task_response(stack: ExitStack) -> Callable[[], Any]:
+    solution = _solution(100)
+    # Так же, как при приеме решения в main_server.submit_solution
+    return lambda: ExpectedTaskResponse(**solution)
+
+
+@benchmark("schemas.TaskAnnotation")
+def bench_task_annotation(stack: ExitStack) -> Callable[[], Any]:
+    annotation = {
+        "task_id": 1,
+        "task_type": "segmentation",
+        "bounding_boxes": [
+            {"x": i, "y": i, "width": 10, "height": 10, "class_name": "person", "confidence": 0.5}
+            for i in range(100)
+        ],
+        "keypoints": [{"x": i, "y": i, "name": f"kp_{i}", "confidence": 0.5} for i in range(50)],
+        "segmentation": {
+            "mask": [[(x * y) % 3 for x in range(64)] for y in range(64)],
+            "class_mapping": {0: "background", 1: "road", 2: "building"},
+        },
+        "confidence": 0.8,
+        "processing_time": 2.0,
+    }
+    return lambda: TaskAnnotation(**annotation)
+
+
+# --- Рассылка заданий ---
+
+class _NullWebSocket:
+    async def send_text(self, message: str) -> None:
+        pass
+
+
+def _task_content() -> str:
+    return json.dumps(synthetic_task(64, 100, seed=3))
+
+
+@benchmark("broadcast.frame.db")
+def bench_frame_db(stack: ExitStack) -> Callable[[], Any]:
+    """Кадр задания из базы (как в scheduler.stage_db_task)"""
+    content = _task_content()
+    return lambda: new_task_frame(42, 42, content)
+
+
+@benchmark("broadcast.frame.pool")
+def bench_frame_pool(stack: ExitStack) -> Callable[[], Any]:
+    """Кадр задания из пула: готовый JSON подставляется без повторной сериализации (scheduler.stage_pool_task)"""
+    content = _task_content()
+    timestamp = datetime.now().isoformat()
+    return lambda: f'{{"task_id": 42, "timestamp": "{timestamp}", "content": {content}}}'
+
+
+@benchmark("broadcast.fanout_100")
+def bench_broadcast_fanout(stack: ExitStack) -> Callable[[], Any]:
+    """WebSocketManager.broadcast одного кадра на 100 соединений"""
+    manager = WebSocketManager()
+    for i in range(100):
+        manager.active_connections[f"team_{i}"] = _NullWebSocket()
+        manager.active_teams.add(f"team_{i}")
+    frame = _task_content()
+    loop = asyncio.new_event_loop()
+    stack.callback(loop.close)
+    return lambda: loop.run_until_complete(manager.broadcast(frame))
+
+
+# --- Загрузка датасета ---
+
+def _dataset_copy(stack: ExitStack) -> Path:
+    path = Path(stack.enter_context(tempfile.TemporaryDirectory()))
+    sources = sorted(DATASET_PATH.glob("*.json")) if DATASET_PATH.exists() else []
+    for source in sources:
+        if source.name != INDEX_FILENAME:
+            shutil.copy(source, path / source.name)
+    if not sources:
+        for i in range(50):
+            (path / f"task_{i:03}.json").write_text(json.dumps(synthetic_task(32, 20, seed=i)), encoding="utf-8")
+    return path
+
+
+@benchmark("task_loader.load_tasks.cold")
+def bench_load_tasks_cold(stack: ExitStack) -> Callable[[], Any]:
+    """Загрузка без индекса метаданных: каждый файл хешируется и анализируется"""
+    path = _dataset_copy(stack)
+    loader = TaskLoader(str(path))
+    index_path = path / INDEX_FILENAME
+
+    def run():
+        if index_path.exists():
+            index_path.unlink()
+        return loader.load_tasks(max_tasks=None, workers=1)
+    return run
+
+
+@benchmark("task_loader.load_tasks.indexed")
+def bench_load_tasks_indexed(stack: ExitStack) -> Callable[[], Any]:
+    """Повторная загрузка по индексу без содержимого (как initialize_task_pool): файлы не читаются"""
+    path = _dataset_copy(stack)
+    loader = TaskLoader(str(path))
+    loader.load_tasks(max_tasks=None, workers=1)
+    return lambda: loader.load_tasks(max_tasks=None, workers=1, with_content=False)
+
+
+@benchmark("task_loader.analyzers")
+def bench_analyzers(stack: ExitStack) -> Callable[[], Any]:
+    """analyze_structure + оценка сложности + определение типа на задаче с маской 256x256"""
+    data = synthetic_task(256, 100, seed=1)
+    loader = TaskLoader(".")
+
+    def run():
+        stats = analyze_structure(data)
+        return loader._estimate_difficulty(data, stats), loader._determine_task_type(data, stats)
+    return run
+
+
+# --- Проверка возможности отправки ---
+
+@benchmark("database.validate_submission")
+def bench_validate_submission(stack: ExitStack) -> Callable[[], Any]:
+    path = os.path.join(stack.enter_context(tempfile.TemporaryDirectory()), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    stack.callback(engine.dispose)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    stack.callback(db.close)
+
+    now = datetime.utcnow()
+    teams = [Team(name=f"team_{i}", token=f"token_{i}") for i in range(100)]
+    tasks = [Task(name=f"task_{i}", content="{}", created_at=now + timedelta(seconds=i)) for i in range(200)]
+    db.add_all(teams + tasks)
+    db.flush()
+    db.add_all(
+        Submission(team_id=team.id, task_id=task.id, content="{}")
+        for team in teams for task in tasks[:20]
+    )
+    issued = tasks[149]
+    db.add(IssueCursor(id=ISSUE_CURSOR_ID, position=150, last_task_id=issued.id, last_created_at=issued.created_at))
+    db.commit()
+
+    team_id, task_id = teams[50].id, tasks[100].id
+    return lambda: validate_submission(db, team_id, task_id)
+
+
+# --- Замер и сравнение ---
+
+def _loop(func: Callable[[], Any], number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return time.perf_counter() - start
+
+
+def _calibration() -> Any:
+    """Калибровочная нагрузка: словари, строки и JSON, как в замеряемых горячих путях"""
+    return sorted(json.loads(json.dumps(CALIBRATION_PAYLOAD)).items())
+
+
+def _loops_for(func: Callable[[], Any], min_time: float) -> int:
+    """Число вызовов, при котором повтор длится не меньше min_time"""
+    number = 1
+    while True:
+        elapsed = _loop(func, number)
+        if elapsed >= min_time:
+            return number
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.1))
+
+
+def measure(func: Callable[[], Any], repeat: int = DEFAULT_REPEAT, min_time: float = MIN_RUN_TIME) -> Dict[str, float]:
+    """
+    Замер времени одного вызова; каждый повтор идет сразу после калибровочного цикла
+    :return: Лучшее и медианное время вызова в микросекундах, медиана отношения ко времени
+        калибровочного цикла (relative) и число вызовов в повторе
+    """
+    func()  # прогрев
+    number = _loops_for(func, min_time)
+    calibration_number = _loops_for(_calibration, min_time)
+    times, ratios = [], []
+    for _ in range(repeat):
+        calibration = _loop(_calibration, calibration_number) / calibration_number
+        elapsed = _loop(func, number) / number
+        times.append(elapsed)
+        ratios.append(elapsed / calibration)
+    return {
+        "best_us": round(min(times) * 1e6, 3),
+        "median_us": round(statistics.median(times) * 1e6, 3),
+        "relative": round(statistics.median(ratios), 5),
+        "loops": number,
+    }
+
+
+def run_benchmarks(names: List[str], repeat: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for name in names:
+        with ExitStack() as stack:
+            results[name] = measure(BENCHMARKS[name](stack), repeat)
+    return results
+
+
+def machine_info() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine(),
+        "system": platform.system(),
+    }
+
+
+def load_baselines(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            baselines = json.load(f)
+    except FileNotFoundError:
+        return None
+    if baselines.get("version") != BASELINE_VERSION:
+        return None
+    return baselines
+
+
+def save_baselines(path: Path, results: Dict[str, Dict[str, float]], previous: Optional[Dict[str, Any]]) -> None:
+    """Обновляет базовые значения замеренных бенчмарков, остальные сохраняются"""
+    benchmarks = dict(previous["benchmarks"]) if previous else {}
+    benchmarks.update(results)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "version": BASELINE_VERSION,
+            "machine": machine_info(),
+            "updated_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "benchmarks": dict(sorted(benchmarks.items())),
+        }, f, indent=2)
+        f.write("\n")
+
+
+def compare(results: Dict[str, Dict[str, float]], baselines: Optional[Dict[str, Any]],
+            threshold: float) -> List[str]:
+    """
+    Печатает таблицу сравнения (по времени относительно калибровочного цикла)
+    :return: Имена бенчмарков, замедлившихся сильнее порога
+    """
+    known = baselines["benchmarks"] if baselines else {}
+    regressions = []
+    print(f"{'benchmark':<34}{'median, us':>12}{'relative':>11}{'baseline':>11}{'change':>9}")
+    for name, result in results.items():
+        baseline = known.get(name)
+        if baseline is None:
+            print(f"{name:<34}{result['median_us']:>12.2f}{result['relative']:>11.3f}{'-':>11}{'new':>9}")
+            continue
+        change = result["relative"] / baseline["relative"] - 1
+        marker = ""
+        if change > threshold:
+            regressions.append(name)
+            marker = "  REGRESSION"
+        print(
+            f"{name:<34}{result['median_us']:>12.2f}{result['relative']:>11.3f}"
+            f"{baseline['relative']:>11.3f}{change:>+9.1%}{marker}"
+        )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Микробенчмарки горячих путей с базовыми значениями")
+    parser.add_argument("--filter", default="", help="запускать только бенчмарки, имя которых содержит подстроку")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="допустимое замедление, доля (0.35 = 35%%)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--update", action="store_true", help="записать результаты как новые базовые значения")
+    parser.add_argument("--list", action="store_true", help="вывести имена бенчмарков")
+    args = parser.parse_args(argv)
+
+    names = [name for name in BENCHMARKS if args.filter in name]
+    if args.list:
+        print("\n".join(names))
+        return 0
+    if not names:
+        print(f"Нет бенчмарков, соответствующих '{args.filter}'")
+        return 2
+
+    # Сообщения загрузчика датасета на каждый вызов только мешают замеру
+    logging.getLogger("contest_server.task_loader").setLevel(logging.WARNING)
+
+    baselines = load_baselines(args.baseline)
+    if baselines and baselines.get("machine") != machine_info():
+        # Замеры с другого железа или другой версии Python несравнимы: вместо ложных регрессий - пропуск
+        print(
+            f"Базовые значения сняты на другой машине, сравнение пропущено.\n"
+            f"  базовые: {baselines.get('machine')}\n"
+            f"  текущая: {machine_info()}\n"
+            f"Перезапишите их на этой машине: python -m contest_server.benchmarks.microbench --update"
+        )
+        baselines = None
+
+    results = run_benchmarks(names, args.repeat)
+    regressions = compare(results, baselines, args.threshold)
+
+    if args.update:
+        save_baselines(args.baseline, results, baselines)
+        print(f"Базовые значения записаны в {args.baseline}")
+        return 0
+    if regressions:
+        print(f"Замедление больше {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,384 @@
+import asyncio
+import hmac
+import logging
+import os
+import re
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import aiofiles
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Response, UploadFile, WebSocket, status
+
+from contest_server.archive import SUBMISSIONS_DIR, archive_contest
+from contest_server.auth import authenticate_token, verify_token
+from contest_server.scheduler import TASK_INTERVAL, StagedTask, TaskTicker
+from contest_server.schemas import ContestCreate
+from contest_server.self_paced import SelfPacedIssuer
+from contest_server.rate_limit import ws_message_allowed
+from contest_server.submission_store import submission_store
+from contest_server.task_pack import TaskPack
+from contest_server.websocket import WebSocketManager
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+CONTEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,50}$")
+MAX_CACHED_PAYLOADS = 4096  # Общий для всех соревнований кеш декодированных заданий
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+MODE_SCHEDULED = "scheduled"  # общий тик для всех команд
+MODE_SELF_PACED = "self_paced"  # каждая команда идет в своем темпе
+CONTEST_MODES = (MODE_SCHEDULED, MODE_SELF_PACED)
+
+
+def require_admin(x_admin_token: str = Header(default="")) -> None:
+    """
+    Проверка административного токена (заголовок X-Admin-Token)
+    :raises: HTTPException 403, если токен не задан или не совпадает
+    """
+    if not ADMIN_TOKEN or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Требуется административный доступ")
+
+
+class PayloadCache:
+    """
+    Кеш, общий для всех соревнований процесса: каждый упакованный пул отображается в память
+    один раз, а payload задания декодируется один раз независимо от числа соревнований.
+    """
+
+    def __init__(self, max_payloads: int = MAX_CACHED_PAYLOADS):
+        self.max_payloads = max_payloads
+        self.packs: Dict[str, TaskPack] = {}
+        self.payloads: "OrderedDict[Tuple[str, int], str]" = OrderedDict()
+
+    def pack(self, path: str) -> TaskPack:
+        path = os.path.abspath(path)
+        if path not in self.packs:
+            self.packs[path] = TaskPack(path)
+        return self.packs[path]
+
+    def payload(self, path: str, index: int) -> str:
+        key = (os.path.abspath(path), index)
+        text = self.payloads.get(key)
+        if text is not None:
+            self.payloads.move_to_end(key)
+            return text
+        text = self.pack(path).text(index)
+        self.payloads[key] = text
+        if len(self.payloads) > self.max_payloads:
+            self.payloads.popitem(last=False)
+        return text
+
+
+shared_cache = PayloadCache()
+
+
+class Contest:
+    """
+    Соревнование (комната): собственный пул задач, расписание, набор подключений
+    и пространство решений. Цикл событий, пул соединений с базой и кеш заданий общие.
+    """
+
+    def __init__(
+        self,
+        contest_id: str,
+        pool_path: str,
+        interval: float = TASK_INTERVAL,
+        start_at: Optional[datetime] = None,
+        max_tasks: Optional[int] = None,
+        mode: str = MODE_SCHEDULED,
+    ):
+        """
+        :param contest_id: Идентификатор соревнования
+        :param pool_path: Путь к упакованному пулу задач (см. task_pack.py)
+        :param interval: Интервал выдачи задач в секундах (в самостоятельном режиме - срок
+                         на задание без time_limit)
+        :param start_at: Время начала (UTC); по умолчанию через один интервал
+        :param max_tasks: Ограничение количества задач
+        :param mode: Режим выдачи: scheduled или self_paced
+        """
+        if mode not in CONTEST_MODES:
+            raise ValueError(f"Неизвестный режим соревнования: {mode}")
+        self.contest_id = contest_id
+        self.pool_path = pool_path
+        self.mode = mode
+        pack = shared_cache.pack(pool_path)
+        self.total_tasks = min(len(pack), max_tasks) if max_tasks else len(pack)
+        self.start_at = start_at
+        self.created_at = datetime.utcnow()
+
+        self.connections = WebSocketManager()
+        self.ticker = TaskTicker(self._stage, interval, broadcast=self.connections.broadcast)
+        self.issued = 0
+        self.current_frame: Optional[str] = None
+        self.issuer: Optional[SelfPacedIssuer] = None
+        if mode == MODE_SELF_PACED:
+            self.issuer = SelfPacedIssuer(
+                contest_id,
+                self.total_tasks,
+                lambda index: shared_cache.payload(pool_path, index),
+                self.connections.send_message,
+                default_time_limit=interval,
+            )
+
+        self.submissions_dir = os.path.join(SUBMISSIONS_DIR, contest_id)
+        self.submission_count = 0
+
+    async def _stage(self, tick: int) -> Optional[StagedTask]:
+        index = self.issued
+        if index >= self.total_tasks:
+            return None
+
+        content = shared_cache.payload(self.pool_path, index)
+        timestamp = self.ticker.scheduled_at(tick).isoformat()
+        frame = (
+            f'{{"contest_id": "{self.contest_id}", "task_id": {index + 1}, '
+            f'"timestamp": "{timestamp}", "content": {content}}}'
+        )
+
+        def on_issued():
+            self.issued = index + 1
+            self.current_frame = frame
+
+        return StagedTask(f"{self.contest_id}/{index + 1}", frame, on_issued)
+
+    def start(self):
+        os.makedirs(self.submissions_dir, exist_ok=True)
+        if self.issuer is not None:
+            logger.info(f"Соревнование {self.contest_id} запущено в самостоятельном режиме: {self.total_tasks} задач")
+            return
+        self.ticker.start(self.start_at)
+        logger.info(f"Соревнование {self.contest_id} запущено: {self.total_tasks} задач, старт {self.ticker.started_at.isoformat()}")
+
+    async def stop(self):
+        self.ticker.stop()
+        if self.issuer is not None:
+            self.issuer.stop()
+        for team_name in list(self.connections.active_connections):
+            await self.connections.disconnect(team_name)
+        logger.info(f"Соревнование {self.contest_id} остановлено")
+
+    async def team_frame(self, team: str) -> Optional[str]:
+        """Текущее задание команды (в самостоятельном режиме первое выдается при первом обращении)"""
+        if self.issuer is not None:
+            return await self.issuer.join(team)
+        return self.current_frame
+
+    def team_task_id(self, team: str) -> int:
+        if self.issuer is not None:
+            return self.issuer.current_task_id(team)
+        return self.issued
+
+    async def save_submission(self, team: str, content: bytes, task_id: Optional[int] = None) -> str:
+        """
+        Сохранение решения в пространстве соревнования
+        :param team: Имя команды
+        :param content: Содержимое решения
+        :param task_id: Номер задания (по умолчанию - текущее задание команды)
+        :return: Имя файла решения
+        """
+        received_at = datetime.utcnow()
+        if task_id is None:
+            task_id = self.team_task_id(team)
+        filename = f"{team}_{task_id:03}_{received_at.strftime('%Y%m%dT%H%M%S%f')}.json"
+        async with aiofiles.open(os.path.join(self.submissions_dir, filename), "wb") as out:
+            await out.write(content)
+        if submission_store is not None:
+            await submission_store.add(
+                team,
+                contest_id=self.contest_id,
+                task_id=task_id,
+                submission_file=filename,
+                received_at=received_at,
+                status="received",
+            )
+        self.submission_count += 1
+        return filename
+
+    def status(self) -> Dict:
+        return {
+            "contest_id": self.contest_id,
+            "mode": self.mode,
+            "issued_tasks": self.issued,
+            "total_tasks": self.total_tasks,
+            "active_connections": len(self.connections.active_connections),
+            "submissions": self.submission_count,
+            "started_at": self.ticker.started_at.isoformat() if self.ticker.started_at else None,
+            "interval": self.ticker.interval,
+        }
+
+
+class ContestRegistry:
+    """Реестр соревнований, работающих в одном процессе"""
+
+    def __init__(self):
+        self.contests: Dict[str, Contest] = {}
+
+    def create(self, contest_id: str, pool_path: str, **kwargs) -> Contest:
+        if not CONTEST_ID_PATTERN.match(contest_id):
+            raise ValueError("Идентификатор соревнования может содержать только буквы, цифры, '_' и '-'")
+        if contest_id in self.contests:
+            raise ValueError(f"Соревнование {contest_id} уже существует")
+        contest = Contest(contest_id, pool_path, **kwargs)
+        self.contests[contest_id] = contest
+        contest.start()
+        return contest
+
+    def get(self, contest_id: str) -> Optional[Contest]:
+        return self.contests.get(contest_id)
+
+    async def remove(self, contest_id: str) -> bool:
+        contest = self.contests.pop(contest_id, None)
+        if contest is None:
+            return False
+        await contest.stop()
+        return True
+
+    async def stop_all(self):
+        for contest_id in list(self.contests):
+            await self.remove(contest_id)
+
+    def list(self) -> List[Dict]:
+        return [contest.status() for contest in self.contests.values()]
+
+
+contest_registry = ContestRegistry()
+
+router = APIRouter(prefix="/contests", tags=["contests"])
+
+
+def _get_contest(contest_id: str) -> Contest:
+    contest = contest_registry.get(contest_id)
+    if contest is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Соревнование не найдено")
+    return contest
+
+
+def _log_archive_result(contest_id: str, future: "asyncio.Future") -> None:
+    """Логирует итог фоновой архивации, иначе ошибка потерялась бы вместе с future"""
+    if future.cancelled():
+        logger.warning(f"Архивация соревнования {contest_id} отменена")
+    elif future.exception() is not None:
+        logger.error(f"Ошибка архивации соревнования {contest_id}: {future.exception()!r}")
+
+
+@router.get("")
+async def list_contests():
+    """Список соревнований, работающих на сервере"""
+    return {"contests": contest_registry.list()}
+
+
+@router.post("", dependencies=[Depends(require_admin)])
+async def create_contest(contest_data: ContestCreate):
+    """Создание и запуск соревнования"""
+    try:
+        contest = contest_registry.create(
+            contest_data.contest_id,
+            contest_data.pool_path,
+            interval=contest_data.interval,
+            start_at=contest_data.start_at,
+            max_tasks=contest_data.max_tasks,
+            mode=contest_data.mode,
+        )
+    except (ValueError, OSError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return contest.status()
+
+
+@router.delete("/{contest_id}", dependencies=[Depends(require_admin)])
+async def delete_contest(contest_id: str, archive: bool = True):
+    """Остановка соревнования; решения завершенного соревнования архивируются в фоне"""
+    if not await contest_registry.remove(contest_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Соревнование не найдено")
+    if archive:
+        future = asyncio.get_running_loop().run_in_executor(None, archive_contest, contest_id)
+        future.add_done_callback(lambda f: _log_archive_result(contest_id, f))
+    return {"status": "stopped", "contest_id": contest_id, "archiving": archive}
+
+
+@router.post("/{contest_id}/archive", dependencies=[Depends(require_admin)])
+async def archive_finished_contest(contest_id: str):
+    """Архивация решений соревнования, которое уже не работает на сервере"""
+    if not CONTEST_ID_PATTERN.match(contest_id):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Некорректный идентификатор соревнования")
+    if contest_registry.get(contest_id) is not None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Соревнование еще идет")
+    stats = await asyncio.get_running_loop().run_in_executor(None, archive_contest, contest_id)
+    return {"contest_id": contest_id, **stats}
+
+
+@router.get("/{contest_id}")
+async def get_contest(contest_id: str):
+    return _get_contest(contest_id).status()
+
+
+@router.get("/{contest_id}/task")
+async def get_contest_task(contest_id: str, team: str = Depends(verify_token)):
+    """Текущее задание соревнования (готовый кадр, без повторной сериализации)"""
+    contest = _get_contest(contest_id)
+    frame = await contest.team_frame(team)
+    if frame is None:
+        return {"error": "Нет доступных заданий"}
+    return Response(content=frame, media_type="application/json")
+
+
+@router.post("/{contest_id}/submit")
+async def submit_contest_solution(
+    contest_id: str,
+    file: UploadFile = File(...),
+    team: str = Depends(verify_token)
+):
+    """Прием решения в пространстве соревнования"""
+    contest = _get_contest(contest_id)
+    # Задание фиксируется до ожиданий: пока читается и сохраняется решение, срок может истечь
+    task_id = contest.team_task_id(team)
+    filename = await contest.save_submission(team, await file.read(), task_id)
+    if contest.issuer is not None:
+        # В самостоятельном режиме следующее задание выдается сразу после решения
+        await contest.issuer.on_submit(team, task_id - 1)
+    return {"status": "SUCCESS", "contest_id": contest_id, "task_id": task_id, "filename": filename}
+
+
+@router.websocket("/{contest_id}/ws/{team}")
+async def contest_websocket(websocket: WebSocket, contest_id: str, team: str, token: str = None):
+    """
+    Подключение команды к соревнованию; токен передается параметром ?token=
+    и должен принадлежать команде team
+    """
+    if not token:
+        await websocket.close(code=4001, reason="Требуется токен")
+        return
+    try:
+        token_team = authenticate_token(token)
+    except HTTPException:
+        await websocket.close(code=4001, reason="Неверный токен")
+        return
+    if token_team != team:
+        await websocket.close(code=4003, reason="Токен выдан другой команде")
+        return
+
+    contest = contest_registry.get(contest_id)
+    if contest is None:
+        await websocket.close(code=4004, reason="Соревнование не найдено")
+        return
+
+    await contest.connections.connect(team, websocket)
+    if contest.issuer is not None and team not in contest.issuer.cursors:
+        # Первое задание самостоятельного режима отправляется внутри join
+        await contest.issuer.join(team)
+    else:
+        frame = await contest.team_frame(team)
+        if frame is not None:
+            # Подключившиеся позже сразу получают текущее задание
+            await contest.connections.send_message(team, frame)
+    try:
+        while True:
+            await websocket.receive_text()
+            await ws_message_allowed(websocket, team)
+    except Exception:
+        await contest.connections.disconnect(team)
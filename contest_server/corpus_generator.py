@@ -0,0 +1,408 @@
+"""
+Синтетический корпус для бенчмарков оценки решений: задачи неразмеченного датасета
+(генераторы dataset_generator.py), эталонные ответы к ним и решения команд заданного качества.
+
+- обнаружение объектов: рамки решений сдвинуты так, чтобы IoU с эталоном был
+  точно равен выбранному значению; часть рамок пропущена, добавлены ложные срабатывания;
+- ключевые точки: эталонные точки COCO с гауссовым шумом, пропорциональным диагонали изображения;
+- сегментация: маски в заявленном разрешении задачи (2048-8192), сохраняются в .npy и/или RLE (.npz);
+  маска решения - эталон, в котором доля областей заменена случайными классами;
+- классификация: верный класс с вероятностью, равной качеству.
+
+Структура корпуса:
+    ground_truth.jsonl   - задача, ее тип и эталонный ответ (маски - ссылками на файлы)
+    submissions.jsonl    - решения в формате ExpectedTaskResponse и ожидаемые метрики (expected)
+    masks/               - маски эталона и решений
+    manifest.json        - параметры генерации
+
+Результат детерминирован: зависит от seed и параметров, но не от числа процессов.
+
+Запуск: python -m contest_server.corpus_generator 200 corpus --teams 10 --quality 0.3:0.95 --seed 1
+"""
+import json
+import logging
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from contest_server.dataset_generator import UnlabeledDatasetGenerator
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+MASK_FORMATS = ("npy", "rle", "both")
+MASK_GRID = 64  # эталонная маска - сетка MASK_GRID x MASK_GRID областей, растянутая до размера изображения
+NOISE_GRID = 128  # сетка областей, которые портятся в маске решения
+QUALITY_SPREAD = 0.05  # разброс качества отдельных решений вокруг уровня команды
+
+CLASSIFICATION_CLASSES = ["cat", "dog", "bird", "car", "person", "bicycle", "tree", "building"]
+DETECTION_CLASSES = ["person", "car", "bicycle", "motorcycle", "traffic_light", "stop_sign"]
+COCO_KEYPOINTS = [
+    "nose", "left_eye", "right_eye", "left_ear", "right_ear",
+    "left_shoulder", "right_shoulder", "left_elbow", "right_elbow", "left_wrist", "right_wrist",
+    "left_hip", "right_hip", "left_knee", "right_knee", "left_ankle", "right_ankle",
+]
+
+
+# --- Маски ---
+
+def rle_encode(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Кодирование маски сериями по строкам (row-major)
+    :return: (значения серий, длины серий)
+    """
+    flat = mask.ravel()
+    starts = np.concatenate(([0], np.flatnonzero(flat[1:] != flat[:-1]) + 1))
+    lengths = np.diff(np.concatenate((starts, [flat.size]))).astype(np.uint32)
+    return flat[starts], lengths
+
+
+def rle_decode(values: np.ndarray, lengths: np.ndarray, shape: Tuple[int, int]) -> np.ndarray:
+    return np.repeat(values, lengths).reshape(shape)
+
+
+def save_mask(mask: np.ndarray, path: Path, mask_format: str) -> Dict[str, str]:
+    """
+    Сохранение маски
+    :param path: Путь без расширения
+    :return: Относительные имена файлов по форматам
+    """
+    files = {}
+    if mask_format in ("npy", "both"):
+        np.save(f"{path}.npy", mask)
+        files["npy"] = f"{path.parent.name}/{path.name}.npy"
+    if mask_format in ("rle", "both"):
+        values, lengths = rle_encode(mask)
+        np.savez(f"{path}.rle.npz", shape=np.array(mask.shape), values=values, lengths=lengths)
+        files["rle"] = f"{path.parent.name}/{path.name}.rle.npz"
+    return files
+
+
+def load_mask(path: str) -> np.ndarray:
+    """Загрузка маски из .npy или .rle.npz"""
+    if path.endswith(".npz"):
+        with np.load(path) as data:
+            return rle_decode(data["values"], data["lengths"], tuple(data["shape"]))
+    return np.load(path)
+
+
+def _upsample(grid: np.ndarray, size: int) -> np.ndarray:
+    """Растягивание сетки областей до size x size (размер кратен сетке)"""
+    factor = size // grid.shape[0]
+    return np.repeat(np.repeat(grid, factor, axis=0), factor, axis=1)
+
+
+def ground_truth_mask(size: int, classes: int, np_rng: np.random.Generator) -> np.ndarray:
+    grid = np_rng.integers(0, classes, size=(MASK_GRID, MASK_GRID), dtype=np.uint8)
+    return _upsample(grid, size)
+
+
+def corrupt_mask(mask: np.ndarray, classes: int, quality: float, np_rng: np.random.Generator) -> np.ndarray:
+    """Маска решения: доля (1 - quality) областей NOISE_GRID заменена случайными классами"""
+    noise = np_rng.random((NOISE_GRID, NOISE_GRID)) > quality
+    replacement = np_rng.integers(0, classes, size=(NOISE_GRID, NOISE_GRID), dtype=np.uint8)
+    size = mask.shape[0]
+    return np.where(_upsample(noise, size), _upsample(replacement, size), mask)
+
+
+# --- Рамки и точки ---
+
+def jitter_box(box: Dict[str, float], iou: float, width: int, height: int, rng: random.Random) -> Dict[str, float]:
+    """
+    Сдвиг рамки, при котором IoU с исходной равен iou (если рамка не упирается в край изображения).
+    Доля перекрытия r = 2 * iou / (1 + iou) делится между осями: r = a * b.
+    """
+    overlap = 2 * iou / (1 + iou)
+    split = rng.random()
+    a, b = overlap ** split, overlap ** (1 - split)
+    dx = box["width"] * (1 - a) * rng.choice((-1, 1))
+    dy = box["height"] * (1 - b) * rng.choice((-1, 1))
+    x = min(max(0.0, box["x"] + dx), width - box["width"])
+    y = min(max(0.0, box["y"] + dy), height - box["height"])
+    return {"x": round(x, 2), "y": round(y, 2), "width": box["width"], "height": box["height"]}
+
+
+def box_iou(first: Dict[str, float], second: Dict[str, float]) -> float:
+    ix = max(0.0, min(first["x"] + first["width"], second["x"] + second["width"]) - max(first["x"], second["x"]))
+    iy = max(0.0, min(first["y"] + first["height"], second["y"] + second["height"]) - max(first["y"], second["y"]))
+    inter = ix * iy
+    union = first["width"] * first["height"] + second["width"] * second["height"] - inter
+    return inter / union if union else 0.0
+
+
+def _random_box(width: int, height: int, rng: random.Random) -> Dict[str, float]:
+    w = rng.uniform(0.03, 0.3) * width
+    h = rng.uniform(0.03, 0.3) * height
+    return {
+        "x": round(rng.uniform(0, width - w), 2),
+        "y": round(rng.uniform(0, height - h), 2),
+        "width": round(w, 2),
+        "height": round(h, 2),
+    }
+
+
+# --- Эталон и решения по типам задач ---
+
+def _task_quality(skill: float, rng: random.Random) -> float:
+    return min(0.99, max(0.01, rng.gauss(skill, QUALITY_SPREAD)))
+
+
+def _classification(data, rng, np_rng, task_id, masks_dir, mask_format):
+    label = rng.choice(CLASSIFICATION_CLASSES)
+    answer = {"classifications": [label]}
+
+    def solve(quality: float, team_rng: random.Random, team_np_rng, team: str):
+        correct = team_rng.random() < quality
+        predicted = label if correct else team_rng.choice([c for c in CLASSIFICATION_CLASSES if c != label])
+        return {"classifications": [predicted]}, {"correct": correct}
+    return answer, solve
+
+
+def _object_detection(data, rng, np_rng, task_id, masks_dir, mask_format):
+    width = data["image_properties"]["width"]
+    height = data["image_properties"]["height"]
+    boxes = []
+    for _ in range(rng.randint(1, 20)):
+        box = _random_box(width, height, rng)
+        box["class"] = rng.choice(DETECTION_CLASSES)
+        boxes.append(box)
+    answer = {"bounding_boxes": boxes}
+
+    def solve(quality: float, team_rng: random.Random, team_np_rng, team: str):
+        predicted, ious = [], []
+        for box in boxes:
+            if team_rng.random() < (1 - quality) * 0.5:
+                ious.append(0.0)  # пропущенный объект
+                continue
+            target = min(0.99, max(0.05, team_rng.gauss(quality, 0.1)))
+            jittered = jitter_box(box, target, width, height, team_rng)
+            jittered["class"] = box["class"]
+            jittered["confidence"] = round(min(1.0, max(0.0, team_rng.gauss(quality, 0.1))), 3)
+            predicted.append(jittered)
+            ious.append(round(box_iou(box, jittered), 4))
+        false_positives = team_rng.randint(0, round((1 - quality) * 4))
+        for _ in range(false_positives):
+            box = _random_box(width, height, team_rng)
+            box["class"] = team_rng.choice(DETECTION_CLASSES)
+            box["confidence"] = round(team_rng.uniform(0.05, 0.6), 3)
+            predicted.append(box)
+        return {"bounding_boxes": predicted}, {"iou": ious, "false_positives": false_positives}
+    return answer, solve
+
+
+def _keypoint(data, rng, np_rng, task_id, masks_dir, mask_format):
+    width = data["image_properties"]["width"]
+    height = data["image_properties"]["height"]
+    people = []
+    for _ in range(rng.randint(1, 4)):
+        cx, cy = rng.uniform(0.2, 0.8) * width, rng.uniform(0.2, 0.8) * height
+        scale = rng.uniform(0.1, 0.3) * height
+        people.append([
+            {
+                "name": name,
+                "x": round(min(width, max(0.0, cx + rng.gauss(0, scale / 3))), 2),
+                "y": round(min(height, max(0.0, cy + rng.gauss(0, scale / 2))), 2),
+                "visibility": rng.choice((0, 1, 2, 2, 2)),
+            }
+            for name in COCO_KEYPOINTS
+        ])
+    answer = {"keypoints": people}
+    diagonal = math.hypot(width, height)
+
+    def solve(quality: float, team_rng: random.Random, team_np_rng, team: str):
+        sigma = (1 - quality) * 0.05 * diagonal
+        predicted, errors = [], []
+        for person in people:
+            points = []
+            for point in person:
+                if point["visibility"] == 0:
+                    continue
+                x = point["x"] + team_rng.gauss(0, sigma)
+                y = point["y"] + team_rng.gauss(0, sigma)
+                errors.append(round(math.hypot(x - point["x"], y - point["y"]), 2))
+                points.append({
+                    "name": point["name"],
+                    "x": round(x, 2),
+                    "y": round(y, 2),
+                    "confidence": round(min(1.0, max(0.0, team_rng.gauss(quality, 0.1))), 3),
+                })
+            predicted.append(points)
+        return {"keypoints": predicted}, {"distance_error": errors, "sigma": round(sigma, 2)}
+    return answer, solve
+
+
+def _segmentation(data, rng, np_rng, task_id, masks_dir, mask_format):
+    size = data["mask_format"]["size"][0]
+    classes = data["mask_format"]["classes_expected"]
+    mask = ground_truth_mask(size, classes, np_rng)
+    answer = {
+        "segmentation_mask": save_mask(mask, masks_dir / f"gt_{task_id:06d}", mask_format),
+        "size": [size, size],
+        "classes": classes,
+    }
+
+    def solve(quality: float, team_rng: random.Random, team_np_rng, team: str):
+        predicted = corrupt_mask(mask, classes, quality, team_np_rng)
+        files = save_mask(predicted, masks_dir / f"{team}_{task_id:06d}", mask_format)
+        pixel_accuracy = float(np.count_nonzero(predicted == mask)) / mask.size
+        return {"segmentation_mask": files}, {"pixel_accuracy": round(pixel_accuracy, 4)}
+    return answer, solve
+
+
+TASK_TYPES = {
+    "classification": ("generate_classification_data", _classification),
+    "object_detection": ("generate_object_detection_data", _object_detection),
+    "segmentation": ("generate_segmentation_data", _segmentation),
+    "keypoint_detection": ("generate_keypoint_data", _keypoint),
+}
+
+
+def team_skills(teams: int, quality_range: Tuple[float, float], seed: int) -> Dict[str, float]:
+    """Уровень команд равномерно распределен по диапазону качества"""
+    low, high = quality_range
+    rng = random.Random(f"{seed}:teams")
+    return {f"team_{i:03d}": round(rng.uniform(low, high), 3) for i in range(teams)}
+
+
+def generate_task_corpus(job: Tuple) -> Tuple[str, List[str]]:
+    """
+    Эталон и решения для одной задачи (выполняется в процессе пула)
+    :return: (строка ground_truth.jsonl, строки submissions.jsonl)
+    """
+    index, seed, skills, output_dir, mask_format, max_mask_size, task_types = job
+    rng = random.Random(f"{seed}:corpus:{index}")
+    np_rng = np.random.default_rng([seed, index])
+    task_type = rng.choice(task_types)
+    method, build = TASK_TYPES[task_type]
+
+    data = getattr(UnlabeledDatasetGenerator(), method)(index, rng)
+    if task_type == "segmentation" and max_mask_size:
+        size = min(data["mask_format"]["size"][0], max_mask_size)
+        data["mask_format"]["size"] = [size, size]
+    task_id = index + 1
+    masks_dir = Path(output_dir) / "masks"
+    answer, solve = build(data, rng, np_rng, task_id, masks_dir, mask_format)
+
+    submissions = []
+    for team_number, (team, skill) in enumerate(skills.items()):
+        team_rng = random.Random(f"{seed}:{team}:{index}")
+        team_np_rng = np.random.default_rng([seed, index, team_number + 1])
+        quality = _task_quality(skill, team_rng)
+        annotations, expected = solve(quality, team_rng, team_np_rng, team)
+        submissions.append(json.dumps({
+            "team": team,
+            "task_id": task_id,
+            "quality": round(quality, 4),
+            "solution": {
+                "annotations": annotations,
+                "confidence": round(min(1.0, max(0.0, team_rng.gauss(quality, 0.05))), 3),
+                "processing_time": round(team_rng.lognormvariate(0, 0.5), 3),
+            },
+            "expected": expected,
+        }, separators=(",", ":")))
+
+    ground_truth = json.dumps({
+        "task_id": task_id,
+        "name": f"raw_{task_id:06d}",
+        "task_type": task_type,
+        "task": data,
+        "answer": answer,
+    }, ensure_ascii=False, separators=(",", ":"))
+    return ground_truth, submissions
+
+
+def generate_corpus(
+    tasks: int,
+    output_dir: str,
+    teams: int = 10,
+    quality_range: Tuple[float, float] = (0.3, 0.95),
+    seed: int = 0,
+    workers: Optional[int] = None,
+    mask_format: str = "both",
+    max_mask_size: Optional[int] = None,
+    task_types: Tuple[str, ...] = tuple(TASK_TYPES),
+) -> Dict[str, Any]:
+    """
+    Генерация корпуса
+    :param tasks: Количество задач
+    :param teams: Количество команд; решение каждой команды на каждую задачу
+    :param quality_range: Диапазон уровня команд (0..1)
+    :param mask_format: npy, rle или both
+    :param max_mask_size: Ограничение разрешения масок (для быстрых прогонов); по умолчанию - как в задаче
+    :param task_types: Типы задач, из которых выбирается тип каждой задачи
+    :return: Манифест корпуса
+    """
+    if mask_format not in MASK_FORMATS:
+        raise ValueError(f"Unknown mask format: {mask_format}")
+    if max_mask_size is not None and (max_mask_size <= 0 or max_mask_size % NOISE_GRID):
+        raise ValueError(f"max_mask_size must be a positive multiple of {NOISE_GRID}")
+    started = time.perf_counter()
+    output = Path(output_dir)
+    (output / "masks").mkdir(parents=True, exist_ok=True)
+    skills = team_skills(teams, quality_range, seed)
+    jobs = [
+        (index, seed, skills, str(output), mask_format, max_mask_size, tuple(task_types))
+        for index in range(tasks)
+    ]
+
+    submitted = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor, \
+            open(output / "ground_truth.jsonl", "w", encoding="utf-8") as truth_file, \
+            open(output / "submissions.jsonl", "w", encoding="utf-8") as submissions_file:
+        # map возвращает задачи по порядку: файлы одинаковы при любом числе процессов
+        for done, (ground_truth, submissions) in enumerate(executor.map(generate_task_corpus, jobs), 1):
+            truth_file.write(ground_truth + "\n")
+            for line in submissions:
+                submissions_file.write(line + "\n")
+            submitted += len(submissions)
+            if done % max(1, tasks // 10) == 0 or done == tasks:
+                logger.info(f"[corpus] {done}/{tasks} tasks")
+
+    manifest = {
+        "tasks": tasks,
+        "submissions": submitted,
+        "teams": skills,
+        "quality_range": list(quality_range),
+        "seed": seed,
+        "mask_format": mask_format,
+        "max_mask_size": max_mask_size,
+        "task_types": list(task_types),
+    }
+    with open(output / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    logger.info(f"Generated corpus of {tasks} tasks and {submitted} submissions in {time.perf_counter() - started:.1f} s")
+    return manifest
+
+
+if __name__ == "__main__":
+    import argparse
+
+    def parse_range(value: str) -> Tuple[float, float]:
+        low, _, high = value.partition(":")
+        return float(low), float(high or low)
+
+    parser = argparse.ArgumentParser(description="Генерация эталонов и решений команд для бенчмарков оценки")
+    parser.add_argument("tasks", type=int, help="Количество задач")
+    parser.add_argument("output", help="Директория корпуса")
+    parser.add_argument("--teams", type=int, default=10)
+    parser.add_argument("--quality", type=parse_range, default=(0.3, 0.95), help="Диапазон уровня команд, например 0.3:0.95")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--mask-format", choices=MASK_FORMATS, default="both")
+    parser.add_argument("--max-mask-size", type=int, default=None, help="Ограничение разрешения масок")
+    parser.add_argument("--types", nargs="+", choices=list(TASK_TYPES), default=list(TASK_TYPES))
+    args = parser.parse_args()
+
+    generate_corpus(
+        args.tasks, args.output, args.teams, args.quality, args.seed,
+        args.workers, args.mask_format, args.max_mask_size, tuple(args.types),
+    )
@@ -1,12 +1,16 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Text, ForeignKey, UniqueConstraint
+from sqlalchemy import create_engine, event, Column, Integer, String, DateTime, Boolean, Text, ForeignKey, UniqueConstraint, Index, and_, or_, inspect, literal, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import Session, sessionmaker, relationship, synonym
 from datetime import datetime
 import json
 import os
+import time
 from typing import Optional, List
 import logging
 
+from contest_server.metrics import DB_COMMIT_LATENCY, DB_ROLLBACKS
+
 # Настройка логирования
 logging.basicConfig(
     level=logging.INFO,
@@ -17,18 +21,23 @@ logger = logging.getLogger(__name__)
 # Создаем базовый класс для моделей
 Base = declarative_base()
 
-# Определяем модели
+# Определяем модели (Solution и User из models.py объявлены на этом же Base)
 class Team(Base):
     __tablename__ = 'teams'
     
     id = Column(Integer, primary_key=True)
     name = Column(String(50), nullable=False, unique=True)
-    token = Column(String(256), nullable=False, unique=True)
+    token = Column(String(256), unique=True)  # команды с входом по паролю токен не хранят
+    status = Column(String(20), default="disconnected")  # connected/disconnected
     last_seen = Column(DateTime)
     created_at = Column(DateTime, default=datetime.utcnow)
     is_active = Column(Boolean, default=True)
+    # Вход по паролю (main_server.py: /createTeam, /login)
+    userId = Column(String(50), unique=True, index=True)
+    passs = Column(String(256))  # Хранение хеша пароля
+    dateCreate = synonym("created_at")
     
-    submissions = relationship("Submission", back_populates="team")
+    submissions = relationship("Submission", back_populates="team", foreign_keys="Submission.team_id")
     
     def __repr__(self):
         return f"<Team(id={self.id}, name='{self.name}')>"
@@ -39,35 +48,70 @@ class Task(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False, unique=True)
     content = Column(Text, nullable=False)
+    content_hash = Column(String(64))  # sha256 исходного файла задания
     answer = Column(Text)
     is_sent = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     issued_at = Column(DateTime)
     difficulty = Column(Integer, default=1)  # 1-5
     max_attempts = Column(Integer, default=3)
+    task_file = Column(String(255))  # файл пула tasks_pool, из которого взято задание
+    taskId = synonym("id")
     
     submissions = relationship("Submission", back_populates="task")
     
+    __table_args__ = (
+        # Порядок выдачи заданий: (created_at, id)
+        Index('ix_tasks_issue_order', 'created_at', 'id'),
+    )
+    
     def __repr__(self):
         return f"<Task(id={self.id}, name='{self.name}')>"
 
+class IssueCursor(Base):
+    """Курсор выдачи заданий: единственная строка с ключом последнего выданного задания"""
+    __tablename__ = 'issue_cursor'
+    
+    id = Column(Integer, primary_key=True)
+    position = Column(Integer, nullable=False, default=0)  # количество выданных заданий
+    last_task_id = Column(Integer)
+    last_created_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<IssueCursor(position={self.position}, last_task_id={self.last_task_id})>"
+
+ISSUE_CURSOR_ID = 1
+POOL_CURSOR_ID = 2  # курсор выдачи из пула tasks_pool (main.py): position - номер последнего выданного задания
+
 class Submission(Base):
+    """
+    Решения команд: проверяемое решение задания (одно на пару команда-задание)
+    и журнал попыток main.py (team_name, task_file, submission_file)
+    """
     __tablename__ = 'submissions'
     
     id = Column(Integer, primary_key=True)
-    team_id = Column(Integer, ForeignKey('teams.id'), nullable=False)
-    task_id = Column(Integer, ForeignKey('tasks.id'), nullable=False)
-    content = Column(Text, nullable=False)
+    team_id = Column(Integer, ForeignKey('teams.id'))
+    task_id = Column(Integer, ForeignKey('tasks.id'))
+    content = Column(Text)
     status = Column(String(20), default='pending')
     received_at = Column(DateTime, default=datetime.utcnow)
     processed_at = Column(DateTime)
     score = Column(Integer)
     feedback = Column(Text)
+    # Журнал попыток main.py
+    team_name = Column(String(50), ForeignKey('teams.name'))
+    task_file = Column(String(255))
+    submission_file = Column(String(255))
+    submitted_at = Column(DateTime)
+    processing_time = Column(Integer)  # в миллисекундах
     
-    team = relationship("Team", back_populates="submissions")
+    team = relationship("Team", back_populates="submissions", foreign_keys=[team_id])
     task = relationship("Task", back_populates="submissions")
     
     __table_args__ = (
+        # Строки журнала main.py без team_id/task_id ограничению не мешают (NULL не равен NULL)
         UniqueConstraint('team_id', 'task_id', name='unique_team_task_submission'),
     )
     
@@ -77,15 +121,91 @@ class Submission(Base):
 # Настройка подключения к БД
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./contest.db")
 
+# Асинхронные драйверы для путей запросов и WebSocket
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+# Настройки SQLite для каждого нового соединения: WAL позволяет читать во время записи,
+# synchronous=NORMAL в режиме WAL сбрасывает на диск только на контрольных точках
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # отрицательное значение - в КиБ (64 МиБ)
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,  # мс ожидания блокировки писателя вместо немедленной ошибки
+}
+
+def _enable_incremental_vacuum(sqlite_engine) -> None:
+    """
+    Переводит новый (пустой) файл SQLite в режим auto_vacuum=INCREMENTAL, чтобы архивация сжимала
+    базу порциями. После включения WAL режим меняется только через VACUUM, но для пустой базы он
+    мгновенный; базы с таблицами не трогаются (см. submission_store.incremental_vacuum)
+    """
+    with sqlite_engine.connect() as conn:
+        if not inspect(conn).get_table_names() and conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+            conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.exec_driver_sql("VACUUM")
+
+def _async_database_url(url: str) -> str:
+    """
+    Подбирает асинхронный драйвер для URL синхронного движка
+    """
+    scheme, sep, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_database_url(DATABASE_URL))
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Применяет SQLITE_PRAGMAS к новому DBAPI соединению (и sqlite3, и aiosqlite)
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
 # Создаем движок SQLAlchemy
 engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
 )
 
+# Асинхронный движок: запросы выполняются вне цикла событий и не задерживают отправку по WebSocket
+async_engine = create_async_engine(ASYNC_DATABASE_URL)
+
+if DATABASE_URL.startswith("sqlite"):
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+if ASYNC_DATABASE_URL.startswith("sqlite"):
+    event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+
+def _commit_started(session):
+    session.info["commit_started"] = time.perf_counter()
+
+def _commit_finished(session):
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        DB_COMMIT_LATENCY.observe(time.perf_counter() - started)
+
+def _rolled_back(session):
+    session.info.pop("commit_started", None)
+    DB_ROLLBACKS.inc()
+
+# Время commit (вместе с flush) для всех сессий, в том числе асинхронных
+event.listen(Session, "before_commit", _commit_started)
+event.listen(Session, "after_commit", _commit_finished)
+event.listen(Session, "after_rollback", _rolled_back)
+
 # Создаем фабрику сессий
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Фабрика асинхронных сессий; объекты не сбрасываются после commit, чтобы не было неявных запросов
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 def get_db():
     """
     Генератор для получения сессии базы данных
@@ -96,14 +216,24 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """
+    Генератор для получения асинхронной сессии базы данных
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def init_db(add_test_data: bool = False):
     """
     Инициализация базы данных
     :param add_test_data: Добавлять ли тестовые данные
     """
-    from contest_server.models import Base, Task
+    from contest_server import models  # noqa: F401 - регистрирует Solution и User на Base
     
+    if DATABASE_URL.startswith("sqlite"):
+        _enable_incremental_vacuum(engine)
     Base.metadata.create_all(bind=engine)
+    _ensure_schema()
     
     if add_test_data:
         db = SessionLocal()
@@ -128,6 +258,79 @@ def init_db(add_test_data: bool = False):
         finally:
             db.close()
 
+def _column_default_sql(column) -> str:
+    """
+    DEFAULT для ALTER TABLE: существующие строки получают то же значение, что и новые
+    """
+    default = column.default
+    if default is None or not default.is_scalar or default.arg is None:
+        return ""
+    value = literal(default.arg, column.type).compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+    return f" DEFAULT {value}"
+
+def _ensure_schema():
+    """
+    Доводит схему существующей базы до текущих моделей: столбцы, добавленные после
+    создания базы (в том числе базой старых моделей models.py), и их индексы.
+    Ограничения уникальности добавленных столбцов создаются уникальными индексами.
+    """
+    preparer = engine.dialect.identifier_preparer
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            added = [column for column in table.columns if column.name not in existing]
+            for column in added:
+                conn.execute(text(
+                    f"ALTER TABLE {preparer.quote(table.name)} ADD COLUMN {preparer.quote(column.name)} "
+                    f"{column.type.compile(dialect=engine.dialect)}{_column_default_sql(column)}"
+                ))
+            added_names = {column.name for column in added}
+            for constraint in table.constraints:
+                names = constraint.columns.keys()
+                if isinstance(constraint, UniqueConstraint) and added_names & set(names):
+                    index_name = constraint.name or f"ux_{table.name}_{'_'.join(names)}"
+                    conn.execute(text(
+                        f"CREATE UNIQUE INDEX IF NOT EXISTS {preparer.quote(index_name)} "
+                        f"ON {preparer.quote(table.name)} ({', '.join(preparer.quote(name) for name in names)})"
+                    ))
+    
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+def get_issue_cursor(db, cursor_id: int = ISSUE_CURSOR_ID) -> IssueCursor:
+    """
+    Возвращает строку курсора выдачи (создает ее при первом обращении)
+    :param cursor_id: ISSUE_CURSOR_ID (задания из базы) или POOL_CURSOR_ID (пул заданий)
+    """
+    cursor = db.get(IssueCursor, cursor_id)
+    if cursor is None:
+        cursor = IssueCursor(id=cursor_id, position=0)
+        db.add(cursor)
+        db.commit()
+    return cursor
+
+def issued_tasks_clause(cursor: IssueCursor):
+    """
+    Условие "задание уже выдано" для запросов по индексу ix_tasks_issue_order
+    """
+    if cursor.last_task_id is None:
+        return Task.id.is_(None)
+    return or_(
+        Task.created_at < cursor.last_created_at,
+        and_(Task.created_at == cursor.last_created_at, Task.id <= cursor.last_task_id)
+    )
+
+def is_task_issued(db, task: Task) -> bool:
+    """
+    Проверяет, выдано ли задание, сравнивая его ключ порядка с курсором
+    """
+    cursor = db.get(IssueCursor, ISSUE_CURSOR_ID)
+    if cursor is None or cursor.last_task_id is None:
+        return False
+    return (task.created_at, task.id) <= (cursor.last_created_at, cursor.last_task_id)
+
 def validate_submission(db: SessionLocal, team_id: int, task_id: int) -> Optional[str]:
     """
     Проверяет возможность отправки решения
@@ -145,7 +348,7 @@ def validate_submission(db: SessionLocal, team_id: int, task_id: int) -> Optiona
         task = db.query(Task).filter(Task.id == task_id).first()
         if not task:
             return "Task not found"
-        if not task.is_sent:
+        if not is_task_issued(db, task):
             return "Task is not available yet"
             
         # Проверяем количество попыток
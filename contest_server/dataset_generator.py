@@ -4,6 +4,10 @@ from datetime import datetime, timedelta
 from pathlib import Path
 import uuid
 
+def _short_id(rng: random.Random) -> str:
+    """Короткий идентификатор изображения; при заданном rng воспроизводим"""
+    return uuid.UUID(int=rng.getrandbits(128), version=4).hex[:8]
+
 class UnlabeledDatasetGenerator:
     def __init__(self):
         self.base_url = "https://storage.googleapis.com/dataset/images"
@@ -30,55 +34,55 @@ class UnlabeledDatasetGenerator:
         self.times_of_day = ["morning", "afternoon", "evening", "night"]
         self.environments = ["urban", "suburban", "rural", "industrial"]
         
-    def generate_classification_data(self, index: int) -> dict:
+    def generate_classification_data(self, index: int, rng: random.Random = random) -> dict:
         """Генерация данных для задачи классификации"""
-        image_size = random.choice([(224, 224), (299, 299), (384, 384), (512, 512)])
+        image_size = rng.choice([(224, 224), (299, 299), (384, 384), (512, 512)])
         return {
-            "image_id": f"cls_{uuid.uuid4().hex[:8]}",
+            "image_id": f"cls_{_short_id(rng)}",
             "image_url": f"{self.base_url}/classification_{index:03d}.jpg",
             "metadata": {
                 "timestamp": (self.start_date + timedelta(hours=index*2)).isoformat(),
-                "camera": random.choice(self.cameras["classification"]),
+                "camera": rng.choice(self.cameras["classification"]),
                 "resolution": [1920, 1080],
                 "format": "JPEG",
-                "size_bytes": random.randint(1000000, 5000000)
+                "size_bytes": rng.randint(1000000, 5000000)
             },
             "preprocessing": {
                 "resize": list(image_size),
                 "normalize": True,
                 "color_space": "RGB",
                 "augmentation": {
-                    "horizontal_flip": random.choice([True, False]),
-                    "rotation_range": random.randint(0, 30),
+                    "horizontal_flip": rng.choice([True, False]),
+                    "rotation_range": rng.randint(0, 30),
                     "brightness_range": [0.8, 1.2]
                 }
             }
         }
 
-    def generate_object_detection_data(self, index: int) -> dict:
+    def generate_object_detection_data(self, index: int, rng: random.Random = random) -> dict:
         """Генерация данных для задачи обнаружения объектов"""
-        location = random.choice(self.locations)
+        location = rng.choice(self.locations)
         return {
-            "image_id": f"det_{uuid.uuid4().hex[:8]}",
+            "image_id": f"det_{_short_id(rng)}",
             "image_url": f"{self.base_url}/detection_{index:03d}.jpg",
             "metadata": {
                 "timestamp": (self.start_date + timedelta(hours=index*2)).isoformat(),
                 "location": location,
-                "weather": random.choice(self.weather_conditions),
-                "time_of_day": random.choice(self.times_of_day),
-                "camera": random.choice(self.cameras["object_detection"])
+                "weather": rng.choice(self.weather_conditions),
+                "time_of_day": rng.choice(self.times_of_day),
+                "camera": rng.choice(self.cameras["object_detection"])
             },
             "image_properties": {
-                "width": random.choice([1920, 2560, 3840]),
-                "height": random.choice([1080, 1440, 2160]),
+                "width": rng.choice([1920, 2560, 3840]),
+                "height": rng.choice([1080, 1440, 2160]),
                 "channels": 3,
                 "format": "JPEG"
             },
             "scene_context": {
-                "environment": random.choice(self.environments),
-                "lighting": random.choice(["daylight", "artificial", "mixed", "low_light"]),
-                "weather_conditions": random.choice(self.weather_conditions),
-                "traffic_density": random.choice(["low", "medium", "high"])
+                "environment": rng.choice(self.environments),
+                "lighting": rng.choice(["daylight", "artificial", "mixed", "low_light"]),
+                "weather_conditions": rng.choice(self.weather_conditions),
+                "traffic_density": rng.choice(["low", "medium", "high"])
             },
             "bbox_format": {
                 "coordinate_system": "top_left",
@@ -86,26 +90,26 @@ class UnlabeledDatasetGenerator:
             }
         }
 
-    def generate_segmentation_data(self, index: int) -> dict:
+    def generate_segmentation_data(self, index: int, rng: random.Random = random) -> dict:
         """Генерация данных для задачи сегментации"""
-        location = random.choice(self.locations)
-        resolution = random.choice([10, 20, 30])
-        size = random.choice([(2048, 2048), (4096, 4096), (8192, 8192)])
+        location = rng.choice(self.locations)
+        resolution = rng.choice([10, 20, 30])
+        size = rng.choice([(2048, 2048), (4096, 4096), (8192, 8192)])
         return {
-            "image_id": f"seg_{uuid.uuid4().hex[:8]}",
+            "image_id": f"seg_{_short_id(rng)}",
             "image_url": f"{self.base_url}/segmentation_{index:03d}.jpg",
             "metadata": {
                 "timestamp": (self.start_date + timedelta(hours=index*2)).isoformat(),
-                "satellite": random.choice(self.cameras["segmentation"]),
+                "satellite": rng.choice(self.cameras["segmentation"]),
                 "bands": ["RGB", "NIR", "SWIR"],
-                "cloud_coverage": round(random.uniform(0, 0.3), 2),
+                "cloud_coverage": round(rng.uniform(0, 0.3), 2),
                 "resolution_meters": resolution,
                 "acquisition_date": (self.start_date + timedelta(days=index)).strftime("%Y-%m-%d")
             },
             "image_properties": {
                 "width": size[0],
                 "height": size[1],
-                "channels": random.choice([3, 4, 8]),
+                "channels": rng.choice([3, 4, 8]),
                 "format": "GeoTIFF"
             },
             "geographic_info": {
@@ -121,25 +125,25 @@ class UnlabeledDatasetGenerator:
             "mask_format": {
                 "encoding": "rle",
                 "size": list(size),
-                "classes_expected": random.randint(5, 10)
+                "classes_expected": rng.randint(5, 10)
             }
         }
 
-    def generate_keypoint_data(self, index: int) -> dict:
+    def generate_keypoint_data(self, index: int, rng: random.Random = random) -> dict:
         """Генерация данных для задачи определения ключевых точек"""
         return {
-            "image_id": f"kpt_{uuid.uuid4().hex[:8]}",
+            "image_id": f"kpt_{_short_id(rng)}",
             "image_url": f"{self.base_url}/keypoint_{index:03d}.jpg",
             "metadata": {
                 "timestamp": (self.start_date + timedelta(hours=index*2)).isoformat(),
-                "camera": random.choice(self.cameras["keypoint"]),
+                "camera": rng.choice(self.cameras["keypoint"]),
                 "capture_type": "RGB-D",
-                "subject_distance_meters": round(random.uniform(1.5, 4.0), 1),
+                "subject_distance_meters": round(rng.uniform(1.5, 4.0), 1),
                 "session_id": f"session_{index//5:02d}"
             },
             "image_properties": {
-                "width": random.choice([1280, 1920, 2560]),
-                "height": random.choice([720, 1080, 1440]),
+                "width": rng.choice([1280, 1920, 2560]),
+                "height": rng.choice([720, 1080, 1440]),
                 "channels": 3,
                 "format": "JPEG"
             },
@@ -147,8 +151,8 @@ class UnlabeledDatasetGenerator:
                 "available": True,
                 "format": "uint16",
                 "units": "millimeters",
-                "min_depth": random.randint(400, 600),
-                "max_depth": random.randint(4000, 5000),
+                "min_depth": rng.randint(400, 600),
+                "max_depth": rng.randint(4000, 5000),
                 "frame_aligned": True
             },
             "keypoint_format": {
@@ -158,15 +162,18 @@ class UnlabeledDatasetGenerator:
                 "skeleton_format": "COCO"
             },
             "capture_conditions": {
-                "lighting": random.choice(["indoor", "outdoor", "studio"]),
-                "background": random.choice(["neutral", "complex", "green_screen"]),
-                "occlusion": random.choice(["minimal", "moderate", "significant"]),
-                "motion_blur": random.choice(["none", "slight", "moderate"])
+                "lighting": rng.choice(["indoor", "outdoor", "studio"]),
+                "background": rng.choice(["neutral", "complex", "green_screen"]),
+                "occlusion": rng.choice(["minimal", "moderate", "significant"]),
+                "motion_blur": rng.choice(["none", "slight", "moderate"])
             }
         }
 
-    def generate_dataset(self, num_files: int = 50, output_dir: str = "dataset") -> None:
-        """Генерация датасета"""
+    def generate_dataset(self, num_files: int = 50, output_dir: str = "dataset", rng: random.Random = random) -> None:
+        """
+        Генерация датасета
+        :param rng: Источник случайности (по умолчанию - глобальное состояние random)
+        """
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
         
@@ -183,8 +190,8 @@ class UnlabeledDatasetGenerator:
         
         for i in range(num_files):
             # Выбираем генератор случайным образом
-            generator = random.choice(generators)
-            data = generator(i)
+            generator = rng.choice(generators)
+            data = generator(i, rng)
             
             # Сохраняем файл
             file_path = output_path / f"raw_{i+1:03d}.json"
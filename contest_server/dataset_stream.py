@@ -0,0 +1,158 @@
+"""
+Параллельная потоковая генерация больших пулов задач (100k+) для нагрузочного тестирования.
+
+Пул делится на шарды фиксированного размера; генератор случайных чисел каждого шарда
+инициализируется из (seed, вид данных, номер шарда), поэтому результат не зависит от количества
+процессов и порядка их завершения. Задачи пишутся компактным JSONL: одним файлом (шарды
+записываются по порядку по мере готовности) или файлом на шард.
+
+Запуск: python -m contest_server.dataset_stream 100000 dataset/raw.jsonl --kind raw --seed 1
+"""
+import json
+import logging
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from contest_server.dataset_generator import UnlabeledDatasetGenerator
+from contest_server.task_generator import generate_task
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SHARD_SIZE = 10000  # задач в шарде; меняет разбиение, а значит и результат при том же seed
+SHARD_PATTERN = "part-{shard:05d}.jsonl"
+
+KIND_RAW = "raw"  # неразмеченный датасет (dataset_generator.py)
+KIND_TASKS = "tasks"  # задачи с ограничениями (task_generator.py)
+KINDS = (KIND_RAW, KIND_TASKS)
+
+
+def shard_rng(seed: int, kind: str, shard: int) -> random.Random:
+    """Генератор шарда; строковое зерно детерминировано и не зависит от PYTHONHASHSEED"""
+    return random.Random(f"{seed}:{kind}:{shard}")
+
+
+def _raw_record_factory() -> Callable[[int, random.Random], Dict[str, Any]]:
+    generator = UnlabeledDatasetGenerator()
+    generators = [
+        generator.generate_classification_data,
+        generator.generate_object_detection_data,
+        generator.generate_segmentation_data,
+        generator.generate_keypoint_data,
+    ]
+
+    def make(index: int, rng: random.Random) -> Dict[str, Any]:
+        return rng.choice(generators)(index, rng)
+    return make
+
+
+def _record_factory(kind: str) -> Callable[[int, random.Random], Dict[str, Any]]:
+    if kind == KIND_RAW:
+        return _raw_record_factory()
+    if kind == KIND_TASKS:
+        return generate_task
+    raise ValueError(f"Unknown dataset kind: {kind}")
+
+
+def generate_shard_lines(kind: str, seed: int, shard: int, start: int, count: int) -> str:
+    """
+    Генерация одного шарда
+    :param start: Глобальный индекс первой задачи шарда
+    :param count: Количество задач в шарде
+    :return: Компактные JSON строки шарда
+    """
+    rng = shard_rng(seed, kind, shard)
+    make = _record_factory(kind)
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    return "".join(encoder.encode(make(index, rng)) + "\n" for index in range(start, start + count))
+
+
+def _shard_to_string(job: Tuple[str, int, int, int, int]) -> str:
+    return generate_shard_lines(*job)
+
+
+def _shard_to_file(job: Tuple[str, int, int, int, int, str]) -> int:
+    *shard_job, output_dir = job
+    lines = generate_shard_lines(*shard_job)
+    path = os.path.join(output_dir, SHARD_PATTERN.format(shard=shard_job[2]))
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(lines)
+    os.replace(tmp_path, path)
+    return shard_job[4]
+
+
+def _jobs(total: int, kind: str, seed: int, shard_size: int) -> Iterator[Tuple[str, int, int, int, int]]:
+    for shard, start in enumerate(range(0, total, shard_size)):
+        yield kind, seed, shard, start, min(shard_size, total - start)
+
+
+def generate_jsonl(
+    total: int,
+    output: str,
+    kind: str = KIND_RAW,
+    seed: int = 0,
+    workers: Optional[int] = None,
+    shard_size: int = SHARD_SIZE,
+    sharded: bool = False,
+) -> int:
+    """
+    Генерация пула задач в пуле процессов
+    :param total: Количество задач
+    :param output: Файл .jsonl или, при sharded, директория для файлов шардов
+    :param kind: raw - неразмеченный датасет, tasks - задачи с ограничениями
+    :param seed: Зерно; одинаковые (seed, kind, shard_size) дают побайтно одинаковый результат
+    :param workers: Количество процессов (по умолчанию - по числу ядер)
+    :param sharded: Писать по файлу на шард (каждый процесс пишет свой шард сам)
+    :return: Количество записанных задач
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown dataset kind: {kind}")
+    started = time.perf_counter()
+    jobs = list(_jobs(total, kind, seed, shard_size))
+    written = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        if sharded:
+            Path(output).mkdir(parents=True, exist_ok=True)
+            for stale in Path(output).glob("part-*.jsonl"):
+                stale.unlink()
+            for count in executor.map(_shard_to_file, [job + (output,) for job in jobs]):
+                written += count
+        else:
+            Path(output).parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = f"{output}.tmp"
+            # map возвращает шарды по порядку, поэтому файл пишется потоково и детерминированно
+            with open(tmp_path, "w", encoding="utf-8") as out:
+                for job, lines in zip(jobs, executor.map(_shard_to_string, jobs)):
+                    out.write(lines)
+                    written += job[4]
+                    logger.info(f"[generate] {written}/{total} tasks")
+            os.replace(tmp_path, output)
+
+    logger.info(f"Generated {written} records ({kind}) into {output} in {time.perf_counter() - started:.1f} s")
+    return written
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Параллельная генерация пула задач в JSONL")
+    parser.add_argument("total", type=int, help="Количество задач")
+    parser.add_argument("output", help="Файл .jsonl или директория шардов (с --sharded)")
+    parser.add_argument("--kind", choices=KINDS, default=KIND_RAW)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    parser.add_argument("--sharded", action="store_true", help="Файл на шард вместо одного файла")
+    args = parser.parse_args()
+
+    generate_jsonl(args.total, args.output, args.kind, args.seed, args.workers, args.shard_size, args.sharded)
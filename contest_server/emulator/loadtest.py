@@ -0,0 +1,333 @@
+"""
+Нагрузочный стенд на основе ParticipantEmulator.
+
+Команды распределяются по нескольким процессам; внутри процесса все команды используют одну
+сессию aiohttp с ограниченным пулом соединений. Часть команд получает задания только по WebSocket,
+остальные опрашивают GET /task. Моменты появления команд и время "обдумывания" решения задаются
+распределениями. Результат - JSON с пропускной способностью и перцентилями p50/p95/p99 для
+регистрации, получения задания, разброса доставки заданий и отправки решений.
+
+Разброс доставки считается по настенным часам: для каждого задания берется самое раннее получение
+среди всех команд; при запуске на нескольких машинах часы должны быть синхронизированы.
+
+Запуск: python loadtest.py --teams 500 --processes 4 --ws-ratio 0.5 --duration 120 --output result.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import multiprocessing
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from emulator import ParticipantEmulator
+
+logger = logging.getLogger(__name__)
+
+ARRIVALS = ("uniform", "poisson", "burst")
+THINK_DISTRIBUTIONS = ("fixed", "uniform", "exponential")
+MODE_WS = "ws"
+MODE_POLLING = "polling"
+PERCENTILES = (50, 95, 99)
+
+
+def arrival_offsets(count: int, window: float, kind: str, rng: random.Random) -> List[float]:
+    """
+    Моменты подключения команд относительно начала теста
+    :param count: Количество команд
+    :param window: Окно, в течение которого подключаются команды, секунды
+    :param kind: uniform - равномерно, poisson - пуассоновский поток, burst - все сразу
+    :return: Смещения в секундах, по возрастанию
+    """
+    if kind == "burst" or count == 0 or window <= 0:
+        return [0.0] * count
+    if kind == "uniform":
+        return [window * i / count for i in range(count)]
+    # Пуассоновский поток со средней интенсивностью count / window
+    rate = count / window
+    offsets, current = [], 0.0
+    for _ in range(count):
+        current += rng.expovariate(rate)
+        offsets.append(min(current, window))
+    return offsets
+
+
+def think_time(kind: str, mean: float, rng: random.Random) -> float:
+    """Задержка между получением задания и отправкой решения"""
+    if mean <= 0:
+        return 0.0
+    if kind == "fixed":
+        return mean
+    if kind == "uniform":
+        return rng.uniform(0, 2 * mean)
+    return rng.expovariate(1 / mean)
+
+
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    """Перцентиль по ближайшему рангу"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    values = sorted(values)
+    summary = {"count": len(values)}
+    for p in PERCENTILES:
+        value = percentile(values, p)
+        summary[f"p{p}"] = round(value * 1000, 3) if value is not None else None
+    summary["max"] = round(values[-1] * 1000, 3) if values else None
+    return summary
+
+
+class Samples:
+    """Наблюдения одного процесса; передаются в родительский процесс как словарь"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.deliveries: List[tuple] = []  # (ключ задания, режим, время получения)
+        self.scheduled_lag: List[float] = []  # получение по WebSocket относительно timestamp кадра
+
+    def to_dict(self) -> Dict:
+        return {
+            "latencies": dict(self.latencies),
+            "errors": dict(self.errors),
+            "deliveries": self.deliveries,
+            "scheduled_lag": self.scheduled_lag,
+        }
+
+
+class LoadParticipant(ParticipantEmulator):
+    """Участник стенда: замеряет задержки операций эмулятора и работает в одном из режимов"""
+
+    def __init__(self, config, session: aiohttp.ClientSession, team_name: str, mode: str,
+                 samples: Samples, rng: random.Random):
+        super().__init__(config.server, config.ws, session=session, team_name=team_name)
+        self.config = config
+        self.mode = mode
+        self.samples = samples
+        self.rng = rng
+        self.seen = set()
+        self.solving = set()  # задачи отправки решений, отменяются при остановке
+
+    async def _timed(self, name: str, operation):
+        start = time.perf_counter()
+        result = await operation
+        if result:
+            self.samples.latencies[name].append(time.perf_counter() - start)
+        else:
+            self.samples.errors[name] += 1
+        return result
+
+    async def register(self):
+        return await self._timed("registration", super().register())
+
+    async def get_task(self):
+        return await self._timed("task_fetch", super().get_task())
+
+    async def submit_solution(self, solution):
+        return await self._timed("submit", super().submit_solution(solution))
+
+    def _delivered(self, key: str) -> bool:
+        """Отмечает получение задания; False, если команда его уже видела"""
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        self.samples.deliveries.append((key, self.mode, time.time()))
+        return True
+
+    def _spawn_solve(self, task_content: str) -> None:
+        task = asyncio.create_task(self._solve(task_content))
+        self.solving.add(task)
+        task.add_done_callback(self.solving.discard)
+
+    async def _solve(self, task_content: str) -> None:
+        await asyncio.sleep(think_time(self.config.think, self.config.think_mean, self.rng))
+        solution = self.generate_solution(task_content)
+        if solution:
+            await self.submit_solution(solution)
+
+    async def handle_websocket(self):
+        """Получение заданий по WebSocket через общий пул соединений"""
+        url = f"{self.ws_url}/ws/{self.team_name}"
+        while self.is_running:
+            try:
+                async with self.session.ws_connect(url) as websocket:
+                    async for message in websocket:
+                        if message.type != aiohttp.WSMsgType.TEXT:
+                            break
+                        frame = json.loads(message.data)
+                        if "task_id" not in frame:
+                            continue  # TEAM_STATUS, ошибки ограничения частоты и т.п.
+                        received_at = time.time()
+                        # Имя файла задания совпадает с тем, что вернет GET /task
+                        if not self._delivered(f"task_{frame['task_id']:03}.json"):
+                            continue
+                        if frame.get("timestamp"):
+                            # Сервер шлет наивное время UTC (utcnow().isoformat()), а не локальное
+                            scheduled_at = datetime.fromisoformat(frame["timestamp"])
+                            if scheduled_at.tzinfo is None:
+                                scheduled_at = scheduled_at.replace(tzinfo=timezone.utc)
+                            scheduled = scheduled_at.timestamp()
+                            self.samples.scheduled_lag.append(max(0.0, received_at - scheduled))
+                        self._spawn_solve(json.dumps(frame.get("content")))
+            except Exception as e:
+                self.samples.errors["websocket"] += 1
+                logger.debug(f"Ошибка WebSocket {self.team_name}: {e}")
+            if self.is_running:
+                await asyncio.sleep(self.reconnect_delay)
+
+    async def poll(self):
+        """Получение заданий опросом GET /task"""
+        while self.is_running:
+            task = await self.get_task()
+            if task and "filename" in task and self._delivered(task["filename"]):
+                self._spawn_solve(task["content"])
+            await asyncio.sleep(self.config.poll_interval)
+
+    async def run(self, start_delay: float) -> None:
+        await asyncio.sleep(start_delay)
+        self.is_running = True
+        if not await self.register():
+            return
+        if self.mode == MODE_WS:
+            await self.handle_websocket()
+        else:
+            await self.poll()
+
+
+async def _run_worker(worker_id: int, team_names: List[str], config) -> Dict:
+    rng = random.Random(config.seed * 1000 + worker_id)
+    samples = Samples()
+    connector = aiohttp.TCPConnector(limit=config.connector_limit)
+    timeout = aiohttp.ClientTimeout(total=config.request_timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        offsets = arrival_offsets(len(team_names), config.arrival_window, config.arrival, rng)
+        participants = [
+            LoadParticipant(
+                config, session, name,
+                MODE_WS if rng.random() < config.ws_ratio else MODE_POLLING,
+                samples, rng,
+            )
+            for name in team_names
+        ]
+        tasks = [asyncio.create_task(p.run(offset)) for p, offset in zip(participants, offsets)]
+        await asyncio.sleep(config.duration)
+        for participant in participants:
+            participant.stop()
+            tasks.extend(participant.solving)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    result = samples.to_dict()
+    result["modes"] = {
+        MODE_WS: sum(p.mode == MODE_WS for p in participants),
+        MODE_POLLING: sum(p.mode == MODE_POLLING for p in participants),
+    }
+    return result
+
+
+def run_worker(worker_id: int, team_names: List[str], config) -> Dict:
+    """Точка входа процесса стенда"""
+    logging.getLogger().setLevel(config.log_level)
+    return asyncio.run(_run_worker(worker_id, team_names, config))
+
+
+def merge(results: List[Dict], elapsed: float) -> Dict:
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    modes: Dict[str, int] = defaultdict(int)
+    first_seen: Dict[str, float] = {}
+    deliveries = []
+    scheduled_lag: List[float] = []
+    for result in results:
+        for name, values in result["latencies"].items():
+            latencies[name].extend(values)
+        for name, count in result["errors"].items():
+            errors[name] += count
+        for mode, count in result["modes"].items():
+            modes[mode] += count
+        for key, mode, received_at in result["deliveries"]:
+            deliveries.append((key, mode, received_at))
+            first_seen[key] = min(received_at, first_seen.get(key, received_at))
+        scheduled_lag.extend(result["scheduled_lag"])
+
+    # Разброс доставки: насколько позже самого раннего получателя задание получила команда
+    skew: Dict[str, List[float]] = defaultdict(list)
+    for key, mode, received_at in deliveries:
+        delay = received_at - first_seen[key]
+        skew["all"].append(delay)
+        skew[mode].append(delay)
+
+    submits = len(latencies["submit"])
+    return {
+        "elapsed_seconds": round(elapsed, 3),
+        "teams": dict(modes),
+        "throughput": {
+            "registrations_per_second": round(len(latencies["registration"]) / elapsed, 3),
+            "task_fetches_per_second": round(len(latencies["task_fetch"]) / elapsed, 3),
+            "submits_per_second": round(submits / elapsed, 3),
+        },
+        "latency_ms": {name: summarize(values) for name, values in sorted(latencies.items())},
+        "delivery_skew_ms": {name: summarize(values) for name, values in sorted(skew.items())},
+        "ws_lag_from_schedule_ms": summarize(scheduled_lag),
+        "tasks_observed": len(first_seen),
+        "errors": dict(errors),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест сервера соревнований")
+    parser.add_argument("--server", default="http://127.0.0.1:8000")
+    parser.add_argument("--ws", default="ws://127.0.0.1:8000")
+    parser.add_argument("--teams", type=int, default=100)
+    parser.add_argument("--processes", type=int, default=max(1, multiprocessing.cpu_count() // 2))
+    parser.add_argument("--ws-ratio", type=float, default=0.5, help="доля команд, работающих только по WebSocket")
+    parser.add_argument("--duration", type=float, default=60, help="длительность теста, секунды")
+    parser.add_argument("--arrival", choices=ARRIVALS, default="poisson")
+    parser.add_argument("--arrival-window", type=float, default=10, help="окно подключения команд, секунды")
+    parser.add_argument("--think", choices=THINK_DISTRIBUTIONS, default="uniform")
+    parser.add_argument("--think-mean", type=float, default=3, help="среднее время до отправки решения, секунды")
+    parser.add_argument("--poll-interval", type=float, default=1)
+    parser.add_argument("--connector-limit", type=int, default=100, help="соединений в пуле одного процесса")
+    parser.add_argument("--request-timeout", type=float, default=30)
+    parser.add_argument("--team-prefix", default="load")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--output", help="файл для JSON результата (по умолчанию stdout)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    config = parse_args(argv)
+    # Имена уникальны между запусками: команда с существующим именем не зарегистрируется
+    run_id = int(time.time())
+    names = [f"{config.team_prefix}_{run_id}_{i}" for i in range(config.teams)]
+    processes = max(1, min(config.processes, config.teams))
+    shards = [names[i::processes] for i in range(processes)]
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.starmap(run_worker, [(i, shard, config) for i, shard in enumerate(shards)])
+    report = merge(results, time.perf_counter() - start)
+    report["config"] = vars(config)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if config.output:
+        with open(config.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
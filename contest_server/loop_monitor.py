@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from contest_server.metrics import registry
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+LOOP_PROBE_INTERVAL = float(os.getenv("LOOP_PROBE_INTERVAL", "0.05"))  # период зонда цикла событий, секунды
+LOOP_BLOCK_THRESHOLD = float(os.getenv("LOOP_BLOCK_THRESHOLD", "0.1"))  # задержка, после которой снимается стек
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "1") == "1"
+LAG_WINDOW = 2048  # последних измерений для перцентилей
+MAX_CALL_SITES = 200  # при превышении редкие места вызова отбрасываются
+STACK_DEPTH = 12  # кадров в сохраненном стеке
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LOOP_LAG = registry.histogram(
+    "contest_event_loop_lag_seconds", "Event loop scheduling lag measured by the probe",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_STALLS = registry.counter("contest_event_loop_stalls_total", "Loop stalls longer than the blocking threshold")
+
+
+class CallSite:
+    """Место вызова, на котором цикл событий был заблокирован"""
+
+    __slots__ = ("location", "samples", "stalls", "blocked_seconds", "leaf", "stack")
+
+    def __init__(self, location: str):
+        self.location = location
+        self.samples = 0  # снимков стека, указавших на это место
+        self.stalls = 0  # остановок цикла, начавшихся здесь
+        self.blocked_seconds = 0.0  # оценка: снимки * период наблюдателя
+        self.leaf = ""  # самый глубокий кадр последнего снимка (например, функция библиотеки)
+        self.stack: List[str] = []
+
+    def to_dict(self) -> Dict:
+        return {
+            "location": self.location,
+            "samples": self.samples,
+            "stalls": self.stalls,
+            "blocked_seconds": round(self.blocked_seconds, 3),
+            "leaf": self.leaf,
+            "stack": self.stack,
+        }
+
+
+def _format_frame(frame: traceback.FrameSummary) -> str:
+    return f"{frame.filename}:{frame.lineno} in {frame.name}"
+
+
+def _blocking_site(stack: traceback.StackSummary) -> traceback.FrameSummary:
+    """
+    Самый глубокий кадр кода сервера: библиотечные кадры (bcrypt, sqlite3, shutil)
+    показывают, что блокирует, а кадр сервера - откуда это было вызвано
+    """
+    for frame in reversed(stack):
+        if frame.filename.startswith(PACKAGE_DIR) and not frame.filename.endswith("loop_monitor.py"):
+            return frame
+    return stack[-1]
+
+
+class LoopMonitor:
+    """
+    Наблюдение за задержкой цикла событий.
+    Зонд в цикле засыпает на LOOP_PROBE_INTERVAL и измеряет, насколько позже он проснулся.
+    Отдельный поток-наблюдатель проверяет отметку зонда; если цикл не отвечает дольше
+    LOOP_BLOCK_THRESHOLD, снимается стек потока цикла и учитывается место блокирующего вызова.
+    """
+
+    def __init__(self, interval: float = LOOP_PROBE_INTERVAL, threshold: float = LOOP_BLOCK_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.lags: Deque[float] = deque(maxlen=LAG_WINDOW)
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.sites: Dict[str, CallSite] = {}
+        self._beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._probe_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    async def _probe(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self._beat = time.monotonic()
+            self.lags.append(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+            LOOP_LAG.observe(lag)
+
+    def _watch(self) -> None:
+        period = self.threshold / 2
+        stalled = False
+        while not self._stopped.wait(period):
+            overdue = time.monotonic() - self._beat - self.interval
+            if overdue < self.threshold:
+                stalled = False
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            self._record(traceback.extract_stack(frame), period, new_stall=not stalled, overdue=overdue)
+            stalled = True
+
+    def _record(self, stack: traceback.StackSummary, period: float, new_stall: bool, overdue: float) -> None:
+        site_frame = _blocking_site(stack)
+        location = _format_frame(site_frame)
+        with self._lock:
+            site = self.sites.get(location)
+            if site is None:
+                if len(self.sites) >= MAX_CALL_SITES:
+                    rare = min(self.sites.values(), key=lambda item: item.samples)
+                    del self.sites[rare.location]
+                site = self.sites[location] = CallSite(location)
+            site.samples += 1
+            site.blocked_seconds += period
+            site.leaf = _format_frame(stack[-1])
+            site.stack = [_format_frame(frame) for frame in stack[-STACK_DEPTH:]]
+            if new_stall:
+                site.stalls += 1
+                self.stalls += 1
+        if new_stall:
+            LOOP_STALLS.inc()
+            logger.warning(
+                f"Цикл событий заблокирован {overdue * 1000:.0f} мс: {location} (выполняется {site.leaf})"
+            )
+
+    def start(self) -> None:
+        """Запуск зонда и наблюдателя (вызывается из работающего цикла событий)"""
+        if self._probe_task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._probe_task = asyncio.create_task(self._probe())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    def top_sites(self, limit: int = 10) -> List[Dict]:
+        with self._lock:
+            sites = sorted(self.sites.values(), key=lambda item: item.blocked_seconds, reverse=True)
+            return [site.to_dict() for site in sites[:limit]]
+
+    def stats(self, limit: int = 10) -> Dict:
+        lags = sorted(self.lags)
+
+        def percentile(p: float) -> Optional[float]:
+            if not lags:
+                return None
+            return round(lags[min(len(lags) - 1, int(len(lags) * p))] * 1000, 3)
+
+        return {
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "samples": len(lags),
+            "lag_ms": {"p50": percentile(0.5), "p99": percentile(0.99), "max": round(self.max_lag * 1000, 3)},
+            "stalls": self.stalls,
+            "top_sites": self.top_sites(limit),
+        }
+
+
+# Глобальный монитор цикла событий
+loop_monitor = LoopMonitor()
@@ -1,17 +1,24 @@
 from fastapi import FastAPI, UploadFile, File, Depends, Form, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from auth import create_token, verify_token
-from database import SessionLocal, init_db
-from models import Team, Submission
+from contest_server.auth import create_token, verify_token
+from contest_server.database import SessionLocal, AsyncSessionLocal, init_db
+from contest_server.models import Team, Submission
 from datetime import datetime
 import aiofiles
 import os
 import glob
-from scheduler import start_scheduler
-from websocket import ws_manager
+from contest_server.scheduler import TASK_OUT_DIR, pool_state, start_scheduler
+from contest_server.websocket import ws_manager
+from contest_server.submission_store import submission_store
+from contest_server.presence import presence_tracker
+from contest_server.rate_limit import RateLimitMiddleware, ws_message_allowed
+from contest_server.metrics import CONTENT_TYPE, HTTP_LATENCY, HTTP_REQUESTS, registry
+from contest_server.tracing import TracingMiddleware, set_attrs, span, trace
+from contest_server.loop_monitor import LOOP_MONITOR_ENABLED, loop_monitor
 import json
 import logging
-from fastapi import HTTPException
+import time
+from fastapi import HTTPException, Response
 
 # Настройка логирования
 logging.basicConfig(
@@ -22,6 +29,11 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
+# Ограничение частоты по командам и общего числа одновременных запросов (до разбора тела)
+app.add_middleware(RateLimitMiddleware)
+# Трассировка фаз обработки /task, /submit и /register (JSON строки, с выборкой)
+app.add_middleware(TracingMiddleware)
+
 # Разрешаем CORS для всех (для отладки)
 app.add_middleware(
     CORSMiddleware,
@@ -32,8 +44,11 @@ app.add_middleware(
 )
 
 BASE_DIR = "contest_server"
-TASKS_DIR = "tasks"
+TASKS_DIR = TASK_OUT_DIR
 SUBMISSIONS_DIR = "submissions"
+# Начать соревнование заново: очистить tasks/ и submissions/ и сбросить курсор пула.
+# По умолчанию сервер продолжает с сохраненного состояния (курсор выдачи в базе)
+RESET_ON_STARTUP = os.getenv("CONTEST_RESET", "0") == "1"
 
 @app.on_event("startup")
 async def startup_event():
@@ -42,59 +57,80 @@ async def startup_event():
     # Инициализация БД
     init_db()
 
-    # Очистка и создание папок
+    # Создание папок; очистка - только при явном сбросе соревнования
     os.makedirs(TASKS_DIR, exist_ok=True)
     os.makedirs(SUBMISSIONS_DIR, exist_ok=True)
-    for file in glob.glob(f"{TASKS_DIR}/*.json"):
-        os.remove(file)
-    for file in glob.glob(f"{SUBMISSIONS_DIR}/*.json"):
-        os.remove(file)
-    print("[CLEANUP] tasks/ и submissions/ очищены")
+    if RESET_ON_STARTUP:
+        for file in glob.glob(f"{TASKS_DIR}/*.json"):
+            os.remove(file)
+        for file in glob.glob(f"{SUBMISSIONS_DIR}/*.json"):
+            os.remove(file)
+        db = SessionLocal()
+        try:
+            pool_state.reset(db)
+        finally:
+            db.close()
+        print("[CLEANUP] tasks/ и submissions/ очищены")
+
+    # Задержка цикла событий и места блокирующих вызовов
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+
+    # Присутствие команд: отложенная запись last_seen и объединенные TEAM_STATUS
+    presence_tracker.publish = ws_manager.broadcast
+    presence_tracker.start()
 
-    # Запуск планировщика
-    start_scheduler()
+    # Шардированное хранилище решений (если включено SUBMISSION_SHARDS)
+    if submission_store is not None:
+        submission_store.start()
+
+    # Запуск планировщика: выдача продолжается с сохраненного курсора пула
+    start_scheduler(source="pool")
+    print(f"[STARTUP] Выдано заданий: {pool_state.position}")
 
     print("[STARTUP] Сервер готов.")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await presence_tracker.stop()
+    await loop_monitor.stop()
+    if submission_store is not None:
+        submission_store.stop()
+
 @app.websocket("/ws/{team}")
 async def websocket_endpoint(websocket: WebSocket, team: str):
-    await ws_manager.connect(team, websocket)
-    # Отправляем статус подключения всем клиентам
-    status_message = json.dumps({
-        "type": "TEAM_STATUS",
-        "status": {
-            "team": team,
-            "connected": True
-        }
-    })
-    await ws_manager.broadcast(status_message)
+    with trace("WS connect", team=team):
+        with span("ws.accept"):
+            await ws_manager.connect(team, websocket)
+        # Статус подключения уйдет клиентам в объединенном TEAM_STATUS
+        presence_tracker.connected(team)
     try:
         while True:
             await websocket.receive_text()
+            with trace("WS message", team=team):
+                presence_tracker.touch(team)
+                with span("ws.rate_limit"):
+                    if not await ws_message_allowed(websocket, team):
+                        continue
     except:
-        ws_manager.disconnect(team)
-        # Отправляем статус отключения всем клиентам
-        status_message = json.dumps({
-            "type": "TEAM_STATUS",
-            "status": {
-                "team": team,
-                "connected": False
-            }
-        })
-        await ws_manager.broadcast(status_message)
+        await ws_manager.disconnect(team)
+        presence_tracker.disconnected(team)
 
 @app.post("/register")
 def register(name: str = Form(...)):
     logger.info(f"Получен запрос на регистрацию команды: {name}")
+    set_attrs(team=name)
     db = SessionLocal()
     try:
         logger.info("Создание JWT токена...")
-        token = create_token(name)
+        with span("auth.create_token"):
+            token = create_token(name)
         logger.info("Создание записи команды в БД...")
         team = Team(name=name, token=token)
         db.add(team)
         logger.info("Сохранение в БД...")
-        db.commit()
+        with span("db.commit"):
+            db.commit()
         logger.info(f"Команда {name} успешно зарегистрирована")
         return {"token": token}
     except Exception as e:
@@ -107,36 +143,54 @@ def register(name: str = Form(...)):
 
 @app.get("/task")
 async def get_task(team: str = Depends(verify_token)):
-    task_path = TASKS_DIR
-    files = sorted(f for f in os.listdir(task_path) if f.endswith(".json"))
-    if not files:
-        return {"error": "Нет доступных заданий"}
-    latest = files[-1]
-    async with aiofiles.open(os.path.join(task_path, latest), "r") as f:
-        content = await f.read()
+    set_attrs(team=team)
+    with HTTP_LATENCY.labels("task").time():
+        # Последнее выданное задание известно из курсора пула - директория не просматривается
+        latest = pool_state.current_file()
+        if latest is None:
+            HTTP_REQUESTS.labels("task", "empty").inc()
+            return {"error": "Нет доступных заданий"}
+        with span("fs.read", file=latest):
+            async with aiofiles.open(os.path.join(TASKS_DIR, latest), "r") as f:
+                content = await f.read()
+    HTTP_REQUESTS.labels("task", "ok").inc()
     return {"filename": latest, "content": content}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Метрики сервера в текстовом формате Prometheus"""
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
 @app.post("/submit")
 async def submit(file: UploadFile = File(...), team: str = Depends(verify_token)):
-    db = SessionLocal()
+    db = AsyncSessionLocal()
     os.makedirs(SUBMISSIONS_DIR, exist_ok=True)
     
     # Получаем время начала обработки
     submission_time = datetime.utcnow()
+    started = time.perf_counter()
     
     filename = f"{team}_{submission_time.isoformat()}.json"
     path = os.path.join(SUBMISSIONS_DIR, filename)
+    # Задание, на которое отвечает команда: последнее выданное к моменту получения решения
+    task_id = pool_state.position
+    task_file = pool_state.current_file() or "unknown"
+    task_index = task_id - 1  # Индекс текущей задачи
     
+    set_attrs(team=team)
     try:
-        async with aiofiles.open(path, "wb") as out:
+        with span("upload.read"):
             content = await file.read()
-            await out.write(content)
+        with span("fs.write", bytes=len(content)):
+            async with aiofiles.open(path, "wb") as out:
+                await out.write(content)
         
         # Проверяем валидность JSON и наличие необходимых полей
         try:
-            solution = json.loads(content)
-            if "selections" not in solution:
-                raise ValueError("Missing 'selections' field")
+            with span("validate"):
+                solution = json.loads(content)
+                if "selections" not in solution:
+                    raise ValueError("Missing 'selections' field")
             
             status = "SUCCESS"
         except json.JSONDecodeError:
@@ -145,37 +199,57 @@ async def submit(file: UploadFile = File(...), team: str = Depends(verify_token)
             status = "INVALID_FORMAT"
         except Exception as e:
             status = "ERROR"
+        set_attrs(submission_status=status)
             
         # Вычисляем время обработки
         processing_time = int((datetime.utcnow() - submission_time).total_seconds() * 1000)
         
-        sub = Submission(
-            team_name=team,
-            task_file="unknown",  # TODO: добавить связь с текущей задачей
-            submission_file=filename,
-            received_at=submission_time,
-            submitted_at=datetime.utcnow(),
-            processing_time=processing_time,
-            status=status
-        )
-        db.add(sub)
-        db.commit()
+        if submission_store is not None:
+            # Запись уходит писателю шарда команды и фиксируется вместе с соседними вставками
+            with span("db.shard_add"):
+                await submission_store.add(
+                    team,
+                    task_id=task_id or None,
+                    task_file=task_file,
+                    submission_file=filename,
+                    received_at=submission_time,
+                    submitted_at=datetime.utcnow(),
+                    processing_time=processing_time,
+                    status=status
+                )
+        else:
+            sub = Submission(
+                team_name=team,
+                task_file=task_file,
+                submission_file=filename,
+                received_at=submission_time,
+                submitted_at=datetime.utcnow(),
+                processing_time=processing_time,
+                status=status
+            )
+            db.add(sub)
+            with span("db.commit"):
+                await db.commit()
 
         # Отправляем статус решения всем клиентам
         status_message = json.dumps({
             "type": "SUBMISSION_STATUS",
             "status": {
                 "team": team,
-                "taskId": len(os.listdir(TASKS_DIR)) - 1,  # Индекс текущей задачи
+                "taskId": task_index,
                 "status": "accepted" if status == "SUCCESS" else "submitted"
             }
         })
-        await ws_manager.broadcast(status_message)
+        with span("broadcast", connections=len(ws_manager.active_connections)):
+            await ws_manager.broadcast(status_message)
         
+        HTTP_REQUESTS.labels("submit", status).inc()
         return {"status": status, "processing_time": processing_time}
         
     except Exception as e:
         logger.error(f"Error processing submission: {str(e)}")
+        HTTP_REQUESTS.labels("submit", "ERROR").inc()
         return {"status": "ERROR", "message": str(e)}
     finally:
-        db.close()
+        HTTP_LATENCY.labels("submit").observe(time.perf_counter() - started)
+        await db.close()
@@ -1,17 +1,28 @@
-from fastapi import FastAPI, WebSocket, Depends, HTTPException, status
+from fastapi import FastAPI, WebSocket, Depends, HTTPException, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 import json
 import logging
 from typing import Dict
 import uuid
 
-from contest_server.database import init_db, SessionLocal
+from contest_server.database import init_db, SessionLocal, AsyncSessionLocal, get_async_db
 from contest_server.models import Team, Task, Solution, SolutionStatus
-from contest_server.auth import create_token, verify_token, get_password_hash, verify_password, create_access_token, get_current_user
+from contest_server.auth import create_token, verify_token, authenticate_token, revoke_token, token_cache, password_pool, security, get_password_hash, verify_password, create_access_token, get_current_user
 from contest_server.websocket import ws_manager
-from contest_server.scheduler import start_scheduler
+from contest_server.presence import presence_tracker
+from contest_server.metrics import CONTENT_TYPE, HTTP_LATENCY, HTTP_REQUESTS, registry
+from contest_server.rate_limit import RateLimitMiddleware, rate_limiter, ws_message_allowed
+from contest_server.tracing import TracingMiddleware
+from contest_server.loop_monitor import LOOP_MONITOR_ENABLED, loop_monitor
+from contest_server.scheduler import start_scheduler, issue_cursor
+from contest_server.submission_store import submission_store
+from contest_server.task_bundle import issued_tasks_bundle
+from contest_server.contests import contest_registry, require_admin, router as contests_router
+from contest_server.profiler import router as profiler_router
 from contest_server.task_loader import initialize_task_pool
 from contest_server.schemas import (
     TaskSubmissionRequest, 
@@ -37,6 +48,11 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Ограничение частоты по командам и общего числа одновременных запросов (до разбора тела)
+app.add_middleware(RateLimitMiddleware)
+# Трассировка фаз обработки запросов заданий и решений (JSON строки, с выборкой)
+app.add_middleware(TracingMiddleware)
+
 # Настройка CORS
 app.add_middleware(
     CORSMiddleware,
@@ -46,6 +62,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.include_router(contests_router)
+# Профилирование по запросу администратора (/profiler)
+app.include_router(profiler_router)
+
 # Конфигурация
 DATASET_PATH = "dataset"  # Путь к директории с JSON файлами датасета
 
@@ -68,10 +88,38 @@ async def startup_event():
         # Запуск планировщика
         start_scheduler()
         logger.info("Планировщик запущен")
+        
+        presence_tracker.publish = ws_manager.broadcast
+        presence_tracker.start()
+        
+        # Шардированное хранилище решений соревнований (если включено SUBMISSION_SHARDS)
+        if submission_store is not None:
+            submission_store.start()
+        
+        if LOOP_MONITOR_ENABLED:
+            loop_monitor.start()
     except Exception as e:
         logger.error(f"Ошибка при инициализации: {str(e)}")
         raise
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Остановка соревнований, запущенных в процессе"""
+    await contest_registry.stop_all()
+    await presence_tracker.stop()
+    await loop_monitor.stop()
+    # После остановки соревнований: очереди писателей дописываются до закрытия шардов
+    if submission_store is not None:
+        submission_store.stop()
+    password_pool.shutdown()
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Метрики сервера в текстовом формате Prometheus
+    """
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
 @app.get("/task_format")
 async def get_task_format():
     """
@@ -82,6 +130,66 @@ async def get_task_format():
         "schema": ExpectedTaskResponse.schema()
     }
 
+@app.get("/tasks/bundle")
+async def get_tasks_bundle(
+    request: Request,
+    team_name: str = Depends(verify_token)
+):
+    """
+    Сжатый пакет всех выданных заданий для опоздавших и переподключившихся команд.
+    Дальнейшие задания приходят по WebSocket (new_task) с номером версии.
+    """
+    accepts_gzip = "gzip" in request.headers.get("accept-encoding", "")
+    
+    def build_bundle(db):
+        if not issue_cursor.loaded:
+            issue_cursor.load(db)
+        return issued_tasks_bundle.get(db, issue_cursor.issued_ids(), issue_cursor.issued_at, compressed=accepts_gzip)
+    
+    with HTTP_LATENCY.labels("tasks_bundle").time():
+        async with AsyncSessionLocal() as db:
+            # Синхронный код курсора и пакета выполняется поверх асинхронного драйвера
+            version, body = await db.run_sync(build_bundle)
+    HTTP_REQUESTS.labels("tasks_bundle", "ok").inc()
+    
+    etag = f'"{version}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept-Encoding"})
+    
+    headers = {"ETag": etag, "X-Tasks-Version": str(version), "Vary": "Accept-Encoding"}
+    if accepts_gzip:
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.post("/logout")
+async def logout(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """
+    Отзыв текущего токена (по jti); дальнейшие запросы с ним получают 401
+    """
+    revoke_token(credentials.credentials)
+    return {"status": "revoked"}
+
+@app.get("/auth/token_cache", dependencies=[Depends(require_admin)])
+async def get_token_cache_stats():
+    """
+    Статистика кеша проверенных токенов: размер, попадания, промахи, вытеснения
+    """
+    return token_cache.stats()
+
+@app.get("/rate_limit", dependencies=[Depends(require_admin)])
+async def get_rate_limit_stats():
+    """
+    Состояние ограничителя: запросы в работе, количество корзин, отказы 429 и 503
+    """
+    return rate_limiter.stats()
+
+@app.get("/loop_monitor", dependencies=[Depends(require_admin)])
+async def get_loop_monitor_stats(limit: int = 10):
+    """
+    Задержка цикла событий и места вызовов, дольше всего блокировавшие цикл
+    """
+    return loop_monitor.stats(limit)
+
 @app.post("/submit", response_model=TaskSubmissionResponse)
 async def submit_solution(
     solution: TaskSubmissionRequest,
@@ -90,13 +198,13 @@ async def submit_solution(
     """
     Прием решения от команды
     """
-    db = SessionLocal()
+    db = AsyncSessionLocal()
     try:
-        team = db.query(Team).filter(Team.name == team_name).first()
+        team = (await db.execute(select(Team).where(Team.name == team_name))).scalars().first()
         if not team:
             raise HTTPException(status_code=404, detail="Команда не найдена")
         
-        task = db.query(Task).filter(Task.id == solution.task_id).first()
+        task = await db.get(Task, solution.task_id)
         if not task:
             raise HTTPException(status_code=404, detail="Задание не найдено")
         
@@ -119,7 +227,7 @@ async def submit_solution(
             metadata=json.dumps(solution.metadata) if solution.metadata else None
         )
         db.add(submission)
-        db.commit()
+        await db.commit()
         
         logger.info(f"Получено решение от команды {team_name} для задания {solution.task_id}")
         
@@ -133,11 +241,11 @@ async def submit_solution(
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Ошибка при сохранении решения: {str(e)}")
         raise HTTPException(status_code=500, detail="Ошибка при сохранении решения")
     finally:
-        db.close()
+        await db.close()
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket, token: str = None):
@@ -149,39 +257,41 @@ async def websocket_endpoint(websocket: WebSocket, token: str = None):
         return
     
     try:
-        team_name = verify_token(token)
-        db = SessionLocal()
+        team_name = authenticate_token(token)
         
-        try:
-            team = db.query(Team).filter(Team.name == team_name).first()
-            if not team:
+        # Сессия нужна только на время проверки команды и не удерживается на все соединение
+        if not presence_tracker.is_connected(team_name):
+            async with AsyncSessionLocal() as db:
+                team_id = (await db.execute(select(Team.id).where(Team.name == team_name))).scalar()
+            if team_id is None:
                 await websocket.close(code=4004, reason="Команда не найдена")
                 return
+        
+        await ws_manager.connect(team_name, websocket)
+        # last_seen попадет в базу со следующей пакетной записью
+        presence_tracker.connected(team_name)
+        
+        try:
+            while True:
+                data = await websocket.receive_text()
+                presence_tracker.touch(team_name)
+                if not await ws_message_allowed(websocket, team_name):
+                    continue
+                # Обработка входящих сообщений, если необходимо
                 
-            team.last_seen = datetime.utcnow()
-            db.commit()
-            
-            await ws_manager.connect(team_name, websocket)
-            
-            try:
-                while True:
-                    data = await websocket.receive_text()
-                    # Обработка входящих сообщений, если необходимо
-                    
-            except Exception as e:
-                logger.error(f"Ошибка WebSocket соединения: {str(e)}")
-                
+        except Exception as e:
+            logger.error(f"Ошибка WebSocket соединения: {str(e)}")
         finally:
-            db.close()
+            presence_tracker.disconnected(team_name)
             
     except Exception as e:
         logger.error(f"Ошибка при обработке WebSocket подключения: {str(e)}")
         await websocket.close(code=4000, reason="Внутренняя ошибка сервера")
 
 @app.post("/createTeam", response_model=Token)
-async def create_team(team_data: TeamCreate, db: Session = Depends(get_db)):
+async def create_team(team_data: TeamCreate, db: AsyncSession = Depends(get_async_db)):
     # Проверяем, не существует ли уже команда с таким именем
-    if db.query(Team).filter(Team.name == team_data.name).first():
+    if (await db.execute(select(Team).where(Team.name == team_data.name))).scalars().first():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Team with this name already exists"
@@ -189,7 +299,8 @@ async def create_team(team_data: TeamCreate, db: Session = Depends(get_db)):
     
     # Создаем новую команду
     userId = str(uuid.uuid4())
-    hashed_password = get_password_hash(team_data.password)
+    # bcrypt выполняется в пуле потоков; при переполнении очереди - 503 с Retry-After
+    hashed_password = await password_pool.hash(team_data.password)
     
     team = Team(
         name=team_data.name,
@@ -199,18 +310,18 @@ async def create_team(team_data: TeamCreate, db: Session = Depends(get_db)):
     )
     
     db.add(team)
-    db.commit()
-    db.refresh(team)
+    await db.commit()
+    await db.refresh(team)
     
     # Создаем токен доступа
     access_token = create_access_token(data={"sub": team.userId})
     return Token(access_token=access_token)
 
 @app.post("/login", response_model=Token)
-async def login(team_data: TeamCreate, db: Session = Depends(get_db)):
+async def login(team_data: TeamCreate, db: AsyncSession = Depends(get_async_db)):
     # Находим команду по имени
-    team = db.query(Team).filter(Team.name == team_data.name).first()
-    if not team or not verify_password(team_data.password, team.passs):
+    team = (await db.execute(select(Team).where(Team.name == team_data.name))).scalars().first()
+    if not team or not await password_pool.verify(team_data.password, team.passs):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect team name or password",
@@ -225,10 +336,10 @@ async def login(team_data: TeamCreate, db: Session = Depends(get_db)):
 async def submit_solution(
     solution: SolutionCreate,
     current_user: Team = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Проверяем существование задачи
-    task = db.query(Task).filter(Task.taskId == solution.taskId).first()
+    task = (await db.execute(select(Task).where(Task.taskId == solution.taskId))).scalars().first()
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -244,8 +355,8 @@ async def submit_solution(
     )
     
     db.add(db_solution)
-    db.commit()
-    db.refresh(db_solution)
+    await db.commit()
+    await db.refresh(db_solution)
     
     return db_solution
 
@@ -253,9 +364,9 @@ async def submit_solution(
 async def get_task(
     task_id: int,
     current_user: Team = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    task = db.query(Task).filter(Task.taskId == task_id).first()
+    task = (await db.execute(select(Task).where(Task.taskId == task_id))).scalars().first()
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -0,0 +1,192 @@
+"""
+Легковесный реестр метрик в формате Prometheus.
+
+Счетчики и гистограммы не используют блокировок: каждый поток пишет в собственную ячейку
+(ячейки создаются при первом наблюдении в потоке), а при выдаче /metrics ячейки суммируются.
+Наблюдение стоит несколько обращений к словарю и bisect по фиксированным границам.
+"""
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import get_ident
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Границы гистограмм задержек по умолчанию, секунды
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Counter:
+    __slots__ = ("_cells",)
+
+    def __init__(self):
+        self._cells: Dict[int, List[float]] = {}
+
+    def inc(self, amount: float = 1) -> None:
+        cell = self._cells.get(get_ident())
+        if cell is None:
+            cell = self._cells[get_ident()] = [0]
+        cell[0] += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.inc(-amount)
+
+    @property
+    def value(self) -> float:
+        return sum(cell[0] for cell in list(self._cells.values()))
+
+
+class _Histogram:
+    __slots__ = ("bounds", "_cells")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self._cells: Dict[int, List[float]] = {}
+
+    def observe(self, value: float) -> None:
+        cell = self._cells.get(get_ident())
+        if cell is None:
+            # Счетчики корзин, затем сумма и количество наблюдений
+            cell = self._cells[get_ident()] = [0] * (len(self.bounds) + 3)
+        cell[bisect_left(self.bounds, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self) -> Tuple[List[float], float, float]:
+        """
+        :return: (накопительные счетчики корзин включая +Inf, сумма, количество)
+        """
+        totals = [0] * (len(self.bounds) + 3)
+        for cell in list(self._cells.values()):
+            for i, value in enumerate(cell):
+                totals[i] += value
+        cumulative, running = [], 0
+        for count in totals[:len(self.bounds) + 1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, totals[-2], totals[-1]
+
+
+class MetricFamily:
+    """Метрика с набором меток; дочерние значения создаются при первом обращении к labels()"""
+
+    def __init__(self, kind: str, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._callback: Optional[Callable[[], float]] = None
+        if not self.labelnames:
+            # Метрика без меток выдается с нулевым значением до первого наблюдения
+            self.labels()
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            child = _Histogram(self.buckets) if self.kind == "histogram" else _Counter()
+            child = self._children.setdefault(values, child)
+        return child
+
+    # Метрика без меток ведет себя как ее единственное дочернее значение
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self.labels().dec(amount)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def set_function(self, callback: Callable[[], float]) -> None:
+        """Значение датчика вычисляется при выдаче метрик"""
+        self._callback = callback
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        if self._callback is not None:
+            lines.append(f"{self.name} {_format_value(self._callback())}")
+            return lines
+        for values, child in sorted(self._children.items()):
+            if self.kind == "histogram":
+                cumulative, total, count = child.snapshot()
+                for bound, running in zip(self.buckets + (float("inf"),), cumulative):
+                    labels = _format_labels(self.labelnames, values, f'le="{_format_value(bound)}"')
+                    lines.append(f"{self.name}_bucket{labels} {running}")
+                labels = _format_labels(self.labelnames, values)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {_format_value(count)}")
+            else:
+                lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.families: Dict[str, MetricFamily] = {}
+
+    def _register(self, family: MetricFamily) -> MetricFamily:
+        # Повторная регистрация (например, при импорте модуля под другим именем) возвращает существующую метрику
+        return self.families.setdefault(family.name, family)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> MetricFamily:
+        return self._register(MetricFamily("counter", name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> MetricFamily:
+        return self._register(MetricFamily("gauge", name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> MetricFamily:
+        return self._register(MetricFamily("histogram", name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for family in self.families.values():
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+# Глобальный реестр
+registry = MetricsRegistry()
+
+# Метрики горячих путей сервера
+HTTP_REQUESTS = registry.counter("contest_http_requests_total", "HTTP requests by endpoint and status", ("endpoint", "status"))
+HTTP_LATENCY = registry.histogram("contest_http_request_seconds", "HTTP handler latency", ("endpoint",))
+WS_CONNECTIONS = registry.gauge("contest_ws_connections", "Open WebSocket connections")
+WS_MESSAGES_SENT = registry.counter("contest_ws_messages_sent_total", "WebSocket messages sent")
+WS_SEND_ERRORS = registry.counter("contest_ws_send_errors_total", "Failed WebSocket sends")
+BROADCAST_LATENCY = registry.histogram("contest_broadcast_seconds", "Duration of a broadcast to all connections")
+TASKS_ISSUED = registry.counter("contest_tasks_issued_total", "Tasks issued by the scheduler")
+TICK_JITTER = registry.histogram(
+    "contest_scheduler_tick_jitter_seconds", "Delay between tick deadline and frame handoff",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0),
+)
+DB_COMMIT_LATENCY = registry.histogram("contest_db_commit_seconds", "Session commit duration")
+DB_ROLLBACKS = registry.counter("contest_db_rollbacks_total", "Session rollbacks")
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import bindparam, update
+
+from contest_server.database import AsyncSessionLocal, Team
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+PRESENCE_FLUSH_INTERVAL = float(os.getenv("PRESENCE_FLUSH_INTERVAL", "5"))  # секунды между записями last_seen
+PRESENCE_DEBOUNCE = float(os.getenv("PRESENCE_DEBOUNCE", "1"))  # окно объединения изменений TEAM_STATUS
+
+
+class TeamPresence:
+    """Состояние команды в таблице присутствия"""
+
+    __slots__ = ("sessions", "last_seen", "published")
+
+    def __init__(self):
+        self.sessions = 0  # открытые соединения команды
+        self.last_seen: Optional[datetime] = None
+        self.published = False  # состояние, о котором последним сообщили клиентам
+
+    @property
+    def connected(self) -> bool:
+        return self.sessions > 0
+
+
+class PresenceTracker:
+    """
+    Таблица присутствия команд в памяти.
+    last_seen записывается в базу периодически одним пакетом, а изменения подключения
+    публикуются с задержкой: за окно PRESENCE_DEBOUNCE все изменения объединяются в одно
+    сообщение TEAM_STATUS, а переподключение внутри окна не публикуется вовсе.
+    """
+
+    def __init__(
+        self,
+        publish: Optional[Callable[[str], Awaitable[None]]] = None,
+        flush_interval: float = PRESENCE_FLUSH_INTERVAL,
+        debounce: float = PRESENCE_DEBOUNCE,
+    ):
+        """
+        :param publish: Рассылка сообщения TEAM_STATUS (обычно broadcast менеджера WebSocket)
+        :param flush_interval: Период записи last_seen в базу
+        :param debounce: Окно объединения изменений присутствия
+        """
+        self.publish = publish
+        self.flush_interval = flush_interval
+        self.debounce = debounce
+        self.teams: Dict[str, TeamPresence] = {}
+        self._dirty: Dict[str, datetime] = {}  # last_seen, еще не записанные в базу
+        self._changed = set()
+        self._publish_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def _team(self, team_name: str) -> TeamPresence:
+        presence = self.teams.get(team_name)
+        if presence is None:
+            presence = self.teams[team_name] = TeamPresence()
+        return presence
+
+    def touch(self, team_name: str) -> None:
+        """Отмечает активность команды (без публикации)"""
+        now = datetime.utcnow()
+        self._team(team_name).last_seen = now
+        self._dirty[team_name] = now
+
+    def connected(self, team_name: str) -> None:
+        self._team(team_name).sessions += 1
+        self.touch(team_name)
+        self._mark_changed(team_name)
+
+    def disconnected(self, team_name: str) -> None:
+        presence = self._team(team_name)
+        presence.sessions = max(0, presence.sessions - 1)
+        self.touch(team_name)
+        self._mark_changed(team_name)
+
+    def is_connected(self, team_name: str) -> bool:
+        presence = self.teams.get(team_name)
+        return presence is not None and presence.connected
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {
+            team_name: {
+                "connected": presence.connected,
+                "last_seen": presence.last_seen.isoformat() if presence.last_seen else None,
+            }
+            for team_name, presence in self.teams.items()
+        }
+
+    def _mark_changed(self, team_name: str) -> None:
+        self._changed.add(team_name)
+        if self._publish_handle is None and self.publish is not None:
+            loop = asyncio.get_running_loop()
+            self._publish_handle = loop.call_later(self.debounce, lambda: loop.create_task(self._publish_changes()))
+
+    async def _publish_changes(self) -> None:
+        self._publish_handle = None
+        changed, self._changed = self._changed, set()
+        statuses = []
+        for team_name in sorted(changed):
+            presence = self.teams[team_name]
+            if presence.connected == presence.published:
+                # Команда вернулась в прежнее состояние внутри окна - сообщать нечего
+                continue
+            presence.published = presence.connected
+            statuses.append({
+                "team": team_name,
+                "connected": presence.connected,
+                "last_seen": presence.last_seen.isoformat() if presence.last_seen else None,
+            })
+        if not statuses:
+            return
+        try:
+            await self.publish(json.dumps({
+                "type": "TEAM_STATUS",
+                "timestamp": datetime.utcnow().isoformat(),
+                "statuses": statuses,
+            }))
+        except Exception as e:
+            logger.error(f"Ошибка публикации присутствия: {e}")
+
+    async def flush(self) -> int:
+        """
+        Записывает накопленные last_seen одной транзакцией
+        :return: Количество обновленных команд
+        """
+        if not self._dirty:
+            return 0
+        pending, self._dirty = self._dirty, {}
+        stmt = (
+            update(Team.__table__)
+            .where(Team.__table__.c.name == bindparam("team_name"))
+            .values(last_seen=bindparam("seen_at"))
+        )
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    stmt,
+                    [{"team_name": name, "seen_at": seen_at} for name, seen_at in pending.items()],
+                )
+                await db.commit()
+        except Exception as e:
+            # Не теряем отметки: более свежие значения, пришедшие за время записи, приоритетнее
+            for name, seen_at in pending.items():
+                self._dirty.setdefault(name, seen_at)
+            logger.error(f"Ошибка записи last_seen: {e}")
+            return 0
+        return len(pending)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        if self._publish_handle is not None:
+            self._publish_handle.cancel()
+            self._publish_handle = None
+        await self.flush()
+
+
+# Глобальная таблица присутствия; рассылка назначается приложением при запуске
+presence_tracker = PresenceTracker()
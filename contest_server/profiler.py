@@ -0,0 +1,225 @@
+"""
+Профилирование работающего сервера без перезапуска.
+
+Статистический профилировщик: отдельный поток с периодом PROFILER_INTERVAL снимает стеки всех
+потоков через sys._current_frames(). В интерпретатор ничего не встраивается (нет sys.setprofile),
+поэтому вне сеанса профилирования накладных расходов нет, а во время сеанса они ограничены
+одним обходом стеков за период. Результат - свернутые стеки (collapsed stacks) для flamegraph.pl
+или speedscope.
+
+Дамп задач asyncio показывает, на чем ожидает каждая корутина.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+
+from contest_server.contests import require_admin
+
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", "0.005"))  # период снятия стеков, секунды
+PROFILER_MIN_INTERVAL = 0.001
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "120"))  # предельная длительность сеанса
+MAX_STACK_DEPTH = 128
+TASK_STACK_LIMIT = 10  # кадров в стеке корутины в дампе задач
+
+# Кадр стека: (файл, функция, первая строка функции) - строка функции, а не текущая,
+# чтобы выборки одной функции сворачивались в один узел
+FrameKey = Tuple[str, str, int]
+
+
+def _short_path(filename: str) -> str:
+    """Путь относительно ближайшего каталога sys.path"""
+    best = filename
+    for prefix in sys.path:
+        if prefix and filename.startswith(prefix) and len(filename) - len(prefix) < len(best):
+            best = filename[len(prefix):].lstrip(os.sep)
+    return best
+
+
+class SamplingProfiler:
+    """Сеанс статистического профилирования; одновременно может идти только один сеанс"""
+
+    def __init__(self, interval: float = PROFILER_INTERVAL):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.started_at: Optional[datetime] = None
+        self.duration = 0.0
+        self._deadline = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, interval: Optional[float] = None) -> None:
+        """
+        Запуск сеанса; сеанс останавливается сам через seconds секунд
+        :raises: RuntimeError, если сеанс уже идет
+        """
+        with self._lock:
+            if self.running:
+                raise RuntimeError("Профилирование уже запущено")
+            self.interval = max(PROFILER_MIN_INTERVAL, interval or self.interval)
+            self.samples = Counter()
+            self.sample_count = 0
+            self.started_at = datetime.utcnow()
+            self.duration = 0.0
+            self._deadline = time.monotonic() + min(seconds, PROFILER_MAX_SECONDS)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+        started = time.monotonic()
+        while not self._stop.wait(self.interval) and time.monotonic() < self._deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack: List[FrameKey] = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    code = frame.f_code
+                    stack.append((code.co_filename, code.co_name, code.co_firstlineno))
+                    frame = frame.f_back
+                self.samples[(names.get(ident, str(ident)), tuple(reversed(stack)))] += 1
+            self.sample_count += 1
+        self.duration = time.monotonic() - started
+
+    def collapsed(self) -> str:
+        """
+        Свернутые стеки: "поток;внешний кадр;...;внутренний кадр количество" - по строке на стек
+        """
+        labels: Dict[FrameKey, str] = {}
+        lines = []
+        for (thread_name, stack), count in self.samples.most_common():
+            parts = [thread_name]
+            for key in stack:
+                label = labels.get(key)
+                if label is None:
+                    filename, name, lineno = key
+                    label = labels[key] = f"{name} ({_short_path(filename)}:{lineno})".replace(";", ":")
+                parts.append(label)
+            lines.append(f"{';'.join(parts)} {count}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def status(self) -> Dict:
+        return {
+            "running": self.running,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "duration_seconds": round(self.duration, 3),
+            "interval_ms": self.interval * 1000,
+            "samples": self.sample_count,
+            "stacks": len(self.samples),
+        }
+
+
+def _describe_awaitable(awaitable) -> str:
+    return getattr(awaitable, "__qualname__", None) or type(awaitable).__name__
+
+
+def task_dump() -> List[Dict]:
+    """
+    Состояние задач asyncio текущего цикла: где остановлена корутина и что она ожидает
+    (цепочка cr_await до самого внутреннего объекта, например Future или sleep)
+    """
+    current = asyncio.current_task()
+    tasks = []
+    for task in asyncio.all_tasks():
+        coro = task.get_coro()
+        awaiting = []
+        awaitable = getattr(coro, "cr_await", None)
+        while awaitable is not None and len(awaiting) < TASK_STACK_LIMIT:
+            awaiting.append(_describe_awaitable(awaitable))
+            awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+        stack = [
+            f"{frame.f_code.co_name} ({_short_path(frame.f_code.co_filename)}:{frame.f_lineno})"
+            for frame in task.get_stack(limit=TASK_STACK_LIMIT)
+        ]
+        tasks.append({
+            "name": task.get_name(),
+            "coroutine": getattr(coro, "__qualname__", repr(coro)),
+            "state": "current" if task is current else ("done" if task.done() else "pending"),
+            "stack": stack,
+            "awaiting": awaiting,
+        })
+    tasks.sort(key=lambda item: item["coroutine"])
+    return tasks
+
+
+# Глобальный профилировщик процесса
+profiler = SamplingProfiler()
+
+router = APIRouter(prefix="/profiler", tags=["profiler"], dependencies=[Depends(require_admin)])
+
+
+@router.get("")
+async def profiler_status():
+    """Состояние текущего или последнего сеанса профилирования"""
+    return profiler.status()
+
+
+@router.post("/start")
+async def start_profiling(seconds: float = 10, interval_ms: Optional[float] = None):
+    """
+    Запуск профилирования на seconds секунд (не больше PROFILER_MAX_SECONDS)
+    :param interval_ms: Период снятия стеков, миллисекунды
+    """
+    if seconds <= 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Длительность должна быть положительной")
+    try:
+        profiler.start(seconds, interval_ms / 1000 if interval_ms else None)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return profiler.status()
+
+
+@router.post("/stop")
+async def stop_profiling():
+    """Досрочная остановка сеанса; возвращает свернутые стеки"""
+    await asyncio.get_running_loop().run_in_executor(None, profiler.stop)
+    return Response(content=profiler.collapsed(), media_type="text/plain")
+
+
+@router.get("/collapsed")
+async def get_collapsed_stacks():
+    """Свернутые стеки последнего сеанса (формат flamegraph.pl / speedscope)"""
+    if profiler.running:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Профилирование еще идет")
+    return Response(content=profiler.collapsed(), media_type="text/plain")
+
+
+@router.post("/run")
+async def run_profiling(seconds: float = 10, interval_ms: Optional[float] = None):
+    """Профилирование на seconds секунд с ожиданием результата"""
+    if seconds <= 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Длительность должна быть положительной")
+    try:
+        profiler.start(seconds, interval_ms / 1000 if interval_ms else None)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    await asyncio.sleep(min(seconds, PROFILER_MAX_SECONDS))
+    await asyncio.get_running_loop().run_in_executor(None, profiler.stop)
+    return Response(content=profiler.collapsed(), media_type="text/plain")
+
+
+@router.get("/tasks")
+async def get_task_dump():
+    """Дамп задач asyncio: стек каждой корутины и объект, который она ожидает"""
+    tasks = task_dump()
+    return {"count": len(tasks), "tasks": tasks}
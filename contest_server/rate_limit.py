@@ -0,0 +1,239 @@
+import json
+import logging
+import math
+import os
+import time
+from typing import Dict, Optional
+
+from contest_server.auth import decode_token
+from contest_server.metrics import registry
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", "5"))  # запросов в секунду на команду
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "10"))  # емкость корзины
+WS_RATE_LIMIT_RPS = float(os.getenv("WS_RATE_LIMIT_RPS", "10"))  # сообщений WebSocket в секунду на команду
+WS_RATE_LIMIT_BURST = float(os.getenv("WS_RATE_LIMIT_BURST", "20"))
+WS_MAX_DROPS = int(os.getenv("WS_MAX_DROPS", "100"))  # отброшенных подряд сообщений до закрытия соединения (1008)
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "256"))  # одновременных HTTP запросов на процесс
+MAX_BUCKETS = 10000  # при превышении простаивающие корзины удаляются
+
+# Маршруты, которые ограничиваются по команде: сам путь и его подпути (GET /task/{task_id});
+# у маршрутов соревнований (/contests/{contest_id}/task) сравнивается часть после идентификатора
+LIMITED_PATHS = ("/task", "/submit")
+CONTEST_PATH_PREFIX = "/contests/"
+
+
+class TokenBucket:
+    """Корзина токенов: пополняется со скоростью rate до burst"""
+
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated_at = now
+
+
+class RateLimiter:
+    """
+    Ограничение частоты запросов по командам (ключ - subject проверенного токена)
+    и глобальное ограничение количества одновременно обрабатываемых запросов
+    """
+
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT_RPS,
+        burst: float = RATE_LIMIT_BURST,
+        ws_rate: float = WS_RATE_LIMIT_RPS,
+        ws_burst: float = WS_RATE_LIMIT_BURST,
+        max_concurrent: int = MAX_CONCURRENT_REQUESTS,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.ws_rate = ws_rate
+        self.ws_burst = ws_burst
+        self.max_concurrent = max_concurrent
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.ws_buckets: Dict[str, TokenBucket] = {}
+        self.ws_drops: Dict[str, int] = {}  # отброшенных подряд сообщений команды
+        self.ws_notice_until: Dict[str, float] = {}  # до какого момента уведомление об ограничении уже отправлено
+        self.in_flight = 0
+        self.limited = 0  # отказов 429
+        self.shed = 0  # отказов 503
+
+    @staticmethod
+    def _consume(buckets: Dict[str, TokenBucket], key: str, rate: float, burst: float) -> float:
+        """
+        Забирает токен из корзины ключа
+        :return: 0, если запрос разрешен, иначе время до появления токена в секундах
+        """
+        now = time.monotonic()
+        bucket = buckets.get(key)
+        if bucket is None:
+            if len(buckets) >= MAX_BUCKETS:
+                RateLimiter._sweep(buckets, now, rate, burst)
+            bucket = buckets[key] = TokenBucket(burst, now)
+        else:
+            bucket.tokens = min(burst, bucket.tokens + (now - bucket.updated_at) * rate)
+            bucket.updated_at = now
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            return 0.0
+        return (1 - bucket.tokens) / rate
+
+    @staticmethod
+    def _sweep(buckets: Dict[str, TokenBucket], now: float, rate: float, burst: float) -> None:
+        """Удаляет корзины, которые уже пополнились до конца (их отсутствие эквивалентно полной корзине)"""
+        for key in [key for key, bucket in buckets.items() if bucket.tokens + (now - bucket.updated_at) * rate >= burst]:
+            del buckets[key]
+
+    def consume(self, key: str) -> float:
+        retry_after = self._consume(self.buckets, key, self.rate, self.burst)
+        if retry_after:
+            self.limited += 1
+        return retry_after
+
+    def allow_message(self, team_name: str) -> float:
+        """
+        Проверка входящего сообщения WebSocket
+        :return: 0, если сообщение можно обрабатывать, иначе время ожидания в секундах
+        """
+        retry_after = self._consume(self.ws_buckets, team_name, self.ws_rate, self.ws_burst)
+        if retry_after:
+            self.limited += 1
+            self.ws_drops[team_name] = self.ws_drops.get(team_name, 0) + 1
+        elif team_name in self.ws_drops:
+            del self.ws_drops[team_name]
+            self.ws_notice_until.pop(team_name, None)
+        return retry_after
+
+    def claim_ws_notice(self, team_name: str, retry_after: float) -> bool:
+        """
+        Одно уведомление об ограничении на окно: пока окно не истекло, остальные сообщения отбрасываются молча
+        :return: True, если уведомление нужно отправить
+        """
+        now = time.monotonic()
+        if self.ws_notice_until.get(team_name, 0.0) > now:
+            return False
+        self.ws_notice_until[team_name] = now + retry_after
+        return True
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrent": self.max_concurrent,
+            "buckets": len(self.buckets),
+            "ws_buckets": len(self.ws_buckets),
+            "limited": self.limited,
+            "shed": self.shed,
+        }
+
+
+# Глобальный ограничитель
+rate_limiter = RateLimiter()
+
+registry.gauge("contest_http_in_flight", "HTTP requests being processed").set_function(lambda: rate_limiter.in_flight)
+registry.counter("contest_rate_limited_total", "Requests and messages rejected with 429").set_function(lambda: rate_limiter.limited)
+registry.counter("contest_load_shed_total", "Requests rejected with 503").set_function(lambda: rate_limiter.shed)
+
+
+def is_limited_path(path: str) -> bool:
+    if path.startswith(CONTEST_PATH_PREFIX):
+        path = "/" + path[len(CONTEST_PATH_PREFIX):].partition("/")[2]
+    return any(path == limited or path.startswith(limited + "/") for limited in LIMITED_PATHS)
+
+
+def _request_subject(scope) -> str:
+    """
+    Ключ корзины: subject токена из заголовка Authorization (проверка идет через кеш токенов),
+    для запросов без валидного токена - адрес клиента
+    """
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                try:
+                    return decode_token(token).subject
+                except Exception:
+                    break
+            break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+async def _reject(send, status_code: int, retry_after: float, detail: str) -> None:
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def ws_message_allowed(websocket, team_name: str, limiter: Optional[RateLimiter] = None) -> bool:
+    """
+    Проверка входящего сообщения WebSocket; при превышении сообщение отбрасывается, команда получает
+    одно уведомление на окно ограничения, а после WS_MAX_DROPS отброшенных подряд соединение закрывается (1008)
+    :return: True, если сообщение можно обрабатывать
+    """
+    limiter = limiter or rate_limiter
+    retry_after = limiter.allow_message(team_name)
+    if not retry_after:
+        return True
+    if limiter.ws_drops.get(team_name, 0) >= WS_MAX_DROPS:
+        limiter.ws_drops.pop(team_name, None)
+        logger.warning(f"Команда {team_name} превысила лимит сообщений WebSocket, соединение закрыто")
+        await websocket.close(code=1008, reason="Слишком много сообщений")
+        return False
+    if limiter.claim_ws_notice(team_name, retry_after):
+        await websocket.send_text(json.dumps({
+            "type": "error",
+            "code": 429,
+            "detail": "Слишком много сообщений",
+            "retry_after": round(retry_after, 3),
+        }))
+    return False
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware: отказ происходит до чтения тела запроса, разбора JSON и обращения к базе.
+    Сначала проверяется глобальный лимит одновременных запросов (503), затем корзина команды (429).
+    """
+
+    def __init__(self, app, limiter: Optional[RateLimiter] = None):
+        self.app = app
+        self.limiter = limiter or rate_limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.limiter
+        if limiter.in_flight >= limiter.max_concurrent:
+            limiter.shed += 1
+            await _reject(send, 503, 1, "Сервер перегружен, повторите запрос позже")
+            return
+
+        if is_limited_path(scope["path"]):
+            retry_after = limiter.consume(_request_subject(scope))
+            if retry_after:
+                await _reject(send, 429, retry_after, "Слишком много запросов")
+                return
+
+        limiter.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.in_flight -= 1
@@ -1,36 +1,29 @@
+import asyncio
+import json
 import logging
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from datetime import datetime
-<<<<<<< HEAD
-import shutil
 import os
-from websocket import ws_manager
-import json
-
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-TASK_POOL_DIR = "tasks_pool"  # задания тут
-TASK_OUT_DIR = "tasks"        # выдача сюда
-
-issued_task_index = 1
-total_tasks = 50
-
-async def issue_task():
-    global issued_task_index
-    if issued_task_index > total_tasks:
-        logger.info("[SCHEDULER] Все задания выданы.")
-        return
+import shutil
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from bisect import bisect_right
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
 
-    src_file = os.path.join(TASK_POOL_DIR, f"task_{issued_task_index:03}.json")
-    dst_file = os.path.join(TASK_OUT_DIR, f"task_{issued_task_index:03}.json")
-=======
-import logging
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-import json
-from typing import Optional
-from contest_server.database import SessionLocal, Task
+from sqlalchemy import not_
+
+from contest_server.database import (
+    ISSUE_CURSOR_ID,
+    POOL_CURSOR_ID,
+    IssueCursor,
+    SessionLocal,
+    Task,
+    get_issue_cursor,
+    issued_tasks_clause,
+)
+from contest_server.metrics import TASKS_ISSUED, TICK_JITTER
+from contest_server.task_bundle import content_json
+from contest_server.task_pack import DEFAULT_PACK_PATH, open_task_pack
 from contest_server.websocket import ws_manager
 
 # Настройка логирования
@@ -42,130 +35,470 @@ logger = logging.getLogger(__name__)
 
 # Константы
 MAX_TASKS = 50  # Максимальное количество задач
-TASK_INTERVAL = 30  # Интервал выдачи задач в секундах
->>>>>>> d4064c07154b37cc68ec40159791ab6874354da3
+TASK_INTERVAL = int(os.getenv("TASK_INTERVAL", "30"))  # Интервал выдачи задач в секундах
+STAGE_LEAD_TIME = 5  # За сколько секунд до тика готовится следующее задание
+JITTER_WINDOW = 1000  # Сколько последних измерений джиттера хранить
 
-async def issue_task() -> Optional[Task]:
+TASK_POOL_DIR = "tasks_pool"  # задания тут
+TASK_OUT_DIR = "tasks"        # выдача сюда
+
+
+class StagedTask:
+    """Заранее подготовленное задание: готовый кадр (None - пропустить тик) и действие после выдачи"""
+
+    __slots__ = ("label", "frame", "on_issued")
+
+    def __init__(self, label: str, frame: Optional[str], on_issued: Optional[Callable[[], None]] = None):
+        self.label = label
+        self.frame = frame
+        self.on_issued = on_issued
+
+
+class TaskTicker:
     """
-    Выдает следующее доступное задание
-    :return: Выданное задание или None, если нет доступных заданий
+    Планировщик выдачи заданий без накопления дрейфа.
+    Тик N наступает в момент start + N * interval по монотонным часам, а задание
+    для него готовится заранее, так что в момент тика только ставится в очередь рассылка.
+    """
+
+    def __init__(
+        self,
+        prepare: Callable[[int], Awaitable[Optional[StagedTask]]],
+        interval: float = TASK_INTERVAL,
+        lead_time: float = STAGE_LEAD_TIME,
+        broadcast: Optional[Callable[[str], Awaitable[None]]] = None,
+    ):
+        """
+        :param prepare: Корутина подготовки задания для тика (None - задания закончились)
+        :param interval: Интервал между тиками в секундах
+        :param lead_time: За сколько секунд до тика вызывать prepare
+        :param broadcast: Рассылка кадра (по умолчанию - всем подключениям ws_manager)
+        """
+        self.prepare = prepare
+        self.broadcast = broadcast or ws_manager.broadcast
+        self.interval = interval
+        self.lead_time = min(lead_time, interval)
+        self.tick = 0
+        self.start_monotonic: Optional[float] = None
+        self.started_at: Optional[datetime] = None
+        self.jitter: Deque[float] = deque(maxlen=JITTER_WINDOW)
+        self.broadcast_queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._tasks = []
+
+    def start(self, start_at: Optional[datetime] = None):
+        """
+        Запуск планировщика
+        :param start_at: Время начала соревнования (UTC); по умолчанию через один интервал
+        """
+        if start_at is None:
+            start_at = datetime.utcnow() + timedelta(seconds=self.interval)
+        # Переводим абсолютное время в монотонные часы один раз - дальше настенные часы не используются
+        self.started_at = start_at
+        self.start_monotonic = time.monotonic() + (start_at - datetime.utcnow()).total_seconds()
+        self._tasks = [
+            asyncio.create_task(self._run()),
+            asyncio.create_task(self._sender()),
+        ]
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def deadline(self, tick: int) -> float:
+        """Монотонное время тика"""
+        return self.start_monotonic + tick * self.interval
+
+    def scheduled_at(self, tick: int) -> datetime:
+        """Плановое время тика по UTC (для меток в сообщениях)"""
+        return self.started_at + timedelta(seconds=tick * self.interval)
+
+    async def _sleep_until(self, target: float):
+        delay = target - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _run(self):
+        while True:
+            deadline = self.deadline(self.tick)
+            await self._sleep_until(deadline - self.lead_time)
+
+            try:
+                staged = await self.prepare(self.tick)
+            except Exception as e:
+                # Временная ошибка (база, файл пула) не завершает соревнование: тик пропускается,
+                # а то же задание готовится заново к следующему тику
+                logger.error(f"[SCHEDULER] Ошибка подготовки задания для тика {self.tick}: {e}")
+                await self._sleep_until(deadline)
+                self.tick += 1
+                continue
+            if staged is None:
+                logger.info("[SCHEDULER] Все задания выданы.")
+                return
+
+            await self._sleep_until(deadline)
+            if staged.frame is None:
+                # Задание еще не готово к выдаче - тик пропускается
+                self.tick += 1
+                continue
+            self.broadcast_queue.put_nowait(staged.frame)
+            jitter = time.monotonic() - deadline
+            self.jitter.append(jitter)
+            TICK_JITTER.observe(jitter)
+            TASKS_ISSUED.inc()
+
+            if staged.on_issued:
+                try:
+                    staged.on_issued()
+                except Exception as e:
+                    logger.error(f"[SCHEDULER] Ошибка фиксации задания {staged.label}: {e}")
+
+            logger.info(f"[SCHEDULER] Выдано задание {staged.label} (тик {self.tick}, джиттер {jitter * 1000:.1f} мс)")
+            self.tick += 1
+
+    async def _sender(self):
+        while True:
+            frame = await self.broadcast_queue.get()
+            try:
+                await self.broadcast(frame)
+            except Exception as e:
+                logger.error(f"[SCHEDULER] Ошибка рассылки задания: {e}")
+
+    def jitter_stats(self) -> Dict[str, float]:
+        """Статистика джиттера тиков в миллисекундах"""
+        if not self.jitter:
+            return {"count": 0, "mean_ms": 0.0, "max_ms": 0.0, "p99_ms": 0.0}
+        samples = sorted(self.jitter)
+        return {
+            "count": len(samples),
+            "mean_ms": sum(samples) / len(samples) * 1000,
+            "max_ms": samples[-1] * 1000,
+            "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+        }
+
+
+ticker: Optional[TaskTicker] = None
+_pool_pack = None
+
+
+def _get_pool_pack():
+    """Упакованный пул открывается один раз (см. task_pack.py)"""
+    global _pool_pack
+    if _pool_pack is None:
+        _pool_pack = open_task_pack(DEFAULT_PACK_PATH)
+    return _pool_pack
+
+
+def pool_task_name(index: int) -> str:
+    """Имя файла задания пула с номером index (с 1)"""
+    return f"task_{index:03}.json"
+
+
+class PoolIssueState:
+    """
+    Состояние выдачи заданий из пула (файловый режим).
+    Задания пула выдаются подряд, поэтому выданные задания - это task_001..task_{position}:
+    состояние целиком хранится в строке issue_cursor POOL_CURSOR_ID и после перезапуска
+    восстанавливается одним запросом, без обхода директории tasks/.
+    """
+
+    def __init__(self):
+        self.position = 0  # номер последнего выданного задания (0 - ничего не выдано)
+        self.issued_at: Optional[datetime] = None
+        self.loaded = False
+
+    def load(self, db: Session):
+        """
+        Восстановление состояния из сохраненного курсора
+        :param db: Сессия базы данных
+        """
+        row = get_issue_cursor(db, POOL_CURSOR_ID)
+        self.position = row.position
+        self.issued_at = row.updated_at if row.position else None
+        self.loaded = True
+        logger.info(f"Курсор пула загружен: выдано заданий {self.position}")
+
+    @property
+    def next_index(self) -> int:
+        return self.position + 1
+
+    def current_file(self) -> Optional[str]:
+        """Имя файла последнего выданного задания в TASK_OUT_DIR (None - ничего не выдано)"""
+        return pool_task_name(self.position) if self.position else None
+
+    def advance(self, db: Session, index: int):
+        """
+        Фиксирует выдачу задания index (одна строка в базе)
+        :param db: Сессия базы данных
+        :param index: Номер выданного задания
+        """
+        now = datetime.utcnow()
+        get_issue_cursor(db, POOL_CURSOR_ID)
+        db.query(IssueCursor).filter(IssueCursor.id == POOL_CURSOR_ID).update({
+            "position": index,
+            "last_task_id": index,
+            "updated_at": now
+        })
+        db.commit()
+        self.position = index
+        self.issued_at = now
+
+    def reset(self, db: Session):
+        """
+        Сброс выдачи к началу пула (новое соревнование)
+        :param db: Сессия базы данных
+        """
+        self.advance(db, 0)
+        self.issued_at = None
+        logger.info("Курсор пула сброшен")
+
+
+pool_state = PoolIssueState()
+
+
+async def stage_pool_task(tick: int) -> Optional[StagedTask]:
+    """
+    Подготовка следующего задания из пула tasks_pool (файловый режим)
+    :param tick: Номер тика
+    :return: Подготовленное задание или None, если пул исчерпан
+    """
+    index = pool_state.next_index
+    pack = _get_pool_pack()
+    total = len(pack) if pack is not None else MAX_TASKS
+    if index > total:
+        return None
+
+    timestamp = ticker.scheduled_at(tick).isoformat() if ticker else datetime.utcnow().isoformat()
+    name = pool_task_name(index)
+    dst_file = os.path.join(TASK_OUT_DIR, name)
+    staged_file = os.path.join(TASK_OUT_DIR, f".{name}.staged")
+
+    if pack is not None:
+        content = pack.text(index - 1)
+        with open(staged_file, "w", encoding="utf-8") as f:
+            f.write(content)
+    else:
+        src_file = os.path.join(TASK_POOL_DIR, name)
+        shutil.copy(src_file, staged_file)
+        with open(src_file, "r", encoding="utf-8") as f:
+            content = json.dumps(json.load(f))
+
+    frame = f'{{"task_id": {index}, "timestamp": "{timestamp}", "content": {content}}}'
+
+    def on_issued():
+        # Переименование атомарно: GET /task не увидит частично записанный файл.
+        # Файл появляется раньше записи курсора: при сбое между ними задание будет
+        # выдано повторно с тем же содержимым, но не пропущено
+        os.replace(staged_file, dst_file)
+        db = SessionLocal()
+        try:
+            pool_state.advance(db, index)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    return StagedTask(name, frame, on_issued)
+
+
+def restore_pool_state():
+    """
+    Восстановление выдачи из пула после перезапуска: курсор читается из базы,
+    а недовыданный файл следующего задания (сбой до переименования) удаляется
     """
     db = SessionLocal()
     try:
-<<<<<<< HEAD
-        # Копируем файл задания
-        shutil.copy(src_file, dst_file)
-        
-        # Читаем содержимое задания для отправки через WebSocket
-        with open(src_file, 'r', encoding='utf-8') as f:
-            task_content = json.load(f)
-        
-        # Добавляем метаданные
-        task_data = {
-            "task_id": issued_task_index,
-            "timestamp": datetime.now().isoformat(),
-            "content": task_content
-        }
-        
-        # Отправляем всем подключенным клиентам
-        await ws_manager.broadcast(json.dumps(task_data))
-        
-        logger.info(f"[SCHEDULER] [{datetime.now()}] Выдано задание {issued_task_index}/{total_tasks}: task_{issued_task_index:03}.json")
-        issued_task_index += 1
-        
-    except FileNotFoundError:
-        logger.error(f"[SCHEDULER] Файл {src_file} не найден.")
-    except Exception as e:
-        logger.error(f"[SCHEDULER] Ошибка при выдаче задания: {e}")
+        pool_state.load(db)
+    finally:
+        db.close()
+    staged_file = os.path.join(TASK_OUT_DIR, f".{pool_task_name(pool_state.next_index)}.staged")
+    if os.path.exists(staged_file):
+        os.remove(staged_file)
+
 
-def start_scheduler():
-    """Запуск планировщика задач"""
+class TaskIssueCursor:
+    """
+    Упорядоченный курсор выдачи заданий.
+    Порядок (created_at, id) читается из базы один раз, выбор следующего задания - O(1),
+    а при выдаче обновляются строка issue_cursor и время выдачи самого задания.
+    """
+
+    def __init__(self):
+        self.order: List[Tuple[datetime, int]] = []
+        self.issued_at: Dict[int, datetime] = {}
+        self.position = 0
+        self.loaded = False
+
+    def load(self, db: Session):
+        """
+        Загрузка порядка выдачи и позиции из сохраненного курсора
+        :param db: Сессия базы данных
+        """
+        self.order = [
+            (created_at, task_id)
+            for task_id, created_at in db.query(Task.id, Task.created_at).order_by(Task.created_at, Task.id)
+        ]
+        row = get_issue_cursor(db)
+        if row.last_task_id is None:
+            self.position = 0
+        else:
+            self.position = bisect_right(self.order, (row.last_created_at, row.last_task_id))
+            # Задания, добавленные позже с created_at раньше курсора, по порядку уже пройдены:
+            # они не выдаются, но и не пропадают молча
+            skipped = [
+                task_id for (task_id,) in
+                db.query(Task.id).filter(issued_tasks_clause(row), Task.issued_at.is_(None)).order_by(Task.id)
+            ]
+            if skipped:
+                logger.warning(
+                    f"Задания {skipped[:20]}{'...' if len(skipped) > 20 else ''} ({len(skipped)} шт.) "
+                    f"добавлены с created_at раньше курсора выдачи и не будут выданы"
+                )
+        self.loaded = True
+        logger.info(f"Курсор выдачи загружен: {self.position}/{len(self.order)}")
+
+    def peek(self, db: Session) -> Optional[Tuple[datetime, int]]:
+        """
+        Следующее задание в порядке выдачи
+        :param db: Сессия базы данных
+        :return: (created_at, id) или None, если задания закончились
+        """
+        if not self.loaded:
+            self.load(db)
+        if self.position >= len(self.order):
+            # Запасной путь для заданий, добавленных после загрузки курсора (по индексу ix_tasks_issue_order)
+            query = db.query(Task.id, Task.created_at)
+            row = get_issue_cursor(db)
+            if row.last_task_id is not None:
+                query = query.filter(not_(issued_tasks_clause(row)))
+            task = query.order_by(Task.created_at, Task.id).first()
+            if task is None:
+                return None
+            self.order.append((task.created_at, task.id))
+        return self.order[self.position]
+
+    def advance(self, db: Session):
+        """
+        Фиксирует выдачу текущего задания (строка курсора и строка задания, одна транзакция)
+        :param db: Сессия базы данных
+        """
+        created_at, task_id = self.order[self.position]
+        now = datetime.utcnow()
+        db.query(IssueCursor).filter(IssueCursor.id == ISSUE_CURSOR_ID).update({
+            "position": self.position + 1,
+            "last_task_id": task_id,
+            "last_created_at": created_at,
+            "updated_at": now
+        })
+        # Время выдачи фиксируется в той же транзакции: списки заданий читают его после перезапуска
+        db.query(Task).filter(Task.id == task_id).update(
+            {"is_sent": True, "issued_at": now}, synchronize_session=False
+        )
+        db.commit()
+        self.issued_at[task_id] = now
+        self.position += 1
+
+    def issued_ids(self) -> List[int]:
+        """Идентификаторы выданных заданий в порядке выдачи"""
+        return [task_id for _, task_id in self.order[:self.position]]
+
+
+issue_cursor = TaskIssueCursor()
+
+
+def new_task_frame(version: int, task_id: int, content: Optional[str]) -> str:
+    """Кадр new_task; содержимое задания в той же форме, что и в пакете (content_json)"""
+    return f'{{"type": "new_task", "version": {version}, "task": {{"id": {task_id}, "content": {content_json(content)}}}}}'
+
+
+async def stage_db_task(tick: int) -> Optional[StagedTask]:
+    """
+    Подготовка следующего задания из базы данных
+    :param tick: Номер тика
+    :return: Подготовленное задание или None, если нет доступных заданий
+    """
+    db = SessionLocal()
     try:
-        os.makedirs(TASK_OUT_DIR, exist_ok=True)
-        scheduler = AsyncIOScheduler()
-        scheduler.add_job(issue_task, "interval", seconds=30)
-        scheduler.start()
-        logger.info("[SCHEDULER] Планировщик успешно запущен")
-    except Exception as e:
-        logger.error(f"[SCHEDULER] Ошибка при запуске планировщика: {e}")
-=======
-        # Получаем следующее доступное задание
-        task = db.query(Task).filter(
-            and_(
-                Task.is_sent == False,  # type: ignore
-                Task.created_at <= datetime.utcnow()
-            )
-        ).first()
-        
-        if task:
-            task.is_sent = True
-            task.issued_at = datetime.utcnow()
-            db.commit()
-            
-            # Отправляем задание всем подключенным клиентам
-            await ws_manager.broadcast(
-                json.dumps({
-                    "type": "new_task",
-                    "task": {
-                        "id": task.id,
-                        "content": task.content
-                    }
-                })
-            )
-            
-            logger.info(f"Выдано задание {task.id}")
-            return task
-            
-        return None
-        
-    except Exception as e:
-        logger.error(f"Ошибка при выдаче задания: {str(e)}")
-        db.rollback()
-        return None
+        issue_at = ticker.scheduled_at(tick) if ticker else datetime.utcnow()
+        entry = issue_cursor.peek(db)
+        if entry is None:
+            return None
+
+        created_at, task_id = entry
+        if created_at > issue_at:
+            # Задание еще не открыто - пропускаем тик
+            return StagedTask(str(task_id), None)
+
+        content = db.query(Task.content).filter(Task.id == task_id).scalar()
+        # Версия - позиция курсора после выдачи: по пропуску версии клиент догружает пакет (GET /tasks/bundle)
+        frame = new_task_frame(issue_cursor.position + 1, task_id, content)
     finally:
         db.close()
 
-async def broadcast_available_tasks(db: Session):
+    def on_issued():
+        db = SessionLocal()
+        try:
+            issue_cursor.advance(db)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    return StagedTask(str(task_id), frame, on_issued)
+
+
+async def issue_task() -> Optional[Task]:
     """
-    Отправляет список всех доступных заданий подключенным командам
-    :param db: Сессия базы данных
+    Выдает следующее доступное задание
+    :return: Выданное задание или None, если нет доступных заданий
     """
+    db = SessionLocal()
     try:
-        # Получаем все выданные задания
-        available_tasks = db.query(Task).filter(Task.is_sent == True).all()
-        total_issued = len(available_tasks)
-        
-        tasks_list = [{
-            "task_id": task.id,
-            "name": task.name,
-            "content": json.loads(task.content),
-            "difficulty": task.difficulty,
-            "max_attempts": task.max_attempts,
-            "issued_at": task.issued_at.isoformat() if task.issued_at else None
-        } for task in available_tasks]
-
-        message = {
-            "type": "available_tasks",
-            "data": {
-                "tasks": tasks_list,
-                "total_issued": total_issued,
-                "max_tasks": MAX_TASKS,
-                "remaining_tasks": MAX_TASKS - total_issued,
-                "timestamp": datetime.utcnow().isoformat()
-            }
-        }
+        # Получаем следующее доступное задание
+        entry = issue_cursor.peek(db)
+        if entry is None or entry[0] > datetime.utcnow():
+            return None
+
+        task = db.get(Task, entry[1])
+        issue_cursor.advance(db)
+        TASKS_ISSUED.inc()
+
+        # Отправляем задание всем подключенным клиентам
+        await ws_manager.broadcast(new_task_frame(issue_cursor.position, task.id, task.content))
+
+        logger.info(f"Выдано задание {task.id}")
+        return task
 
-        await ws_manager.broadcast(json.dumps(message))
-        
     except Exception as e:
-        logger.error(f"Ошибка при отправке списка доступных заданий: {str(e)}")
+        logger.error(f"Ошибка при выдаче задания: {str(e)}")
+        db.rollback()
+        return None
+    finally:
+        db.close()
 
-def start_scheduler():
+def start_scheduler(source: str = "db", start_at: Optional[datetime] = None) -> TaskTicker:
     """
     Запускает планировщик выдачи заданий
+    :param source: Источник заданий: "db" (таблица tasks) или "pool" (директория tasks_pool)
+    :param start_at: Время начала соревнования (UTC)
+    :return: Запущенный планировщик
     """
-    scheduler = AsyncIOScheduler()
-    scheduler.add_job(issue_task, 'interval', seconds=TASK_INTERVAL)
-    scheduler.start()
-    logger.info("Планировщик запущен")
->>>>>>> d4064c07154b37cc68ec40159791ab6874354da3
+    global ticker
+    if source == "pool":
+        os.makedirs(TASK_OUT_DIR, exist_ok=True)
+        restore_pool_state()
+        prepare = stage_pool_task
+    else:
+        db = SessionLocal()
+        try:
+            issue_cursor.load(db)
+        finally:
+            db.close()
+        prepare = stage_db_task
+
+    ticker = TaskTicker(prepare)
+    ticker.start(start_at)
+    logger.info(f"Планировщик запущен (источник: {source}, старт: {ticker.started_at.isoformat()})")
+    return ticker
@@ -162,8 +162,16 @@ class SolutionResponse(BaseModel):
 class TaskResponse(BaseModel):
     taskId: int
     name: str
-    description: str
+    description: Optional[str] = None  # в таблице tasks описания нет
     content: str
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class ContestCreate(BaseModel):
+    contest_id: str = Field(..., min_length=1, max_length=50, description="Identifier of the contest (room)")
+    pool_path: str = Field(..., description="Path to the packed task pool (see task_pack.py)")
+    interval: float = Field(30, gt=0, description="Task issue interval in seconds")
+    start_at: Optional[datetime] = Field(None, description="Contest start time (UTC)")
+    max_tasks: Optional[int] = Field(None, gt=0, description="Limit on the number of issued tasks")
+    mode: str = Field("scheduled", description="Issue mode: 'scheduled' (global tick) or 'self_paced' (per team)")
@@ -0,0 +1,175 @@
+import asyncio
+import heapq
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIME_LIMIT = 30  # секунды, если в задании не указан time_limit
+
+
+class TeamCursor:
+    """Позиция команды в самостоятельном режиме"""
+
+    __slots__ = ("index", "deadline", "frame")
+
+    def __init__(self):
+        self.index = -1  # индекс текущего задания (-1 - еще не выдано)
+        self.deadline = 0.0  # время истечения по часам цикла событий
+        self.frame: Optional[str] = None
+
+
+class SelfPacedIssuer:
+    """
+    Самостоятельный режим: каждая команда получает следующее задание сразу после отправки решения
+    или по истечении time_limit текущего. Сроки всех команд хранятся в одной куче,
+    и на весь режим заведен один таймер - на ближайший срок.
+    """
+
+    def __init__(
+        self,
+        contest_id: str,
+        total_tasks: int,
+        payload: Callable[[int], str],
+        send: Callable[[str, str], Awaitable[None]],
+        default_time_limit: float = DEFAULT_TIME_LIMIT,
+    ):
+        """
+        :param contest_id: Идентификатор соревнования
+        :param total_tasks: Количество задач
+        :param payload: Компактный JSON задачи по индексу
+        :param send: Отправка кадра команде
+        :param default_time_limit: Срок на задание, если в нем нет time_limit
+        """
+        self.contest_id = contest_id
+        self.total_tasks = total_tasks
+        self.payload = payload
+        self.send = send
+        self.default_time_limit = default_time_limit
+
+        self.cursors: Dict[str, TeamCursor] = {}
+        self._heap: List[Tuple[float, int, str, int]] = []
+        self._seq = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_at: Optional[float] = None
+        self._time_limits: Dict[int, float] = {}
+
+    def _time_limit(self, index: int) -> float:
+        limit = self._time_limits.get(index)
+        if limit is None:
+            try:
+                limit = float(json.loads(self.payload(index)).get("time_limit") or self.default_time_limit)
+            except (ValueError, TypeError, AttributeError):
+                limit = self.default_time_limit
+            self._time_limits[index] = limit
+        return limit
+
+    async def join(self, team: str) -> Optional[str]:
+        """
+        Подключение команды: первое задание выдается при первом обращении
+        :return: Текущий кадр команды
+        """
+        cursor = self.cursors.get(team)
+        if cursor is None:
+            cursor = self.cursors[team] = TeamCursor()
+            frame = self._advance(team, cursor)
+            if frame is not None:
+                await self.send(team, frame)
+        return cursor.frame
+
+    def current_frame(self, team: str) -> Optional[str]:
+        cursor = self.cursors.get(team)
+        return cursor.frame if cursor else None
+
+    def current_task_id(self, team: str) -> int:
+        cursor = self.cursors.get(team)
+        return cursor.index + 1 if cursor else 0
+
+    async def on_submit(self, team: str, index: int) -> None:
+        """
+        Решение отправлено - команда сразу получает следующее задание
+        :param index: Индекс задания, на которое отправлено решение (прочитан до ожиданий
+                      обработки решения); если за это время истек срок и курсор уже сдвинут
+                      таймером, повторно он не сдвигается
+        """
+        cursor = self.cursors.get(team)
+        if cursor is None:
+            await self.join(team)
+            return
+        if cursor.index != index:
+            return
+        frame = self._advance(team, cursor)
+        if frame is not None:
+            await self.send(team, frame)
+
+    def _advance(self, team: str, cursor: TeamCursor) -> Optional[str]:
+        """
+        Переводит команду на следующее задание (синхронно, чтобы таймер и отправка решения
+        не могли продвинуть курсор дважды)
+        :return: Кадр нового задания или None, если задания закончились
+        """
+        if cursor.index >= self.total_tasks:
+            return None
+        cursor.index += 1
+        if cursor.index >= self.total_tasks:
+            cursor.frame = None
+            logger.info(f"[{self.contest_id}] Команда {team} прошла все задания")
+            return None
+
+        loop = asyncio.get_running_loop()
+        time_limit = self._time_limit(cursor.index)
+        cursor.deadline = loop.time() + time_limit
+        deadline_at = datetime.utcnow() + timedelta(seconds=time_limit)
+        cursor.frame = (
+            f'{{"contest_id": "{self.contest_id}", "task_id": {cursor.index + 1}, '
+            f'"timestamp": "{datetime.utcnow().isoformat()}", "deadline": "{deadline_at.isoformat()}", '
+            f'"content": {self.payload(cursor.index)}}}'
+        )
+
+        self._seq += 1
+        heapq.heappush(self._heap, (cursor.deadline, self._seq, team, cursor.index))
+        self._arm_timer(loop)
+        return cursor.frame
+
+    def _arm_timer(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Перевзводит единственный таймер на ближайший срок в куче"""
+        if not self._heap:
+            return
+        earliest = self._heap[0][0]
+        if self._timer is not None and self._timer_at is not None and self._timer_at <= earliest:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer_at = earliest
+        self._timer = loop.call_at(earliest, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._timer_at = None
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, team, index = heapq.heappop(self._heap)
+            cursor = self.cursors.get(team)
+            # Записи о заданиях, которые команда уже сдала, просто отбрасываются
+            if cursor is None or cursor.index != index:
+                continue
+            logger.info(f"[{self.contest_id}] Истекло время команды {team} на задание {index + 1}")
+            frame = self._advance(team, cursor)
+            if frame is not None:
+                loop.create_task(self.send(team, frame))
+        self._arm_timer(loop)
+
+    def stop(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = None
+        self._timer_at = None
+        self._heap.clear()
@@ -10,6 +10,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from .models import Base, Submission, User
+from .task_pack import DEFAULT_PACK_PATH, IMAGE_ID_PREFIXES, open_task_pack
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -27,9 +28,10 @@ class ContestManager:
         Base.metadata.create_all(self.engine)
         self.Session = sessionmaker(bind=self.engine)
         
-        # Load all tasks at startup
-        self.tasks = self._load_tasks()
-        logger.info(f"Loaded {len(self.tasks)} tasks")
+        # Load all tasks at startup (упакованный пул открывается без разбора задач)
+        self.pack = open_task_pack(DEFAULT_PACK_PATH)
+        self.tasks = [] if self.pack is not None else self._load_tasks()
+        logger.info(f"Loaded {self.total_tasks} tasks")
         
         # Start task scheduler
         self.task_scheduler_task = None
@@ -45,6 +47,23 @@ class ContestManager:
                     tasks.append(json.load(f))
         return tasks
 
+    @property
+    def total_tasks(self) -> int:
+        return len(self.pack) if self.pack is not None else len(self.tasks)
+
+    def _task_frame(self, index: int) -> str:
+        """Сериализация сообщения с задачей (один раз на рассылку)"""
+        header = f'{{"type":"task","task_id":{index + 1},"total_tasks":{self.total_tasks},"data":'
+        if self.pack is not None:
+            return header + self.pack.text(index) + "}"
+        return header + json.dumps(self.tasks[index]) + "}"
+
+    def _task_type(self, index: int) -> str:
+        if self.pack is not None:
+            task_type = self.pack.meta(index)["task_type"]
+            return next((p for p, t in IMAGE_ID_PREFIXES.items() if t == task_type), "")
+        return self.tasks[index].get("image_id", "").split("_")[0]
+
     async def connect(self, websocket: WebSocket):
         """Подключение нового клиента"""
         await websocket.accept()
@@ -58,22 +77,16 @@ class ContestManager:
 
     async def broadcast_task(self):
         """Отправка текущей задачи всем подключенным клиентам"""
-        if not self.tasks or not self.active_connections:
+        if not self.total_tasks or not self.active_connections:
             return
             
-        task = self.tasks[self.current_task_index]
-        task_message = {
-            "type": "task",
-            "task_id": self.current_task_index + 1,
-            "total_tasks": len(self.tasks),
-            "data": task
-        }
+        task_message = self._task_frame(self.current_task_index)
         
         # Отправляем задачу всем подключенным клиентам
         disconnected = set()
         for websocket in self.active_connections:
             try:
-                await websocket.send_json(task_message)
+                await websocket.send_text(task_message)
             except Exception as e:
                 logger.error(f"Error sending task: {e}")
                 disconnected.add(websocket)
@@ -82,7 +95,7 @@ class ContestManager:
         for websocket in disconnected:
             self.disconnect(websocket)
             
-        self.current_task_index = (self.current_task_index + 1) % len(self.tasks)
+        self.current_task_index = (self.current_task_index + 1) % self.total_tasks
         logger.info(f"Task {self.current_task_index} sent to {len(self.active_connections)} clients")
 
     async def start_task_scheduler(self):
@@ -159,19 +172,19 @@ async def get_status():
     return {
         "active_connections": len(manager.active_connections),
         "current_task": manager.current_task_index + 1,
-        "total_tasks": len(manager.tasks)
+        "total_tasks": manager.total_tasks
     }
 
 @app.get("/tasks")
 async def get_tasks():
     """Получение списка всех задач"""
     return {
-        "total": len(manager.tasks),
+        "total": manager.total_tasks,
         "tasks": [
             {
                 "id": i + 1,
-                "type": task.get("image_id", "").split("_")[0]
+                "type": manager._task_type(i)
             }
-            for i, task in enumerate(manager.tasks)
+            for i in range(manager.total_tasks)
         ]
     } 
\ No newline at end of file
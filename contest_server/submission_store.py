@@ -0,0 +1,316 @@
+"""
+Шардированное хранилище решений: решения распределяются по N файлам SQLite по стабильному хешу
+имени команды, у каждого шарда свой поток-писатель, который фиксирует накопившиеся вставки
+одной транзакцией. Метаданные соревнования (команды, задания, курсор выдачи) остаются в основной базе.
+
+Включается переменной окружения SUBMISSION_SHARDS (0 - решения пишутся в основную базу, как раньше).
+"""
+import asyncio
+import heapq
+import logging
+import os
+import queue
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, create_engine, delete, event, func, insert, select
+from sqlalchemy.engine import Engine
+
+from contest_server.database import _apply_sqlite_pragmas, _enable_incremental_vacuum
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SUBMISSION_SHARDS = int(os.getenv("SUBMISSION_SHARDS", "0"))  # количество шардов (0 - шардирование выключено)
+SHARD_DIR = os.getenv("SUBMISSION_SHARD_DIR", "shards")
+WRITE_BATCH_SIZE = int(os.getenv("SUBMISSION_WRITE_BATCH", "256"))  # максимум вставок в одной транзакции
+DEFAULT_FETCH_LIMIT = 100
+VACUUM_PAGES = int(os.getenv("SUBMISSION_VACUUM_PAGES", "1000"))  # страниц, освобождаемых за одно сжатие шарда
+
+shard_metadata = MetaData()
+
+shard_submissions = Table(
+    "submissions",
+    shard_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("contest_id", String(50), nullable=False, default=""),
+    Column("team_name", String(50), nullable=False),
+    Column("task_id", Integer),
+    Column("task_file", String),
+    Column("submission_file", String),
+    Column("status", String(20)),
+    Column("received_at", DateTime, nullable=False),
+    Column("submitted_at", DateTime),
+    Column("processing_time", Integer),  # в миллисекундах
+    Index("ix_shard_submissions_team_task", "team_name", "task_id"),
+    Index("ix_shard_submissions_contest_received", "contest_id", "received_at"),
+)
+
+
+def shard_index(team_name: str, shards: int) -> int:
+    """
+    Номер шарда команды. crc32, а не hash(): распределение не зависит от PYTHONHASHSEED
+    и одинаково во всех процессах и после перезапуска.
+    """
+    return zlib.crc32(team_name.encode("utf-8")) % shards
+
+
+def _resolve(future: asyncio.Future, error: Optional[BaseException]) -> None:
+    if future.done():
+        return
+    if error is None:
+        future.set_result(None)
+    else:
+        future.set_exception(error)
+
+
+def incremental_vacuum(engine: Engine, vacuum_pages: int = VACUUM_PAGES, full_vacuum: bool = False) -> None:
+    """
+    Возвращает файлу SQLite не больше vacuum_pages свободных страниц, не блокируя базу надолго.
+    База, созданная без auto_vacuum=INCREMENTAL, переводится в этот режим только полным VACUUM,
+    который блокирует ее на все время перестройки: он выполняется лишь при full_vacuum
+    (офлайн-запуск python -m contest_server.archive), из фоновой архивации - пропускается.
+    :param engine: Движок базы SQLite
+    :param vacuum_pages: Количество страниц для incremental_vacuum
+    :param full_vacuum: Разрешить однократный полный VACUUM для перевода режима
+    """
+    with engine.connect() as conn:
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+            conn.exec_driver_sql(f"PRAGMA incremental_vacuum({int(vacuum_pages)})")
+        elif full_vacuum:
+            conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.exec_driver_sql("VACUUM")
+        else:
+            logger.warning(
+                f"База {engine.url} не в режиме auto_vacuum=INCREMENTAL, сжатие пропущено; "
+                f"переведите ее офлайн: python -m contest_server.archive"
+            )
+
+
+class ShardWriter(threading.Thread):
+    """Единственный писатель шарда: забирает из очереди все накопившиеся вставки и фиксирует их разом"""
+
+    def __init__(self, index: int, engine: Engine, batch_size: int = WRITE_BATCH_SIZE):
+        super().__init__(name=f"submission-shard-{index}", daemon=True)
+        self.index = index
+        self.engine = engine
+        self.batch_size = batch_size
+        self.queue: "queue.Queue" = queue.Queue()
+        self.written = 0
+        self.batches = 0
+
+    def submit(self, row: Dict[str, Any], loop: asyncio.AbstractEventLoop) -> asyncio.Future:
+        future = loop.create_future()
+        self.queue.put((row, future, loop))
+        return future
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is None:
+                break
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(batch)
+
+    def _write(self, batch: List) -> None:
+        error = None
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(insert(shard_submissions), [row for row, _, _ in batch])
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            logger.error(f"Ошибка записи в шард {self.index}: {e}")
+            error = e
+        for _, future, loop in batch:
+            loop.call_soon_threadsafe(_resolve, future, error)
+
+    def stop(self):
+        self.queue.put(None)
+        self.join()
+
+
+class ShardedSubmissionStore:
+    """
+    Хранилище решений из N файлов SQLite.
+    Запись идет в шард команды; чтение по команде обращается к одному шарду,
+    остальные запросы выполняются по всем шардам параллельно и объединяются.
+    """
+
+    def __init__(self, shards: int, directory: str = SHARD_DIR, batch_size: int = WRITE_BATCH_SIZE):
+        """
+        :param shards: Количество шардов
+        :param directory: Каталог файлов шардов
+        :param batch_size: Максимум вставок в одной транзакции писателя
+        """
+        if shards < 1:
+            raise ValueError("Количество шардов должно быть положительным")
+        self.shards = shards
+        self.directory = directory
+        self.batch_size = batch_size
+        self.engines: List[Engine] = []
+        self.writers: List[ShardWriter] = []
+        self.readers: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def started(self) -> bool:
+        return bool(self.writers)
+
+    def shard_path(self, index: int) -> str:
+        return os.path.join(self.directory, f"submissions_{index:02}.db")
+
+    def start(self):
+        """Создает файлы шардов и запускает писателей"""
+        if self.started:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        for index in range(self.shards):
+            engine = create_engine(f"sqlite:///{self.shard_path(index)}", connect_args={"check_same_thread": False})
+            event.listen(engine, "connect", _apply_sqlite_pragmas)
+            # Старые шарды без incremental переводятся офлайн (compact с full_vacuum)
+            _enable_incremental_vacuum(engine)
+            shard_metadata.create_all(bind=engine)
+            writer = ShardWriter(index, engine, self.batch_size)
+            writer.start()
+            self.engines.append(engine)
+            self.writers.append(writer)
+        self.readers = ThreadPoolExecutor(max_workers=self.shards, thread_name_prefix="submission-read")
+        logger.info(f"Хранилище решений: {self.shards} шардов в {self.directory}")
+
+    def stop(self):
+        """Дожидается записи очередей и закрывает шарды"""
+        for writer in self.writers:
+            writer.stop()
+        if self.readers is not None:
+            self.readers.shutdown(wait=True)
+        for engine in self.engines:
+            engine.dispose()
+        logger.info(f"Хранилище решений остановлено: записано {sum(w.written for w in self.writers)} решений "
+                    f"за {sum(w.batches for w in self.writers)} транзакций")
+        self.writers = []
+        self.engines = []
+        self.readers = None
+
+    async def add(self, team_name: str, **fields) -> None:
+        """
+        Добавляет решение; возвращается после фиксации транзакции шарда
+        :param team_name: Имя команды (ключ шардирования)
+        :param fields: Остальные столбцы shard_submissions
+        """
+        row = {column.name: None for column in shard_submissions.columns if column.name != "id"}
+        row.update(fields)
+        row["team_name"] = team_name
+        row["contest_id"] = row["contest_id"] or ""
+        row["received_at"] = row["received_at"] or datetime.utcnow()
+        writer = self.writers[shard_index(team_name, self.shards)]
+        await writer.submit(row, asyncio.get_running_loop())
+
+    def _conditions(self, team_name, contest_id, task_id, status) -> List:
+        conditions = []
+        if team_name is not None:
+            conditions.append(shard_submissions.c.team_name == team_name)
+        if contest_id is not None:
+            conditions.append(shard_submissions.c.contest_id == contest_id)
+        if task_id is not None:
+            conditions.append(shard_submissions.c.task_id == task_id)
+        if status is not None:
+            conditions.append(shard_submissions.c.status == status)
+        return conditions
+
+    def _targets(self, team_name: Optional[str]) -> List[int]:
+        if team_name is not None:
+            return [shard_index(team_name, self.shards)]
+        return list(range(self.shards))
+
+    async def _gather(self, targets: List[int], func, *args) -> List:
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(*(loop.run_in_executor(self.readers, func, index, *args) for index in targets))
+
+    def _fetch_shard(self, index: int, conditions: List, limit: int) -> List[Dict[str, Any]]:
+        stmt = (
+            select(shard_submissions)
+            .where(*conditions)
+            .order_by(shard_submissions.c.received_at.desc())
+            .limit(limit)
+        )
+        with self.engines[index].connect() as conn:
+            return [dict(row._mapping) for row in conn.execute(stmt)]
+
+    def _count_shard(self, index: int, conditions: List) -> int:
+        with self.engines[index].connect() as conn:
+            return conn.execute(select(func.count()).select_from(shard_submissions).where(*conditions)).scalar()
+
+    async def fetch(
+        self,
+        team_name: Optional[str] = None,
+        contest_id: Optional[str] = None,
+        task_id: Optional[int] = None,
+        status: Optional[str] = None,
+        limit: int = DEFAULT_FETCH_LIMIT,
+    ) -> List[Dict[str, Any]]:
+        """
+        Последние решения по фильтрам, от новых к старым
+        :return: Список строк решений (id уникален только внутри шарда)
+        """
+        conditions = self._conditions(team_name, contest_id, task_id, status)
+        results = await self._gather(self._targets(team_name), self._fetch_shard, conditions, limit)
+        merged = heapq.merge(*results, key=lambda row: row["received_at"], reverse=True)
+        return list(islice(merged, limit))
+
+    async def count(
+        self,
+        team_name: Optional[str] = None,
+        contest_id: Optional[str] = None,
+        task_id: Optional[int] = None,
+        status: Optional[str] = None,
+    ) -> int:
+        """Количество решений по фильтрам во всех шардах"""
+        conditions = self._conditions(team_name, contest_id, task_id, status)
+        return sum(await self._gather(self._targets(team_name), self._count_shard, conditions))
+
+    def compact(self, contest_id: str, vacuum_pages: int = VACUUM_PAGES, full_vacuum: bool = False) -> int:
+        """
+        Оставляет в шардах только последнюю попытку каждой пары (команда, задание) соревнования
+        и возвращает освободившиеся страницы файлу порциями, не блокируя шард надолго
+        :param contest_id: Идентификатор соревнования
+        :param vacuum_pages: Количество страниц для incremental_vacuum
+        :param full_vacuum: Разрешить полный VACUUM для шардов, созданных без incremental (см. incremental_vacuum)
+        :return: Количество удаленных строк
+        """
+        columns = shard_submissions.c
+        hot_ids = (
+            select(func.max(columns.id))
+            .where(columns.contest_id == contest_id)
+            .group_by(columns.team_name, columns.task_id)
+        )
+        removed = 0
+        for engine in self.engines:
+            with engine.begin() as conn:
+                removed += conn.execute(
+                    delete(shard_submissions).where(columns.contest_id == contest_id, columns.id.not_in(hot_ids))
+                ).rowcount
+            incremental_vacuum(engine, vacuum_pages, full_vacuum)
+        return removed
+
+
+submission_store: Optional[ShardedSubmissionStore] = (
+    ShardedSubmissionStore(SUBMISSION_SHARDS) if SUBMISSION_SHARDS > 0 else None
+)
@@ -0,0 +1,104 @@
+import gzip
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from contest_server.database import Task
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+BUNDLE_COMPRESSION_LEVEL = 6
+
+
+def content_json(content: Optional[str]) -> str:
+    """
+    Task.content как JSON значение для кадров и пакета (одна форма везде):
+    хранимый JSON вставляется как есть, прочий текст - строкой.
+    Проверка выполняется один раз на задание: кадр и запись пакета затем кешируются.
+    """
+    if content is None:
+        return "null"
+    try:
+        json.loads(content)
+    except ValueError:
+        return json.dumps(content, ensure_ascii=False)
+    return content
+
+
+def task_entry_json(task: Task, issued_at: Optional[datetime] = None) -> str:
+    """
+    Сериализация выданного задания для пакета.
+    :param task: Задание
+    :param issued_at: Время выдачи
+    :return: JSON объект задания
+    """
+    issued_at = issued_at or task.issued_at
+    return (
+        f'{{"task_id": {task.id}, '
+        f'"name": {json.dumps(task.name)}, '
+        f'"content": {content_json(task.content)}, '
+        f'"difficulty": {json.dumps(task.difficulty)}, '
+        f'"max_attempts": {json.dumps(task.max_attempts)}, '
+        f'"issued_at": {json.dumps(issued_at.isoformat() if issued_at else None)}}}'
+    )
+
+
+class IssuedTasksBundle:
+    """
+    Сжатый пакет всех выданных заданий для опоздавших и переподключившихся команд.
+    Версия пакета - позиция курсора выдачи; пересборка происходит только после выдачи нового задания,
+    причем уже сериализованные задания повторно не читаются.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._entries: List[str] = []
+        self._entry_ids: List[int] = []
+        self._body = b""
+        self._compressed: Optional[bytes] = None
+
+    def get(
+        self, db: Session, issued_ids: List[int], issued_at: Dict[int, datetime], compressed: bool = True
+    ) -> Tuple[int, bytes]:
+        """
+        Возвращает актуальный пакет
+        :param db: Сессия базы данных
+        :param issued_ids: Идентификаторы выданных заданий в порядке выдачи
+        :param issued_at: Время выдачи по идентификатору (если известно)
+        :param compressed: gzip-сжатый JSON (клиент принимает gzip) или исходный
+        :return: (версия, JSON пакета)
+        """
+        version = len(issued_ids)
+        if self._compressed is not None and version == self.version:
+            return self.version, self._compressed if compressed else self._body
+
+        if issued_ids[:len(self._entry_ids)] != self._entry_ids:
+            # Порядок выдачи изменился (например, после перезапуска) - собираем заново
+            self._entries = []
+            self._entry_ids = []
+
+        new_ids = issued_ids[len(self._entry_ids):]
+        if new_ids:
+            tasks = {task.id: task for task in db.query(Task).filter(Task.id.in_(new_ids))}
+            for task_id in new_ids:
+                task = tasks.get(task_id)
+                if task is not None:
+                    self._entries.append(task_entry_json(task, issued_at.get(task_id)))
+                self._entry_ids.append(task_id)
+
+        self._body = f'{{"version": {version}, "tasks": [{", ".join(self._entries)}]}}'.encode("utf-8")
+        self._compressed = gzip.compress(self._body, compresslevel=BUNDLE_COMPRESSION_LEVEL)
+        self.version = version
+        logger.info(f"Пакет заданий пересобран: версия {version}, {len(self._compressed)} байт")
+        return self.version, self._compressed if compressed else self._body
+
+
+issued_tasks_bundle = IssuedTasksBundle()
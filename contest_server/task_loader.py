@@ -1,7 +1,10 @@
+import hashlib
 import json
 import os
 import logging
-from typing import List, Dict, Any
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Set
 from datetime import datetime, timedelta
 from pathlib import Path
 
@@ -12,6 +15,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+MAX_TASKS = 50  # Ограничение количества задач по умолчанию
+PARALLEL_THRESHOLD = 200  # С какого количества файлов разбирать датасет в пуле процессов
+INDEX_FILENAME = ".task_index.json"  # Индекс метаданных файлов рядом с датасетом
+INDEX_VERSION = 1
+INSERT_BATCH_SIZE = 500  # Размер пакета при записи пула задач в базу
+
 class TaskLoader:
     def __init__(self, dataset_path: str):
         """
@@ -22,45 +31,80 @@ class TaskLoader:
         if not self.dataset_path.exists():
             raise FileNotFoundError(f"Dataset path {dataset_path} does not exist")
 
-    def load_tasks(self) -> List[Dict[str, Any]]:
+    def load_tasks(
+        self,
+        max_tasks: Optional[int] = MAX_TASKS,
+        workers: Optional[int] = None,
+        with_content: bool = True,
+    ) -> List[Dict[str, Any]]:
         """
-        Загрузка JSON файлов из неразмеченного датасета
+        Загрузка JSON файлов из неразмеченного датасета.
+        Метаданные файлов кешируются в индексе рядом с датасетом, поэтому при повторном запуске
+        анализ выполняется только для измененных файлов; большие датасеты разбираются в пуле процессов.
+        :param max_tasks: Максимальное количество задач (None - без ограничения)
+        :param workers: Количество процессов (по умолчанию - по числу ядер)
+        :param with_content: Читать содержимое; при False неизмененные файлы (размер и время
+            совпадают с индексом) не читаются вовсе, и их 'content' - None (см. read_task_content)
         :return: Список задач
         """
         tasks = []
         try:
-            json_files = list(self.dataset_path.glob("*.json"))
+            phase_start = time.perf_counter()
+            json_files = sorted(f for f in self.dataset_path.glob("*.json") if f.name != INDEX_FILENAME)
             if not json_files:
                 raise FileNotFoundError("No JSON files found in dataset directory")
+            existing_names = {json_file.name for json_file in json_files}
+            
+            if max_tasks is not None:
+                json_files = json_files[:max_tasks]
+            
+            index = self._read_index()
+            jobs = [
+                (str(self.dataset_path), str(json_file), index.get(json_file.name), with_content)
+                for json_file in json_files
+            ]
+            logger.info(f"[scan] {len(jobs)} files in {(time.perf_counter() - phase_start) * 1000:.1f} ms")
             
-            # Ограничиваем количество задач до 50
-            json_files = json_files[:50]
+            phase_start = time.perf_counter()
+            results = self._parse_files(jobs, workers)
+            cached = sum(1 for result in results if result.get("cached"))
+            logger.info(
+                f"[parse] {len(results)} files in {(time.perf_counter() - phase_start) * 1000:.1f} ms "
+                f"({cached} from index, {len(results) - cached} analyzed)"
+            )
             
-            for i, json_file in enumerate(json_files, 1):
-                try:
-                    with open(json_file, 'r', encoding='utf-8') as f:
-                        # Загружаем данные из неразмеченного датасета как есть
-                        unlabeled_data = json.load(f)
-                        
-                        # Создаем задачу на основе неразмеченных данных
-                        task = {
-                            'task_id': i,
-                            'name': json_file.stem,
-                            'content': json.dumps(unlabeled_data),  # Сохраняем оригинальные данные
-                            'created_at': datetime.utcnow(),
-                            'difficulty': self._estimate_difficulty(unlabeled_data),
-                            'max_attempts': 3,
-                            'task_type': self._determine_task_type(unlabeled_data),
-                            'metadata': {
-                                'original_file': json_file.name,
-                                'file_size': os.path.getsize(json_file)
-                            }
-                        }
-                        tasks.append(task)
-                except json.JSONDecodeError as e:
-                    logger.error(f"Error parsing JSON file {json_file}: {e}")
-                except Exception as e:
-                    logger.error(f"Error processing file {json_file}: {e}")
+            phase_start = time.perf_counter()
+            # Индекс дополняется, а не заменяется: записи файлов, не попавших в max_tasks, сохраняются,
+            # удаляются только записи исчезнувших файлов
+            new_index = {name: entry for name, entry in index.items() if name in existing_names}
+            for result in results:
+                json_file = Path(result["path"])
+                if "error" in result:
+                    logger.error(f"Error processing file {json_file}: {result['error']}")
+                    new_index.pop(json_file.name, None)
+                    continue
+                
+                new_index[json_file.name] = result["entry"]
+                # Создаем задачу на основе неразмеченных данных
+                task = {
+                    'task_id': len(tasks) + 1,
+                    'name': json_file.stem,
+                    'content': result["content"],  # Сохраняем оригинальные данные
+                    'created_at': datetime.utcnow(),
+                    'difficulty': result["entry"]["difficulty"],
+                    'max_attempts': 3,
+                    'task_type': result["entry"]["task_type"],
+                    'metadata': {
+                        'original_file': json_file.name,
+                        'file_size': result["entry"]["file_size"],
+                        'content_hash': result["entry"]["sha256"]
+                    }
+                }
+                tasks.append(task)
+            
+            if new_index != index:
+                self._write_index(new_index)
+            logger.info(f"[index] {len(new_index)} entries in {(time.perf_counter() - phase_start) * 1000:.1f} ms")
             
             if not tasks:
                 raise ValueError("No valid tasks could be loaded from the dataset")
@@ -71,18 +115,74 @@ class TaskLoader:
             logger.error(f"Error loading tasks from dataset: {e}")
             raise
 
-    def _estimate_difficulty(self, data: Dict[str, Any]) -> int:
+    def _parse_files(self, jobs: List[tuple], workers: Optional[int]) -> List[Dict[str, Any]]:
+        """
+        Разбор файлов последовательно или в пуле процессов (для больших датасетов)
+        :param jobs: Список (путь датасета, путь файла, запись индекса)
+        :param workers: Количество процессов
+        :return: Результаты в порядке файлов
+        """
+        total = len(jobs)
+        step = max(1, total // 10)
+        results = []
+        
+        if total < PARALLEL_THRESHOLD or workers == 1:
+            iterator = map(_parse_task_file, jobs)
+            executor = None
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            iterator = executor.map(_parse_task_file, jobs, chunksize=max(1, total // (4 * (workers or os.cpu_count() or 1))))
+        
+        try:
+            for done, result in enumerate(iterator, 1):
+                results.append(result)
+                if total >= PARALLEL_THRESHOLD and (done % step == 0 or done == total):
+                    logger.info(f"[parse] {done}/{total} files")
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return results
+
+    def _read_index(self) -> Dict[str, Dict[str, Any]]:
+        """Чтение индекса метаданных файлов датасета"""
+        index_path = self.dataset_path / INDEX_FILENAME
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get("version") != INDEX_VERSION:
+                return {}
+            return index.get("files", {})
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable task index {index_path}: {e}")
+            return {}
+
+    def _write_index(self, files: Dict[str, Dict[str, Any]]) -> None:
+        """Атомарная запись индекса метаданных файлов датасета"""
+        index_path = self.dataset_path / INDEX_FILENAME
+        tmp_path = index_path.with_suffix(".tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": INDEX_VERSION, "files": files}, f)
+            os.replace(tmp_path, index_path)
+        except OSError as e:
+            logger.warning(f"Could not write task index {index_path}: {e}")
+
+    def _estimate_difficulty(self, data: Dict[str, Any], stats: Optional["StructureStats"] = None) -> int:
         """
         Оценка сложности задачи на основе данных
         :param data: Данные задачи
+        :param stats: Уже собранная статистика структуры (чтобы не обходить данные повторно)
         :return: Уровень сложности (1-5)
         """
         try:
+            stats = stats or analyze_structure(data)
             # Оцениваем сложность на основе размера и структуры данных
             complexity_factors = [
-                len(str(data)),  # размер данных
-                len(self._get_all_keys(data)),  # количество уникальных ключей
-                self._get_max_depth(data)  # максимальная глубина вложенности
+                stats.size,  # размер данных
+                stats.key_count,  # количество уникальных ключей
+                stats.max_depth  # максимальная глубина вложенности
             ]
             
             # Нормализация и взвешенная сумма факторов
@@ -93,14 +193,16 @@ class TaskLoader:
         except Exception:
             return 1  # По умолчанию возвращаем минимальную сложность
 
-    def _determine_task_type(self, data: Dict[str, Any]) -> str:
+    def _determine_task_type(self, data: Dict[str, Any], stats: Optional["StructureStats"] = None) -> str:
         """
         Определение типа задачи на основе структуры данных
         :param data: Данные задачи
+        :param stats: Уже собранная статистика структуры (чтобы не обходить данные повторно)
         :return: Тип задачи
         """
-        # Анализируем структуру данных для определения типа задачи
-        keys = set(self._get_all_keys(data))
+        # Анализируем структуру данных для определения типа задачи.
+        # Сравниваются имена ключей верхнего уровня: вложенные ключи имеют вид "a.b" и с ними не совпадают
+        keys = (stats or analyze_structure(data)).top_level_keys
         
         if any(key in keys for key in ['image', 'img', 'image_url', 'url']):
             if any(key in keys for key in ['bbox', 'bounding_box', 'boxes']):
@@ -113,73 +215,226 @@ class TaskLoader:
                 return 'classification'
         return 'unknown'
 
-    def _get_all_keys(self, data: Dict[str, Any], prefix: str = '') -> List[str]:
-        """
-        Рекурсивное получение всех ключей из словаря
-        :param data: Словарь для анализа
-        :param prefix: Префикс для вложенных ключей
-        :return: Список всех ключей
-        """
-        keys = []
-        for key, value in data.items():
-            full_key = f"{prefix}.{key}" if prefix else key
-            keys.append(full_key)
-            if isinstance(value, dict):
-                keys.extend(self._get_all_keys(value, full_key))
-            elif isinstance(value, list) and value and isinstance(value[0], dict):
-                keys.extend(self._get_all_keys(value[0], full_key))
-        return keys
-
-    def _get_max_depth(self, data: Dict[str, Any], current_depth: int = 1) -> int:
-        """
-        Получение максимальной глубины вложенности словаря
-        :param data: Словарь для анализа
-        :param current_depth: Текущая глубина
-        :return: Максимальная глубина
-        """
-        if not isinstance(data, (dict, list)):
-            return current_depth
-        
-        max_depth = current_depth
-        if isinstance(data, dict):
-            for value in data.values():
-                depth = self._get_max_depth(value, current_depth + 1)
-                max_depth = max(max_depth, depth)
-        elif isinstance(data, list) and data:
-            for item in data:
-                depth = self._get_max_depth(item, current_depth + 1)
-                max_depth = max(max_depth, depth)
-        
-        return max_depth
-
-def initialize_task_pool(dataset_path: str, db_session) -> None:
+class StructureStats:
+    """Статистика структуры задачи, собранная за один обход"""
+
+    __slots__ = (
+        "size", "key_count", "max_depth", "top_level_keys", "key_names",
+        "array_count", "max_array_length", "scalar_count",
+    )
+
+    def __init__(self):
+        self.size = 0  # длина str(data)
+        self.key_count = 0  # количество путей ключей (как в прежнем _get_all_keys)
+        self.max_depth = 1  # максимальная глубина вложенности
+        self.top_level_keys: Set[Any] = set()
+        self.key_names: Set[Any] = set()  # имена ключей на всех уровнях
+        self.array_count = 0
+        self.max_array_length = 0
+        self.scalar_count = 0
+
+# Типы, которые обход не раскрывает (кортежи считаются скалярами, как и раньше)
+_LEAF_TYPES = frozenset((str, int, float, bool, type(None), tuple))
+
+# Состояние узла относительно подсчета ключей
+_KEYS_SKIP = 0  # ключи узла не считаются
+_KEYS_COUNT = 1  # ключи словаря считаются
+_KEYS_FIRST = 2  # список: считаются ключи первого элемента-словаря
+
+def analyze_structure(data: Any) -> StructureStats:
+    """
+    Итеративный обход задачи за один проход: размер, ключи, глубина и статистика массивов.
+    Однородные массивы скаляров (например, маски) не раскрываются поэлементно.
+    :param data: Данные задачи
+    :return: Статистика структуры
     """
-    Инициализация пула задач из датасета
+    stats = StructureStats()
+    if isinstance(data, dict):
+        stats.top_level_keys = set(data)
+    
+    size = 0
+    max_depth = 1
+    stack = [(data, 1, _KEYS_COUNT)]
+    while stack:
+        node, depth, keys_mode = stack.pop()
+        if depth > max_depth:
+            max_depth = depth
+        
+        if isinstance(node, dict):
+            count = len(node)
+            size += 2 * count if count else 2  # скобки и разделители ", "
+            if keys_mode == _KEYS_COUNT:
+                stats.key_count += count
+            for key, value in node.items():
+                stats.key_names.add(key)
+                size += len(repr(key)) + 2  # ключ и ": "
+                if isinstance(value, dict):
+                    stack.append((value, depth + 1, keys_mode))
+                elif isinstance(value, list):
+                    first_dict = keys_mode == _KEYS_COUNT and value and isinstance(value[0], dict)
+                    stack.append((value, depth + 1, _KEYS_FIRST if first_dict else _KEYS_SKIP))
+                else:
+                    size += len(repr(value))
+                    stats.scalar_count += 1
+                    if depth + 1 > max_depth:
+                        max_depth = depth + 1
+        
+        elif isinstance(node, list):
+            count = len(node)
+            stats.array_count += 1
+            if count > stats.max_array_length:
+                stats.max_array_length = count
+            
+            if count and _LEAF_TYPES.issuperset(map(type, node)):
+                size += len(str(node))
+                stats.scalar_count += count
+                if depth + 1 > max_depth:
+                    max_depth = depth + 1
+                continue
+            
+            size += 2 * count if count else 2
+            for i, item in enumerate(node):
+                if isinstance(item, (dict, list)):
+                    first = keys_mode == _KEYS_FIRST and i == 0 and isinstance(item, dict)
+                    stack.append((item, depth + 1, _KEYS_COUNT if first else _KEYS_SKIP))
+                else:
+                    size += len(repr(item))
+                    stats.scalar_count += 1
+                    if depth + 1 > max_depth:
+                        max_depth = depth + 1
+        
+        else:
+            size += len(repr(node))
+            stats.scalar_count += 1
+    
+    stats.size = size
+    stats.max_depth = max_depth
+    return stats
+
+def _parse_task_file(job: tuple) -> Dict[str, Any]:
+    """
+    Разбор одного файла датасета (выполняется в процессе пула).
+    Если размер и время изменения совпадают с индексом - метаданные берутся из индекса;
+    если изменилось только время, но не хеш содержимого - тоже.
+    :param job: (путь датасета, путь файла, запись индекса или None, читать ли содержимое)
+    :return: Запись индекса и компактное содержимое задачи
+    """
+    dataset_path, path, cached, with_content = job
+    try:
+        stat = os.stat(path)
+        unchanged = cached and cached.get("size") == stat.st_size and cached.get("mtime_ns") == stat.st_mtime_ns
+        if unchanged and not with_content:
+            # Файл не менялся с записи индекса: он не читается и не разбирается
+            return {"path": path, "entry": cached, "content": None, "cached": True}
+        
+        with open(path, 'rb') as f:
+            raw = f.read()
+        # Загружаем данные из неразмеченного датасета как есть
+        unlabeled_data = json.loads(raw)
+        content = json.dumps(unlabeled_data)
+        
+        if unchanged:
+            return {"path": path, "entry": cached, "content": content, "cached": True}
+        
+        sha256 = hashlib.sha256(raw).hexdigest()
+        if cached and cached.get("sha256") == sha256:
+            entry = dict(cached, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            return {"path": path, "entry": entry, "content": content, "cached": True}
+        
+        loader = TaskLoader(dataset_path)
+        stats = analyze_structure(unlabeled_data)
+        entry = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256,
+            "task_type": loader._determine_task_type(unlabeled_data, stats),
+            "difficulty": loader._estimate_difficulty(unlabeled_data, stats),
+            "file_size": stat.st_size,
+        }
+        return {"path": path, "entry": entry, "content": content, "cached": False}
+    except json.JSONDecodeError as e:
+        return {"path": path, "error": f"invalid JSON: {e}"}
+    except Exception as e:
+        return {"path": path, "error": str(e)}
+
+def read_task_content(path) -> str:
+    """
+    Компактное содержимое файла задания (как 'content' в load_tasks)
+    :param path: Путь к JSON файлу
+    """
+    with open(path, 'rb') as f:
+        return json.dumps(json.loads(f.read()))
+
+def initialize_task_pool(dataset_path: str, db_session, batch_size: int = INSERT_BATCH_SIZE) -> None:
+    """
+    Инициализация пула задач из датасета.
+    Повторный запуск идемпотентен: задания сравниваются по хешу содержимого,
+    неизмененные пропускаются, новые и измененные пишутся пакетным upsert.
     :param dataset_path: Путь к директории с JSON файлами
     :param db_session: Сессия базы данных
+    :param batch_size: Размер пакета executemany
     """
-    from database import Task  # Импорт здесь во избежание циклических зависимостей
+    from contest_server.database import Task  # Импорт здесь во избежание циклических зависимостей
     
     try:
         loader = TaskLoader(dataset_path)
-        tasks = loader.load_tasks()
+        # Содержимое нужно только для новых и измененных заданий - остальные файлы не читаются
+        tasks = loader.load_tasks(max_tasks=None, with_content=False)
+        
+        existing = dict(db_session.query(Task.name, Task.content_hash))
         
         # Распределяем время создания задач
         total_tasks = len(tasks)
         time_step = timedelta(seconds=30)  # интервал между задачами
+        now = datetime.utcnow()
         
+        rows = []
         for i, task_data in enumerate(tasks):
-            # Устанавливаем время создания с учетом интервала
-            task_data['created_at'] = datetime.utcnow() + (i * time_step)
+            content_hash = task_data['metadata']['content_hash']
+            if existing.get(task_data['name']) == content_hash:
+                continue
+            content = task_data['content']
+            if content is None:
+                content = read_task_content(loader.dataset_path / task_data['metadata']['original_file'])
+            rows.append({
+                'name': task_data['name'],
+                'content': content,
+                'content_hash': content_hash,
+                'difficulty': task_data['difficulty'],
+                'max_attempts': task_data['max_attempts'],
+                # Устанавливаем время создания с учетом интервала
+                'created_at': now + (i * time_step),
+            })
+        
+        if rows:
+            dialect = db_session.bind.dialect.name
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
             
-            # Создаем задачу в базе данных
-            task = Task(**task_data)
-            db_session.add(task)
+            stmt = insert(Task)
+            # Время создания (расписание выдачи) существующих заданий не меняется
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Task.name],
+                set_={
+                    'content': stmt.excluded.content,
+                    'content_hash': stmt.excluded.content_hash,
+                    'difficulty': stmt.excluded.difficulty,
+                    'max_attempts': stmt.excluded.max_attempts,
+                }
+            )
+            for start in range(0, len(rows), batch_size):
+                db_session.execute(stmt, rows[start:start + batch_size])
+            db_session.commit()
         
-        db_session.commit()
-        logger.info(f"Successfully initialized task pool with {total_tasks} tasks")
+        updated = sum(1 for row in rows if row['name'] in existing)
+        logger.info(
+            f"Successfully initialized task pool with {total_tasks} tasks "
+            f"({len(rows) - updated} new, {updated} changed, {total_tasks - len(rows)} unchanged)"
+        )
         
     except Exception as e:
         db_session.rollback()
         logger.error(f"Error initializing task pool: {e}")
-        raise 
\ No newline at end of file
+        raise
@@ -0,0 +1,251 @@
+import json
+import mmap
+import os
+import struct
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from contest_server.task_loader import StructureStats, TaskLoader, analyze_structure
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Формат упакованного пула задач:
+#   заголовок | индекс (по записи на задачу) | payload'ы (компактный JSON) | таблица имен
+# Все смещения абсолютные, порядок байт little-endian.
+PACK_MAGIC = b"CTSKPACK"
+PACK_VERSION = 1
+HEADER = struct.Struct("<8sHHIQ")          # magic, version, reserved, count, index_offset
+INDEX_ENTRY = struct.Struct("<QIIIHBB")    # offset, length, file_size, name_offset, name_length, type, difficulty
+
+TASK_TYPES = (
+    "unknown",
+    "classification",
+    "object_detection",
+    "segmentation",
+    "keypoint_detection",
+)
+
+# Префиксы image_id неразмеченного датасета (см. dataset_generator.py)
+IMAGE_ID_PREFIXES = {
+    "cls": "classification",
+    "det": "object_detection",
+    "seg": "segmentation",
+    "kpt": "keypoint_detection",
+}
+
+# Единственный упакованный пул: его собирает CLI ниже и читают scheduler (main.py) и server.py
+DEFAULT_PACK_PATH = os.getenv("TASK_PACK_PATH", "tasks_pool.pack")
+
+
+def _detect_task_type(loader: TaskLoader, data: Dict[str, Any], stats: StructureStats) -> str:
+    """Тип задачи: явное поле, затем префикс image_id, затем эвристика загрузчика"""
+    if data.get("task_type") in TASK_TYPES:
+        return data["task_type"]
+    prefix = str(data.get("image_id", "")).split("_")[0]
+    if prefix in IMAGE_ID_PREFIXES:
+        return IMAGE_ID_PREFIXES[prefix]
+    return loader._determine_task_type(data, stats)
+
+
+def _count_lines(path: Path) -> int:
+    count = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                count += 1
+    return count
+
+
+def _iter_records(files: List[Path]) -> Iterator[Tuple[str, bytes]]:
+    """
+    Задачи источников: JSON файл - одна задача с именем файла,
+    JSONL файл - задача на строку с именем "<файл>_<номер строки>"
+    """
+    for path in files:
+        if path.suffix == ".jsonl":
+            with open(path, "rb") as f:
+                number = 0
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        number += 1
+                        yield f"{path.stem}_{number:06d}", line
+        else:
+            yield path.stem, path.read_bytes()
+
+
+def build_task_pack(pool_dir: str, output_path: str, pattern: str = "*.json") -> int:
+    """
+    Компиляция директории с JSON заданиями (или JSONL файлов, см. dataset_stream.py) в один упакованный файл
+    :param pool_dir: Директория пула задач или один .jsonl файл
+    :param output_path: Путь к итоговому .pack файлу
+    :param pattern: Маска файлов заданий (*.json или *.jsonl)
+    :return: Количество упакованных задач
+    """
+    source = Path(pool_dir)
+    if source.is_file():
+        files = [source]
+        source = source.parent
+    else:
+        files = sorted(source.glob(pattern))
+    loader = TaskLoader(str(source))
+    if not files:
+        raise FileNotFoundError(f"No files matching {pattern} in {pool_dir}")
+
+    count = sum(_count_lines(path) if path.suffix == ".jsonl" else 1 for path in files)
+    index_offset = HEADER.size
+    offset = index_offset + count * INDEX_ENTRY.size
+    entries = []
+    names = bytearray()
+
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as out:
+        # Резервируем место под заголовок и индекс, payload'ы пишем потоково
+        out.seek(offset)
+        for stem, raw in _iter_records(files):
+            data = json.loads(raw)
+
+            payload = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            out.write(payload)
+
+            stats = analyze_structure(data)
+            task_type = _detect_task_type(loader, data, stats)
+            name = stem.encode("utf-8")
+            entries.append((
+                offset,
+                len(payload),
+                len(raw),
+                len(names),
+                len(name),
+                TASK_TYPES.index(task_type) if task_type in TASK_TYPES else 0,
+                loader._estimate_difficulty(data, stats),
+            ))
+            names.extend(name)
+            offset += len(payload)
+
+        names_offset = offset
+        out.write(names)
+
+        out.seek(0)
+        out.write(HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, count, index_offset))
+        for entry in entries:
+            entry = entry[:3] + (names_offset + entry[3],) + entry[4:]
+            out.write(INDEX_ENTRY.pack(*entry))
+
+    os.replace(tmp_path, output_path)
+    logger.info(f"Packed {count} tasks from {pool_dir} into {output_path}")
+    return count
+
+
+class TaskPack:
+    """Пул задач, отображенный в память. Открытие не зависит от размера пула."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        self._view = memoryview(self._mm)
+
+        magic, version, _, count, index_offset = HEADER.unpack_from(self._mm, 0)
+        if magic != PACK_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a task pack")
+        if version != PACK_VERSION:
+            self.close()
+            raise ValueError(f"Unsupported task pack version {version}")
+
+        self.count = count
+        self._index_offset = index_offset
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _entry(self, index: int) -> tuple:
+        if not 0 <= index < self.count:
+            raise IndexError(f"Task index {index} out of range")
+        return INDEX_ENTRY.unpack_from(self._mm, self._index_offset + index * INDEX_ENTRY.size)
+
+    def payload(self, index: int) -> memoryview:
+        """
+        Компактный JSON задачи без копирования
+        :param index: Индекс задачи (с нуля)
+        :return: Срез отображенного файла
+        """
+        offset, length = self._entry(index)[:2]
+        return self._view[offset:offset + length]
+
+    def text(self, index: int) -> str:
+        """Компактный JSON задачи в виде строки"""
+        return str(self.payload(index), "utf-8")
+
+    def load(self, index: int) -> Dict[str, Any]:
+        """Разобранное содержимое задачи"""
+        return json.loads(self.payload(index).tobytes())
+
+    def meta(self, index: int) -> Dict[str, Any]:
+        """
+        Метаданные задачи из индекса (без чтения payload'а)
+        :param index: Индекс задачи (с нуля)
+        :return: Имя, тип, сложность и размер исходного файла
+        """
+        _, length, file_size, name_offset, name_length, task_type, difficulty = self._entry(index)
+        return {
+            "name": str(self._view[name_offset:name_offset + name_length], "utf-8"),
+            "task_type": TASK_TYPES[task_type] if task_type < len(TASK_TYPES) else "unknown",
+            "difficulty": difficulty,
+            "file_size": file_size,
+            "payload_size": length,
+        }
+
+    def __iter__(self) -> Iterator[memoryview]:
+        for index in range(self.count):
+            yield self.payload(index)
+
+    def close(self):
+        view = getattr(self, "_view", None)
+        if view is not None:
+            view.release()
+            self._view = None
+        mm = getattr(self, "_mm", None)
+        if mm is not None:
+            mm.close()
+            self._mm = None
+        self._file.close()
+
+
+def open_task_pack(path: str = DEFAULT_PACK_PATH) -> Optional[TaskPack]:
+    """
+    Открывает упакованный пул, если он собран
+    :param path: Путь к .pack файлу
+    :return: TaskPack или None, если файла нет
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        return TaskPack(path)
+    except Exception as e:
+        logger.error(f"Error opening task pack {path}: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Сборка упакованного пула задач")
+    parser.add_argument("pool_dir", help="Директория с JSON заданиями или .jsonl файл")
+    parser.add_argument("output", nargs="?", default=DEFAULT_PACK_PATH, help="Итоговый .pack файл")
+    parser.add_argument("--pattern", default="*.json", help="Маска файлов заданий")
+    args = parser.parse_args()
+
+    total = build_task_pack(args.pool_dir, args.output, args.pattern)
+    print(f"Packed {total} tasks into {args.output}")
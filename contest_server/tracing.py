@@ -0,0 +1,267 @@
+"""
+Трассировка запросов: фазы обработки (проверка токена, работа с базой, файловый ввод-вывод,
+рассылка) записываются как спаны текущей трассы, а трасса целиком выводится одной строкой JSON
+через structlog.
+
+Спаны собираются для каждого запроса (это несколько обращений к списку), а решение о выводе
+принимается в конце: выводятся случайная доля TRACE_SAMPLE_RATE и все запросы медленнее TRACE_SLOW_MS.
+
+Сводка по фазам: python -m contest_server.tracing traces.jsonl [--name "POST /submit"]
+"""
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+import structlog
+
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))  # доля выводимых трасс
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "250"))  # трассы медленнее порога выводятся всегда (0 - отключено)
+TRACE_LOG = os.getenv("TRACE_LOG", "traces.jsonl")  # файл JSON строк; "-" - stdout
+TRACING_ENABLED = TRACE_SAMPLE_RATE > 0 or TRACE_SLOW_MS > 0
+
+# Пути HTTP, для которых открывается трасса (точное совпадение или окончание пути соревнования)
+TRACED_PATHS = ("/task", "/submit", "/register")
+
+
+class Span:
+    __slots__ = ("name", "start", "duration", "attrs")
+
+    def __init__(self, name: str, start: float, attrs: Dict[str, Any]):
+        self.name = name
+        self.start = start
+        self.duration = 0.0
+        self.attrs = attrs
+
+
+class Trace:
+    """Трасса одного запроса или сообщения WebSocket"""
+
+    __slots__ = ("trace_id", "name", "started", "duration", "spans", "attrs")
+
+    def __init__(self, name: str, **attrs):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.spans: List[Span] = []
+        self.attrs = attrs
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "duration_ms": round(self.duration * 1000, 3),
+            **self.attrs,
+            "spans": [
+                {
+                    "name": span.name,
+                    "start_ms": round((span.start - self.started) * 1000, 3),
+                    "duration_ms": round(span.duration * 1000, 3),
+                    **span.attrs,
+                }
+                for span in self.spans
+            ],
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_trace_logger = None
+
+
+def _get_logger():
+    global _trace_logger
+    if _trace_logger is None:
+        output = sys.stdout if TRACE_LOG == "-" else open(TRACE_LOG, "a", encoding="utf-8")
+        _trace_logger = structlog.wrap_logger(
+            structlog.WriteLogger(output),
+            processors=[
+                structlog.processors.TimeStamper(fmt="iso", utc=True),
+                structlog.processors.JSONRenderer(),
+            ],
+        )
+    return _trace_logger
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def set_attrs(**attrs) -> None:
+    """Добавляет атрибуты к текущей трассе (например, команду или статус решения)"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Optional[Span]]:
+    """
+    Замер фазы обработки в текущей трассе; без активной трассы ничего не делает
+    :param name: Имя фазы, например "db.commit"
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    current = Span(name, time.perf_counter(), attrs)
+    try:
+        yield current
+    except BaseException as e:
+        current.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        current.duration = time.perf_counter() - current.start
+        trace.spans.append(current)
+
+
+def start_trace(name: str, **attrs):
+    """
+    Открывает трассу в текущем контексте
+    :return: Токен для finish_trace или None, если трассировка отключена
+    """
+    if not TRACING_ENABLED:
+        return None
+    return _current_trace.set(Trace(name, **attrs))
+
+
+def finish_trace(token) -> None:
+    """Закрывает трассу и выводит ее, если она попала в выборку или оказалась медленной"""
+    if token is None:
+        return
+    trace = _current_trace.get()
+    _current_trace.reset(token)
+    if trace is None:
+        return
+    trace.duration = time.perf_counter() - trace.started
+    slow = TRACE_SLOW_MS > 0 and trace.duration * 1000 >= TRACE_SLOW_MS
+    if slow or random.random() < TRACE_SAMPLE_RATE:
+        _get_logger().msg("trace", sampled=not slow, **trace.to_dict())
+
+
+@contextmanager
+def trace(name: str, **attrs) -> Iterator[None]:
+    """Трасса вне HTTP запроса (подключение и сообщения WebSocket)"""
+    token = start_trace(name, **attrs)
+    try:
+        yield
+    except BaseException as e:
+        set_attrs(error=type(e).__name__)
+        raise
+    finally:
+        finish_trace(token)
+
+
+class TracingMiddleware:
+    """ASGI middleware: открывает трассу для запросов к TRACED_PATHS и записывает код ответа"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not TRACING_ENABLED or not scope["path"].endswith(TRACED_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        token = start_trace(f"{scope['method']} {scope['path']}")
+        current = _current_trace.get()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                current.attrs["status"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            current.attrs.setdefault("status", 500)
+            current.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            finish_trace(token)
+
+
+def _percentile(sorted_values: List[float], p: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+def aggregate(lines, name: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Сводка по фазам для каждого типа запроса
+    :param lines: Строки JSON трасс
+    :param name: Только трассы с этим именем
+    :return: {имя трассы: {"count", "total", "phases": {фаза: перцентили}}}
+    """
+    durations: Dict[str, List[float]] = {}
+    phases: Dict[str, Dict[str, List[float]]] = {}
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        if record.get("event") != "trace" or (name and record["name"] != name):
+            continue
+        durations.setdefault(record["name"], []).append(record["duration_ms"])
+        per_phase: Dict[str, float] = {}
+        for item in record["spans"]:
+            per_phase[item["name"]] = per_phase.get(item["name"], 0.0) + item["duration_ms"]
+        # Время вне спанов: разбор запроса, зависимости FastAPI, сериализация ответа
+        per_phase["(other)"] = max(0.0, record["duration_ms"] - sum(per_phase.values()))
+        target = phases.setdefault(record["name"], {})
+        for phase, value in per_phase.items():
+            target.setdefault(phase, []).append(value)
+
+    report = {}
+    for trace_name, values in durations.items():
+        total = sum(values)
+        report[trace_name] = {"count": len(values), "total": _summary(values), "phases": {}}
+        for phase, phase_values in sorted(phases[trace_name].items(), key=lambda item: -sum(item[1])):
+            summary = _summary(phase_values)
+            summary["share"] = round(sum(phase_values) / total, 3) if total else 0.0
+            report[trace_name]["phases"][phase] = summary
+    return report
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3),
+        "p50": round(_percentile(values, 50), 3),
+        "p95": round(_percentile(values, 95), 3),
+        "p99": round(_percentile(values, 99), 3),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Разбивка задержки запросов по фазам из JSON трасс")
+    parser.add_argument("files", nargs="+", help="Файлы трасс (JSON строки)")
+    parser.add_argument("--name", help="Только трассы с этим именем, например 'POST /submit'")
+    parser.add_argument("--json", action="store_true", help="Вывести сводку в JSON")
+    args = parser.parse_args()
+
+    def read_lines():
+        for path in args.files:
+            with open(path, "r", encoding="utf-8") as f:
+                yield from f
+
+    result = aggregate(read_lines(), args.name)
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        for trace_name, data in result.items():
+            total = data["total"]
+            print(f"{trace_name}: {data['count']} traces, p50 {total['p50']} ms, p95 {total['p95']} ms, p99 {total['p99']} ms")
+            print(f"  {'phase':<24}{'count':>7}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'share':>8}")
+            for phase, summary in data["phases"].items():
+                print(
+                    f"  {phase:<24}{summary['count']:>7}{summary['mean']:>10.2f}{summary['p50']:>10.2f}"
+                    f"{summary['p95']:>10.2f}{summary['p99']:>10.2f}{summary['share']:>8.1%}"
+                )
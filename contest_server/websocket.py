@@ -1,9 +1,3 @@
-<<<<<<< HEAD
-from fastapi import WebSocket
-from typing import Dict
-import logging
-
-=======
 from fastapi import WebSocket, WebSocketDisconnect
 from typing import Dict, Optional, Set
 import asyncio
@@ -11,12 +5,13 @@ import json
 import logging
 from datetime import datetime
 
+from contest_server.metrics import BROADCAST_LATENCY, WS_CONNECTIONS, WS_MESSAGES_SENT, WS_SEND_ERRORS
+
 # Настройка логирования
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
->>>>>>> d4064c07154b37cc68ec40159791ab6874354da3
 logger = logging.getLogger(__name__)
 
 class WebSocketManager:
@@ -32,39 +27,8 @@ class WebSocketManager:
         Подключение нового WebSocket соединения
         """
         await websocket.accept()
-<<<<<<< HEAD
-        self.connections[team] = websocket
-        logger.info(f"Team {team} connected. Total connections: {len(self.connections)}")
-
-    def disconnect(self, team: str):
-        if team in self.connections:
-            del self.connections[team]
-            logger.info(f"Team {team} disconnected. Total connections: {len(self.connections)}")
-
-    async def send_message(self, team: str, message: str):
-        if team in self.connections:
-            try:
-                await self.connections[team].send_text(message)
-                logger.debug(f"Message sent to team {team}: {message}")
-            except Exception as e:
-                logger.error(f"Error sending message to team {team}: {str(e)}")
-                self.disconnect(team)
-
-    async def broadcast(self, message: str):
-        logger.info(f"Broadcasting message to {len(self.connections)} connections: {message}")
-        disconnected_teams = []
-        for team, ws in self.connections.items():
-            try:
-                await ws.send_text(message)
-                logger.debug(f"Broadcast message sent to team {team}")
-            except Exception as e:
-                logger.error(f"Error broadcasting to team {team}: {str(e)}")
-                disconnected_teams.append(team)
-        
-        # Удаляем отключенные соединения
-        for team in disconnected_teams:
-            self.disconnect(team)
-=======
+        if team_name not in self.active_connections:
+            WS_CONNECTIONS.inc()
         self.active_connections[team_name] = websocket
         self.active_teams.add(team_name)
         logger.info(f"Team {team_name} connected. Total active teams: {len(self.active_teams)}")
@@ -92,8 +56,9 @@ class WebSocketManager:
             except Exception as e:
                 logger.error(f"Error closing connection for team {team_name}: {e}")
             finally:
-                del self.active_connections[team_name]
-                self.active_teams.remove(team_name)
+                if self.active_connections.pop(team_name, None) is not None:
+                    WS_CONNECTIONS.dec()
+                self.active_teams.discard(team_name)
                 logger.info(f"Team {team_name} disconnected. Total active teams: {len(self.active_teams)}")
 
     async def broadcast(self, message: str):
@@ -101,17 +66,35 @@ class WebSocketManager:
         Отправка сообщения всем подключенным клиентам
         """
         disconnected_teams = set()
-        for team_name, connection in self.active_connections.items():
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                logger.error(f"Error sending message to {team_name}: {str(e)}")
-                disconnected_teams.add(team_name)
+        with BROADCAST_LATENCY.time():
+            for team_name, connection in list(self.active_connections.items()):
+                try:
+                    await connection.send_text(message)
+                    WS_MESSAGES_SENT.inc()
+                except Exception as e:
+                    logger.error(f"Error sending message to {team_name}: {str(e)}")
+                    WS_SEND_ERRORS.inc()
+                    disconnected_teams.add(team_name)
                 
         # Удаляем отключившиеся команды
         for team_name in disconnected_teams:
             await self.disconnect(team_name)
->>>>>>> d4064c07154b37cc68ec40159791ab6874354da3
+
+    async def send_message(self, team_name: str, message: str):
+        """
+        Отправка сообщения одной команде (офлайн-командам сообщение ставится в очередь)
+        """
+        websocket = self.active_connections.get(team_name)
+        if websocket is None:
+            self._queue_message(team_name, message)
+            return
+        try:
+            await websocket.send_text(message)
+            WS_MESSAGES_SENT.inc()
+        except Exception as e:
+            logger.error(f"Error sending message to team {team_name}: {str(e)}")
+            WS_SEND_ERRORS.inc()
+            await self.disconnect(team_name)
 
     def _queue_message(self, team_name: str, message: str):
         """
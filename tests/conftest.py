@@ -0,0 +1,62 @@
+"""
+Общие фикстуры тестов.
+
+Движки создаются при импорте contest_server.database, поэтому тестовая база и ключ JWT
+задаются до импорта пакета: тесты никогда не трогают рабочую contest.db.
+"""
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+TEST_ROOT = Path(tempfile.mkdtemp(prefix="contest_server_tests_"))
+TEST_DB_PATH = TEST_ROOT / "test.db"
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+
+from contest_server import database  # noqa: E402
+
+DATASET_PATH = Path(__file__).resolve().parents[1] / "dataset"
+
+
+def _remove_database() -> None:
+    database.engine.dispose()
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        Path(f"{TEST_DB_PATH}{suffix}").unlink(missing_ok=True)
+
+
+@pytest.fixture
+def empty_db():
+    """Пустой файл SQLite на месте рабочей базы; после теста файл удаляется"""
+    _remove_database()
+    yield TEST_DB_PATH
+    _remove_database()
+
+
+@pytest.fixture
+def db(empty_db):
+    """Сессия базы, созданной init_db()"""
+    database.init_db()
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    """Копия первых файлов датасета: загрузчик пишет индекс рядом с файлами"""
+    path = tmp_path / "dataset"
+    path.mkdir()
+    for source in sorted(DATASET_PATH.glob("raw_*.json"))[:10]:
+        shutil.copy(source, path / source.name)
+    return path
+
+
+def pytest_sessionfinish(session, exitstatus):
+    _remove_database()
+    shutil.rmtree(TEST_ROOT, ignore_errors=True)
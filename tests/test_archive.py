@@ -0,0 +1,138 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+
+from contest_server import archive, database
+from contest_server.archive import archive_pool_round, read_archived
+from contest_server.database import Submission, Team
+from contest_server.submission_store import incremental_vacuum
+
+
+@pytest.fixture
+def pool_round(db, tmp_path):
+    """Журнал main.py: три попытки alpha по task_001, одна по task_002 и одно проверяемое решение"""
+    submissions_dir = tmp_path / "submissions"
+    submissions_dir.mkdir()
+    db.add(Team(name="alpha", token="t1"))
+    started = datetime(2026, 1, 1)
+    for i, task_file in enumerate(["task_001.json", "task_001.json", "task_002.json", "task_001.json"]):
+        received_at = started + timedelta(seconds=i)
+        filename = f"alpha_{received_at.isoformat()}.json"
+        (submissions_dir / filename).write_text(json.dumps({"attempt": i}))
+        db.add(Submission(team_name="alpha", task_file=task_file, submission_file=filename,
+                          received_at=received_at, status="SUCCESS"))
+    db.add(Submission(team_id=1, task_id=1, content="{}", status="pending", received_at=started))
+    db.commit()
+    return submissions_dir, tmp_path / "archive"
+
+
+def _log_rows(db):
+    db.expire_all()
+    return db.query(Submission).filter(Submission.team_name.isnot(None)).order_by(Submission.id).all()
+
+
+def test_pool_round_keeps_last_attempt_per_task(db, pool_round):
+    submissions_dir, archive_dir = pool_round
+    stats = archive_pool_round("round1", str(submissions_dir), str(archive_dir))
+
+    assert stats == {"archived": 4, "kept": 2, "removed": 2, "compacted_rows": 2}
+    hot = _log_rows(db)
+    assert [(row.task_file, row.received_at.second) for row in hot] == [("task_002.json", 2), ("task_001.json", 3)]
+    assert sorted(path.name for path in submissions_dir.iterdir()) == sorted(row.submission_file for row in hot)
+    # Проверяемое решение не относится к журналу main.py
+    assert db.query(Submission).filter(Submission.team_id == 1).count() == 1
+
+    attempts = [json.loads(content)["attempt"] for content in read_archived("round1", "alpha", 1, str(archive_dir))]
+    assert attempts == [0, 1, 3]
+
+    again = archive_pool_round("round1", str(submissions_dir), str(archive_dir))
+    assert again == {"archived": 0, "kept": 2, "removed": 0, "compacted_rows": 0}
+
+
+def test_pool_round_keeps_files_when_row_delete_fails(db, pool_round, monkeypatch):
+    submissions_dir, archive_dir = pool_round
+    files = sorted(path.name for path in submissions_dir.iterdir())
+
+    class FailingSession(database.Session):
+        def commit(self):
+            raise RuntimeError("commit failed")
+
+    monkeypatch.setattr(archive, "SessionLocal", lambda: FailingSession(bind=database.engine))
+    with pytest.raises(RuntimeError):
+        archive_pool_round("round1", str(submissions_dir), str(archive_dir))
+    # Строки не удалены - и файлы, на которые они ссылаются, на месте
+    assert sorted(path.name for path in submissions_dir.iterdir()) == files
+    assert len(_log_rows(db)) == 4
+
+    # Повторный запуск после сбоя: попытки уже в архиве, дочищаются строки и файлы
+    monkeypatch.undo()
+    stats = archive_pool_round("round1", str(submissions_dir), str(archive_dir))
+    assert (stats["archived"], stats["removed"], stats["compacted_rows"]) == (0, 2, 2)
+
+
+def test_remove_files_tolerates_missing(tmp_path):
+    (tmp_path / "a.json").write_text("{}")
+    assert archive._remove_files(str(tmp_path), ["a.json", "gone.json"]) == 1
+
+
+def test_background_vacuum_never_runs_full_vacuum(tmp_path, caplog):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE t (id INTEGER PRIMARY KEY)")
+
+    with caplog.at_level(logging.WARNING):
+        incremental_vacuum(engine, 10)
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 0
+    assert "auto_vacuum=INCREMENTAL" in caplog.text
+
+    incremental_vacuum(engine, 10, full_vacuum=True)
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2
+    engine.dispose()
+
+
+def test_init_db_creates_incremental_database(db):
+    with database.engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2
+
+
+def test_contest_archive_compacts_shards_before_removing_files(tmp_path, monkeypatch):
+    from contest_server.archive import archive_contest
+    from contest_server.submission_store import ShardedSubmissionStore
+
+    contest_dir = tmp_path / "submissions" / "c1"
+    contest_dir.mkdir(parents=True)
+    store = ShardedSubmissionStore(2, directory=str(tmp_path / "shards"))
+    store.start()
+    try:
+        async def submit():
+            for i in range(3):
+                filename = f"alpha_001_2026010{i + 1}T000000000000.json"
+                (contest_dir / filename).write_text(json.dumps({"attempt": i}))
+                await store.add("alpha", contest_id="c1", task_id=1, submission_file=filename,
+                                received_at=datetime(2026, 1, i + 1), status="received")
+        asyncio.run(submit())
+
+        removed_with_rows = []
+        real_remove_files = archive._remove_files
+
+        def remove_files(directory, filenames):
+            # К моменту удаления файлов строки шардов уже сжаты
+            removed_with_rows.append(asyncio.run(store.count(contest_id="c1")))
+            return real_remove_files(directory, filenames)
+
+        monkeypatch.setattr(archive, "_remove_files", remove_files)
+        stats = archive_contest("c1", str(tmp_path / "submissions"), str(tmp_path / "archive"), store)
+
+        assert stats == {"archived": 3, "kept": 1, "removed": 2, "compacted_rows": 2}
+        assert removed_with_rows == [1]
+        assert [path.name for path in contest_dir.iterdir()] == ["alpha_001_20260103T000000000000.json"]
+        archived = read_archived("c1", "alpha", 1, str(tmp_path / "archive"))
+        assert [json.loads(content)["attempt"] for content in archived] == [0, 1, 2]
+    finally:
+        store.stop()
@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from contest_server.auth import (
+    VerifiedToken, VerifiedTokenCache, authenticate_token, create_access_token, revoke_token, token_cache,
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_token_cache():
+    token_cache.clear()
+    token_cache.revoked.clear()
+    yield
+    token_cache.clear()
+    token_cache.revoked.clear()
+
+
+def test_revoked_token_is_rejected_even_when_cached():
+    token = create_access_token({"sub": "alpha"})
+    assert authenticate_token(token) == "alpha"
+    assert authenticate_token(token) == "alpha"  # из кеша
+
+    revoke_token(token)
+    with pytest.raises(HTTPException) as error:
+        authenticate_token(token)
+    assert error.value.status_code == 401
+
+
+@pytest.mark.parametrize("token", ["garbage", create_access_token({"sub": "alpha"}, timedelta(seconds=-5))])
+def test_logout_with_bad_token_is_401(token):
+    with pytest.raises(HTTPException) as error:
+        revoke_token(token)
+    assert error.value.status_code == 401
+
+
+def test_cache_is_bounded_lru():
+    cache = VerifiedTokenCache(max_size=2)
+    for name in ("a", "b"):
+        cache.put(name, VerifiedToken(name, float("inf"), None))
+    cache.get("a")
+    cache.put("c", VerifiedToken("c", float("inf"), None))
+    assert cache.get("b") is None
+    assert cache.get("a").subject == "a"
+    assert cache.evictions == 1
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+from contest_server.database import ISSUE_CURSOR_ID, IssueCursor, Task
+from contest_server.scheduler import TaskIssueCursor
+
+
+def _add_tasks(db, count, start=0):
+    base = datetime(2026, 1, 1)
+    for i in range(start, start + count):
+        db.add(Task(name=f"task_{i:03d}", content="{}", created_at=base + timedelta(seconds=30 * i)))
+    db.commit()
+
+
+def test_cursor_resumes_after_restart(db):
+    _add_tasks(db, 5)
+    cursor = TaskIssueCursor()
+    issued = []
+    for _ in range(3):
+        issued.append(cursor.peek(db)[1])
+        cursor.advance(db)
+
+    # Новый процесс: позиция восстанавливается из строки issue_cursor
+    restarted = TaskIssueCursor()
+    restarted.load(db)
+    assert restarted.position == 3
+    assert restarted.issued_ids() == issued
+    assert restarted.peek(db)[1] not in issued
+
+    row = db.get(IssueCursor, ISSUE_CURSOR_ID)
+    assert (row.position, row.last_task_id) == (3, issued[-1])
+    sent = {task.id for task in db.query(Task).filter(Task.is_sent.is_(True), Task.issued_at.isnot(None))}
+    assert sent == set(issued)
+
+
+def test_cursor_picks_up_tasks_added_after_load(db):
+    _add_tasks(db, 2)
+    cursor = TaskIssueCursor()
+    for _ in range(2):
+        cursor.peek(db)
+        cursor.advance(db)
+    assert cursor.peek(db) is None
+
+    _add_tasks(db, 1, start=2)
+    created_at, task_id = cursor.peek(db)
+    assert db.get(Task, task_id).name == "task_002"
@@ -0,0 +1,44 @@
+import json
+import os
+from contextlib import ExitStack
+
+import pytest
+
+from contest_server.benchmarks import microbench
+from contest_server.benchmarks.microbench import BENCHMARKS, compare, machine_info, measure
+
+
+@pytest.mark.parametrize("name", sorted(BENCHMARKS))
+def test_benchmark_runs(name):
+    with ExitStack() as stack:
+        BENCHMARKS[name](stack)()
+
+
+def _work(size):
+    return lambda: sorted(str(i) for i in range(size))
+
+
+def test_gate_flags_doubled_work_only():
+    baseline = {"benchmarks": {"work": measure(_work(2000), repeat=5, min_time=0.01)}}
+    same = {"work": measure(_work(2000), repeat=5, min_time=0.01)}
+    doubled = {"work": measure(_work(4000), repeat=5, min_time=0.01)}
+
+    assert compare(same, baseline, microbench.DEFAULT_THRESHOLD) == []
+    assert compare(doubled, baseline, microbench.DEFAULT_THRESHOLD) == ["work"]
+
+
+def test_compare_skipped_on_other_machine(tmp_path, capsys):
+    baseline_path = tmp_path / "baselines.json"
+    baseline_path.write_text(json.dumps({
+        "version": microbench.BASELINE_VERSION,
+        "machine": dict(machine_info(), python="0.0.0"),
+        "benchmarks": {"auth.create_token": {"relative": 1e-9}},
+    }))
+
+    assert microbench.main(["--filter", "auth.create_token", "--repeat", "1", "--baseline", str(baseline_path)]) == 0
+    assert "сравнение пропущено" in capsys.readouterr().out
+
+
+@pytest.mark.skipif(not os.getenv("MICROBENCH"), reason="полный прогон бенчмарков: MICROBENCH=1")
+def test_no_regressions_against_baselines():
+    assert microbench.main([]) == 0
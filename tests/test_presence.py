@@ -0,0 +1,54 @@
+import asyncio
+import sqlite3
+
+from contest_server import database
+from contest_server.database import Team, init_db
+from contest_server.presence import PresenceTracker
+
+
+def _flush(tracker: PresenceTracker) -> int:
+    async def run():
+        try:
+            return await tracker.flush()
+        finally:
+            # Пул асинхронного движка привязан к циклу событий этого теста
+            await database.async_engine.dispose()
+    return asyncio.run(run())
+
+
+def test_flush_writes_last_seen(db):
+    db.add_all([Team(name="alpha", token="t1"), Team(name="beta", token="t2")])
+    db.commit()
+
+    tracker = PresenceTracker()
+    tracker.touch("alpha")
+    seen_at = tracker.teams["alpha"].last_seen
+
+    assert _flush(tracker) == 1
+    assert tracker._dirty == {}
+    db.expire_all()
+    assert db.query(Team).filter(Team.name == "alpha").one().last_seen == seen_at
+    assert db.query(Team).filter(Team.name == "beta").one().last_seen is None
+    # Нечего записывать - запроса нет
+    assert _flush(tracker) == 0
+
+
+def test_flush_on_migrated_legacy_teams_table(empty_db):
+    conn = sqlite3.connect(empty_db)
+    conn.executescript("""
+        CREATE TABLE teams (id INTEGER PRIMARY KEY, name VARCHAR UNIQUE, token VARCHAR UNIQUE,
+                            status VARCHAR, created_at DATETIME);
+        INSERT INTO teams (name, token, status) VALUES ('alpha', 't1', 'disconnected');
+    """)
+    conn.close()
+    init_db()
+
+    tracker = PresenceTracker()
+    tracker.touch("alpha")
+    assert _flush(tracker) == 1
+
+    db = database.SessionLocal()
+    try:
+        assert db.query(Team).one().last_seen == tracker.teams["alpha"].last_seen
+    finally:
+        db.close()
@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+import pytest
+
+from contest_server.rate_limit import RateLimiter, RateLimitMiddleware, is_limited_path, ws_message_allowed
+
+
+@pytest.mark.parametrize("path, limited", [
+    ("/task", True),
+    ("/task/17", True),
+    ("/submit", True),
+    ("/contests/c1/task", True),
+    ("/contests/c1/submit", True),
+    ("/tasks/bundle", False),
+    ("/task_format", False),
+    ("/contests/c1", False),
+    ("/contests/task", False),
+    ("/metrics", False),
+])
+def test_is_limited_path(path, limited):
+    assert is_limited_path(path) is limited
+
+
+def _get(middleware, path):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "path": path, "headers": [], "client": ("10.0.0.1", 1234)}
+    asyncio.run(middleware(scope, receive, send))
+    return sent[0]["status"]
+
+
+def test_per_task_route_uses_team_bucket():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = RateLimitMiddleware(app, RateLimiter(rate=0.001, burst=2))
+    assert [_get(middleware, f"/task/{i}") for i in range(3)] == [200, 200, 429]
+    assert _get(middleware, "/tasks/bundle") == 200
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.closed = None
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+    async def close(self, code, reason=""):
+        self.closed = code
+
+
+def test_ws_throttling_sends_one_notice_per_window(monkeypatch):
+    monkeypatch.setattr("contest_server.rate_limit.WS_MAX_DROPS", 5)
+    limiter = RateLimiter(ws_rate=0.001, ws_burst=1)
+    websocket = FakeWebSocket()
+
+    async def run(count):
+        return [await ws_message_allowed(websocket, "alpha", limiter) for _ in range(count)]
+
+    assert asyncio.run(run(5)) == [True, False, False, False, False]
+    assert [frame["code"] for frame in websocket.sent] == [429]
+    assert websocket.closed is None
+
+    asyncio.run(run(1))
+    assert websocket.closed == 1008
@@ -0,0 +1,21 @@
+import json
+import shutil
+from pathlib import Path
+
+from contest_server.task_pack import build_task_pack, open_task_pack
+
+POOL_PATH = Path(__file__).resolve().parents[1] / "contest_server" / "tasks_pool"
+
+
+def test_pack_round_trip(tmp_path):
+    pool = tmp_path / "tasks_pool"
+    pool.mkdir()
+    sources = sorted(POOL_PATH.glob("task_*.json"))[:5]
+    for source in sources:
+        shutil.copy(source, pool / source.name)
+
+    assert build_task_pack(str(pool), str(tmp_path / "pool.pack")) == len(sources)
+    pack = open_task_pack(str(tmp_path / "pool.pack"))
+    assert len(pack) == len(sources)
+    for index, source in enumerate(sources):
+        assert json.loads(pack.text(index)) == json.loads(source.read_text(encoding="utf-8"))
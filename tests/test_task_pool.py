@@ -0,0 +1,72 @@
+import json
+import sqlite3
+
+from contest_server import database
+from contest_server.database import Task, init_db
+from contest_server.task_loader import initialize_task_pool
+
+
+def test_initialize_task_pool_on_empty_database(empty_db, dataset):
+    init_db()
+    db = database.SessionLocal()
+    try:
+        initialize_task_pool(str(dataset), db)
+        tasks = db.query(Task).order_by(Task.created_at, Task.id).all()
+        assert [task.name for task in tasks] == sorted(path.stem for path in dataset.glob("raw_*.json"))
+        assert all(task.content_hash for task in tasks)
+        assert json.loads(tasks[0].content) == json.loads((dataset / f"{tasks[0].name}.json").read_text())
+    finally:
+        db.close()
+
+
+def test_bulk_upsert_is_idempotent(db, dataset):
+    initialize_task_pool(str(dataset), db)
+    before = {task.name: (task.id, task.created_at, task.content_hash) for task in db.query(Task)}
+
+    initialize_task_pool(str(dataset), db)
+    db.expire_all()
+    assert {task.name: (task.id, task.created_at, task.content_hash) for task in db.query(Task)} == before
+
+
+def test_bulk_upsert_updates_changed_task_in_place(db, dataset):
+    initialize_task_pool(str(dataset), db)
+    task = db.query(Task).filter(Task.name == "raw_001").one()
+    task_id, created_at, old_hash = task.id, task.created_at, task.content_hash
+
+    path = dataset / "raw_001.json"
+    content = json.loads(path.read_text())
+    content["image_id"] = "changed"
+    path.write_text(json.dumps(content))
+    initialize_task_pool(str(dataset), db)
+
+    db.expire_all()
+    task = db.query(Task).filter(Task.name == "raw_001").one()
+    assert (task.id, task.created_at) == (task_id, created_at)
+    assert task.content_hash != old_hash
+    assert json.loads(task.content)["image_id"] == "changed"
+    assert db.query(Task).count() == 10
+
+
+def test_init_db_migrates_legacy_schema(empty_db, dataset):
+    # Схема contest.db, созданная прежними моделями models.py
+    conn = sqlite3.connect(empty_db)
+    conn.executescript("""
+        CREATE TABLE teams (id INTEGER PRIMARY KEY, name VARCHAR UNIQUE, token VARCHAR UNIQUE,
+                            status VARCHAR, created_at DATETIME);
+        CREATE TABLE tasks (id INTEGER PRIMARY KEY, task_file VARCHAR, content JSON,
+                            created_at DATETIME, issued_at DATETIME);
+        INSERT INTO teams (name, token, status) VALUES ('alpha', 't1', 'disconnected');
+    """)
+    conn.close()
+
+    init_db()
+    db = database.SessionLocal()
+    try:
+        team = db.query(database.Team).one()
+        assert team.is_active is True
+        assert team.last_seen is None
+        initialize_task_pool(str(dataset), db)
+        initialize_task_pool(str(dataset), db)
+        assert db.query(Task).count() == 10
+    finally:
+        db.close()